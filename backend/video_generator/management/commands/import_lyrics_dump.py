@@ -0,0 +1,85 @@
+import os
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from video_generator.utils.local_index import LocalLyricsIndex, local_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Import an LRCLIB database dump or a directory of .lrc files into the "
+        "local lyrics index. Re-running only imports rows changed since the last import."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "source",
+            nargs="?",
+            help="Path to an LRCLIB SQLite dump or a directory of .lrc files",
+        )
+        parser.add_argument(
+            "--index",
+            help="Path of the index database (defaults to LYRICS_INDEX_PATH or the cache directory)",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Ignore the previous import watermark and re-import everything",
+        )
+        parser.add_argument(
+            "--compact",
+            action="store_true",
+            help="Optimize the FTS index and VACUUM the database after importing",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        source = options["source"]
+        if not source and not options["compact"]:
+            raise CommandError("Provide a source to import and/or --compact.")
+
+        index = LocalLyricsIndex(options["index"]) if options["index"] else local_index
+
+        def progress(count):
+            self.stdout.write(f"   ... {count} tracks imported", ending="\r")
+
+        if source:
+            if not os.path.exists(source):
+                raise CommandError(f"Source not found: {source}")
+
+            started = time.monotonic()
+            try:
+                if os.path.isdir(source):
+                    self.stdout.write(f"📥 Importing .lrc files from {source}...")
+                    imported = index.import_lrc_directory(
+                        source,
+                        full=options["full"],
+                        batch_size=options["batch_size"],
+                        progress=progress,
+                    )
+                else:
+                    self.stdout.write(f"📥 Importing LRCLIB dump {source}...")
+                    imported = index.import_lrclib_dump(
+                        source,
+                        full=options["full"],
+                        batch_size=options["batch_size"],
+                        progress=progress,
+                    )
+            except sqlite3.Error as e:
+                raise CommandError(f"Import failed: {e}")
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"✅ Imported {imported} tracks in {time.monotonic() - started:.1f}s"
+                )
+            )
+
+        if options["compact"]:
+            self.stdout.write("🧹 Compacting index...")
+            index.compact()
+            self.stdout.write(self.style.SUCCESS("✅ Index compacted"))
+
+        stats = index.stats()
+        self.stdout.write(f"📚 Index now holds {stats.get('tracks')} tracks")
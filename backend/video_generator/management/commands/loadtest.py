@@ -0,0 +1,262 @@
+import asyncio
+import json
+import os
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from video_generator.utils.fake_providers import (
+    FakeProviders,
+    FaultProfile,
+    LatencyProfile,
+)
+
+
+class MemorySampler:
+    """
+    Samples the process RSS in the background and keeps the peak.
+    """
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.baseline = self.peak = self.current()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current():
+        # Current resident set size in bytes (Linux), falls back to the lifetime peak
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.current())
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current())
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs N video jobs end to end against local fake LRCLIB, Gemini and "
+        "Odyssey providers (no network, no quota) and reports jobs/minute, "
+        "per-stage p50/p95 latency and peak memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--jobs", type=int, default=8, help="Total jobs to run")
+        parser.add_argument("--concurrency", type=int, default=4, help="Jobs running at once")
+        parser.add_argument(
+            "--mode",
+            choices=["web", "cli"],
+            default="web",
+            help="Drive tasks.run_video_generation (web) or the CLI pipeline (cli)",
+        )
+        parser.add_argument("--song-seconds", type=float, default=24, help="Length of the synthetic songs")
+        parser.add_argument("--lrclib-latency", default="0.15:0.6", metavar="MEDIAN[:P95]")
+        parser.add_argument("--text-latency", default="0.8:2", metavar="MEDIAN[:P95]", help="Gemini sentiment calls")
+        parser.add_argument("--image-latency", default="5:12", metavar="MEDIAN[:P95]", help="Gemini image calls")
+        parser.add_argument("--connect-latency", default="1.5:4", metavar="MEDIAN[:P95]", help="Odyssey connect()")
+        parser.add_argument(
+            "--recording-latency",
+            default="4:10",
+            metavar="MEDIAN[:P95]",
+            help="Delay until an Odyssey recording can be fetched",
+        )
+        parser.add_argument("--rate-429", type=float, default=0.0, help="Share of provider calls answered with 429")
+        parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of provider calls failing outright")
+        parser.add_argument("--seed", type=int, help="Seed for latency and fault sampling")
+        parser.add_argument(
+            "--warm-cache",
+            action="store_true",
+            help="Use the regular cache directory instead of a fresh empty one",
+        )
+        parser.add_argument("--keep", action="store_true", help="Keep the created jobs and output files")
+        parser.add_argument("--json", metavar="FILE", help="Also write the report as JSON")
+
+    def handle(self, *args, **options):
+        if options["jobs"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--jobs and --concurrency must be at least 1.")
+
+        try:
+            latencies = {
+                name: LatencyProfile.parse(options[f"{name}_latency"])
+                for name in ("lrclib", "text", "image", "connect", "recording")
+            }
+        except ValueError as e:
+            raise CommandError(f"Invalid latency: {e}")
+        faults = FaultProfile(options["rate_429"], options["failure_rate"])
+
+        # Outputs (media/, CLI song folders) and, by default, the caches go to a scratch dir
+        workdir = tempfile.mkdtemp(prefix="loadtest_")
+        previous_cwd = os.getcwd()
+        previous_cache_dir = os.environ.get("ODYSSEY_CACHE_DIR")
+        if not options["warm_cache"]:
+            os.environ["ODYSSEY_CACHE_DIR"] = os.path.join(workdir, "cache")
+
+        # Imported here so the pipeline picks up the environment set above
+        from video_generator.models import VideoJob
+        from video_generator.tasks import run_video_generation
+        from video_generator.utils import generate_music_video
+        from video_generator.utils.gemini_client import gemini
+        from video_generator.utils.latency_stats import stage_latency
+        from video_generator.utils.odyssey_pool import odyssey_pools
+        from video_generator.utils.odyssey_recordings import recording_readiness
+        from video_generator.utils.segment_hedging import hedge_stats
+        from video_generator.utils.stream_scheduler import stream_scheduler
+
+        fakes = FakeProviders(
+            song_seconds=options["song_seconds"],
+            lrclib_latency=latencies["lrclib"],
+            text_latency=latencies["text"],
+            image_latency=latencies["image"],
+            connect_latency=latencies["connect"],
+            recording_latency=latencies["recording"],
+            lrclib_faults=faults,
+            gemini_faults=faults,
+            odyssey_faults=faults,
+            seed=options["seed"],
+        )
+
+        queries = [f"Load Test Song {i} - Fake Artist {i % 7}" for i in range(options["jobs"])]
+        job_ids = []
+        outcomes = []
+        stage_latency.reset()
+        gemini.latency.reset()
+
+        with fakes:
+            os.chdir(workdir)
+            try:
+                if options["mode"] == "web":
+                    for query in queries:
+                        title, _, artist = query.partition(" - ")
+                        job_ids.append(VideoJob.objects.create(song_title=title, artist=artist).id)
+
+                    def run_job(job_id):
+                        run_video_generation(job_id)
+                        return VideoJob.objects.get(id=job_id).status == "completed"
+
+                    work = job_ids
+                else:
+
+                    def run_job(query):
+                        return bool(asyncio.run(generate_music_video.main(query)))
+
+                    work = queries
+
+                self.stdout.write(
+                    f"🚀 Running {len(work)} {options['mode']} jobs, {options['concurrency']} at a time..."
+                )
+                memory = MemorySampler().start()
+                started = time.monotonic()
+                with ThreadPoolExecutor(max_workers=options["concurrency"]) as pool:
+                    for ok in pool.map(self._guarded(run_job), work):
+                        outcomes.append(ok)
+                elapsed = time.monotonic() - started
+                memory.stop()
+            finally:
+                os.chdir(previous_cwd)
+                if previous_cache_dir is None:
+                    os.environ.pop("ODYSSEY_CACHE_DIR", None)
+                else:
+                    os.environ["ODYSSEY_CACHE_DIR"] = previous_cache_dir
+
+        completed = sum(outcomes)
+        report = {
+            "mode": options["mode"],
+            "jobs": len(outcomes),
+            "concurrency": options["concurrency"],
+            "completed": completed,
+            "failed": len(outcomes) - completed,
+            "seconds": round(elapsed, 2),
+            "jobs_per_minute": round(completed / elapsed * 60, 3) if elapsed else 0.0,
+            "stages": stage_latency.stats(),
+            "gemini": gemini.stats(),
+            "providers": fakes.stats(),
+            "odyssey_pool": odyssey_pools.stats(),
+            "recording_readiness": recording_readiness.stats(),
+            "stream_slots": stream_scheduler.stats(),
+            "hedging": hedge_stats.stats(),
+            "memory": {
+                "baseline_mb": round(memory.baseline / 2**20, 1),
+                "peak_mb": round(memory.peak / 2**20, 1),
+            },
+            "settings": {
+                name: repr(profile) for name, profile in latencies.items()
+            },
+        }
+        report["settings"].update(rate_429=faults.rate_429, failure_rate=faults.failure_rate)
+        self._print_report(report)
+
+        if options["json"]:
+            with open(options["json"], "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"📝 Report written to {options['json']}")
+
+        if options["keep"]:
+            self.stdout.write(f"📁 Outputs kept in {workdir}")
+        else:
+            VideoJob.objects.filter(id__in=job_ids).delete()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _guarded(self, run_job):
+        def run(item):
+            try:
+                return run_job(item)
+            except Exception as e:
+                self.stderr.write(f"❌ Job {item} crashed: {e}")
+                return False
+
+        return run
+
+    def _print_report(self, report):
+        from video_generator.utils.odyssey_recordings import recording_readiness
+
+        out = self.stdout.write
+        out("")
+        out(
+            f"📊 {report['completed']}/{report['jobs']} {report['mode']} jobs completed "
+            f"in {report['seconds']}s at concurrency {report['concurrency']}: "
+            f"{report['jobs_per_minute']} jobs/min"
+        )
+        out("")
+        out(f"{'stage':<22}{'calls':>7}{'errors':>8}{'p50 s':>9}{'p95 s':>9}{'max s':>9}")
+        for title, stats in (("", report["stages"]), ("gemini ", report["gemini"])):
+            for name, entry in stats.items():
+                out(
+                    f"{(title + name)[:21]:<22}{entry['calls']:>7}{entry['errors']:>8}"
+                    f"{entry.get('p50', '-'):>9}{entry.get('p95', '-'):>9}{entry.get('max', '-'):>9}"
+                )
+        out("")
+        out("Provider calls: " + ", ".join(f"{k}={v}" for k, v in report["providers"].items()))
+        out("Odyssey pool: " + ", ".join(f"{k}={v}" for k, v in report["odyssey_pool"].items()))
+        out(f"Recording readiness: {recording_readiness.format()}")
+        slots = report["stream_slots"]
+        waits = ", ".join(
+            f"{name} p50={entry.get('p50', '-')}s p95={entry.get('p95', '-')}s"
+            for name, entry in slots["wait"].items()
+        )
+        out(
+            f"Stream slots: {slots['granted']} granted at max {slots['max_streams']}, "
+            f"peak queue {slots['max_queue_depth']}, wait {waits or '-'}"
+        )
+        out("Hedging: " + ", ".join(f"{k}={v}" for k, v in report["hedging"].items()))
+        out(
+            f"Memory: peak RSS {report['memory']['peak_mb']} MB "
+            f"(baseline {report['memory']['baseline_mb']} MB)"
+        )
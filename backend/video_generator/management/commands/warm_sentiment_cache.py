@@ -0,0 +1,71 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from video_generator.utils.fetch_lyrics import get_song_lyrics
+from video_generator.utils.local_index import local_index
+from video_generator.utils.sentiment_analysis import analyze_sentiment_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-compute song sentiments in batched Gemini requests so later jobs "
+        "hit the sentiment cache. Reads songs from a file of queries and/or "
+        "the local lyrics index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "queries",
+            nargs="?",
+            help='Text file with one "title artist" query per line',
+        )
+        parser.add_argument(
+            "--from-index",
+            type=int,
+            metavar="N",
+            help="Also warm the first N tracks of the local lyrics index",
+        )
+        parser.add_argument(
+            "--chunk",
+            type=int,
+            default=500,
+            help="Songs handed to the batch analyzer at a time",
+        )
+
+    def handle(self, *args, **options):
+        queries_path = options["queries"]
+        if not queries_path and not options["from_index"]:
+            raise CommandError("Provide a queries file and/or --from-index N.")
+
+        lyrics = []
+        if queries_path:
+            if not os.path.exists(queries_path):
+                raise CommandError(f"File not found: {queries_path}")
+            with open(queries_path, encoding="utf-8") as f:
+                queries = [line.strip() for line in f if line.strip()]
+            self.stdout.write(f"🔎 Fetching lyrics for {len(queries)} queries...")
+            for query in queries:
+                found = get_song_lyrics(query)
+                if found:
+                    lyrics.append(found)
+                else:
+                    self.stdout.write(f"   ⚠️ No lyrics for '{query}'")
+
+        if options["from_index"]:
+            lyrics.extend(text for _, text in local_index.iter_lyrics(options["from_index"]))
+
+        started = time.monotonic()
+        done = 0
+        for start in range(0, len(lyrics), options["chunk"]):
+            chunk = lyrics[start : start + options["chunk"]]
+            analyze_sentiment_batch(chunk)
+            done += len(chunk)
+            self.stdout.write(f"   ... {done}/{len(lyrics)} songs", ending="\r")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Warmed sentiment for {done} songs in {time.monotonic() - started:.1f}s"
+            )
+        )
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_generator', '0003_videojob_segments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videojob',
+            name='lrclib_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
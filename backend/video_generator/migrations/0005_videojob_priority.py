@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('video_generator', '0004_videojob_lrclib_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videojob',
+            name='priority',
+            field=models.IntegerField(default=0),
+        ),
+    ]
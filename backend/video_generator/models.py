@@ -14,6 +14,8 @@ class VideoJob(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     song_title = models.CharField(max_length=255)
     artist = models.CharField(max_length=255)
+    lrclib_id = models.IntegerField(blank=True, null=True)  # LRCLIB track picked from suggestions
+    priority = models.IntegerField(default=0)  # Higher priority jobs get free Odyssey stream slots first
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
     progress = models.IntegerField(default=0)
     message = models.TextField(blank=True, null=True)
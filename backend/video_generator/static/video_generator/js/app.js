@@ -14,6 +14,7 @@ document.addEventListener('DOMContentLoaded', function () {
 function initializeSearchSuggestions() {
     const input = document.getElementById('song-input');
     const suggestionsBox = document.getElementById('search-suggestions');
+    const trackIdInput = document.getElementById('track-id-input');
     
     if (!input || !suggestionsBox) return;
     
@@ -22,6 +23,9 @@ function initializeSearchSuggestions() {
     input.addEventListener('input', function() {
         const query = this.value.trim();
         
+        // Typing invalidates a previously picked suggestion
+        if (trackIdInput) trackIdInput.value = '';
+        
         clearTimeout(debounceTimer);
         
         if (query.length < 2) {
@@ -85,6 +89,8 @@ function renderSuggestions(suggestions, suggestionsBox, input) {
         
         div.addEventListener('click', function() {
             input.value = `${song.title} ${song.artist}`;
+            const trackIdInput = document.getElementById('track-id-input');
+            if (trackIdInput && song.id) trackIdInput.value = song.id;
             suggestionsBox.style.display = 'none';
         });
         
@@ -3,17 +3,22 @@ import asyncio
 import os
 import re
 import requests
+from contextlib import closing
 from .models import VideoJob
-from .utils.fetch_lyrics import get_song_lyrics
-from .utils.lyrics_to_image import generate_image_from_lyrics
-from .utils.sentiment_analysis import analyze_sentiment
-from .utils.generate_music_video import (
-    parse_lrc_lyrics,
-    get_lyrics_for_interval,
-    generate_video_segment_independent,
-)
+from .utils.fetch_lyrics import get_song_lyrics, get_song_track_by_id
+from .utils.gemini_client import gemini
+from .utils.latency_stats import StageClock
+from .utils.lyrics_to_image import generate_images_in_order, image_output_path
+from .utils.odyssey_pool import odyssey_pools
+from .utils.odyssey_recordings import recording_downloader, recording_readiness
+from .utils.sentiment_analysis import analyze_sentiment, analyze_sentiment_batch
+from .utils.lrc_timeline import parse_lrc
+from .utils.segment_hedging import SegmentHedger
+from .utils.segment_planner import WEB_POLICY, plan_segments
+from .utils.generate_music_video import generate_video_segment_independent
+from .utils.stitching import stitch_segments
+from .utils.thumbnails import make_poster, make_thumbnail
 from odyssey import Odyssey
-from moviepy import VideoFileClip, concatenate_videoclips
 
 
 def run_video_generation(job_id):
@@ -31,11 +36,18 @@ def run_video_generation(job_id):
     job.message = "Fetching lyrics..."
     job.save()
 
+    clock = StageClock("web")
     try:
         # 1. Get Lyrics
         query = f"{job.song_title} {job.artist}"
-        raw_lyrics = get_song_lyrics(query)
+        raw_lyrics = None
+        if job.lrclib_id:
+            track = get_song_track_by_id(job.lrclib_id)
+            raw_lyrics = track.get("lyrics") if track else None
+        if not raw_lyrics:
+            raw_lyrics = get_song_lyrics(query)
 
+        clock.lap("lyrics", ok=bool(raw_lyrics))
         if not raw_lyrics:
             job.status = "failed"
             job.message = "Lyrics not found."
@@ -45,6 +57,7 @@ def run_video_generation(job_id):
         # Analyze Sentiment
         sentiment = analyze_sentiment(raw_lyrics)
         print(f"Detected sentiment: {sentiment}")
+        clock.lap("sentiment")
 
         # Check for cancellation
         job.refresh_from_db()
@@ -63,8 +76,8 @@ def run_video_generation(job_id):
         parsed_lyrics = []
 
         if is_lrc:
-            parsed_lyrics = parse_lrc_lyrics(raw_lyrics)
-            full_lyrics_text = " ".join([text for _, text in parsed_lyrics])
+            parsed_lyrics = parse_lrc(raw_lyrics)
+            full_lyrics_text = parsed_lyrics.full_text()
 
         # 2. Generate Images
         job.progress = 20
@@ -73,91 +86,93 @@ def run_video_generation(job_id):
 
         segment_tasks_data = []
 
-        # Initialize segments list in DB
-        job.segments = []
+        # Lyric-aligned segment plan (fixed slots when lyrics are not synced)
+        plan = plan_segments(parsed_lyrics, WEB_POLICY)
+        total_segments = len(plan)
+
+        # Save images in a media folder
+        output_dir = "media/generated_content"
+        os.makedirs(output_dir, exist_ok=True)
+
+        # Add a placeholder for every segment to DB
+        job.segments = [
+            {
+                "index": i,
+                "lyrics": segment_lyrics,
+                "image": None,
+                "video": None,
+                "status": "generating_image",
+            }
+            for i, _, _, segment_lyrics in plan
+        ]
         job.save()
 
-        # We generate 6 segments (1 minute)
-        for i in range(6):
-            # Check for cancellation before each segment
-            job.refresh_from_db()
-            if job.cancelled:
-                job.status = "cancelled"
-                job.message = "Job cancelled by user."
-                job.save()
-                return
-
-            start_time = i * 10
-            end_time = (i + 1) * 10
-
-            segment_lyrics = ""
-            if is_lrc:
-                segment_lyrics = get_lyrics_for_interval(
-                    parsed_lyrics, start_time, end_time
-                )
-
-            if not segment_lyrics:
-                segment_lyrics = "(Instrumental / Music)"
-
-            # Add placeholder segment to DB
-            current_segments = job.segments
-            current_segments.append(
-                {
-                    "index": i,
-                    "lyrics": segment_lyrics,
-                    "image": None,
-                    "video": None,
-                    "status": "generating_image",
-                }
-            )
-            job.segments = current_segments
-            job.save()
-
+        image_requests = []
+        for i, _, _, segment_lyrics in plan:
             image_prompt = (
                 f"Song: {query}. "
                 f"Mood/Context: {full_lyrics_text[:200]}... "
                 f"Current Scene: {segment_lyrics}. "
                 f"Style: Hand-drawn cartoon, whimsical, expressive."
             )
-
-            # Save images in a media folder
-            output_dir = "media/generated_content"
-            os.makedirs(output_dir, exist_ok=True)
-
-            img_filename = os.path.join(output_dir, f"{job.id}_segment_{i}_image.png")
-            vid_filename = os.path.join(output_dir, f"{job.id}_segment_{i}_video.mp4")
-
-            generated_img_path = generate_image_from_lyrics(
-                image_prompt, output_file=img_filename, sentiment=sentiment
+            image_requests.append(
+                {
+                    "lyrics": image_prompt,
+                    "output_file": image_output_path(
+                        os.path.join(output_dir, f"{job.id}_segment_{i}_image.png")
+                    ),
+                    "sentiment": sentiment,
+                }
             )
 
-            if generated_img_path:
-                # Update segment with image
-                current_segments = job.segments
-                # Find the segment by index and update it
-                for seg in current_segments:
-                    if seg["index"] == i:
-                        seg["image"] = (
-                            "/" + generated_img_path
-                        )  # Ensure absolute path for frontend
-                        seg["status"] = "image_ready"
-                        break
-                job.segments = current_segments
+        # Images are generated concurrently (within the process-wide rate
+        # budget) and handed back in segment order as they finish
+        with closing(generate_images_in_order(image_requests)) as images:
+            for i, generated_img_path in images:
+                # Check for cancellation as each image is published
+                job.refresh_from_db()
+                if job.cancelled:
+                    job.status = "cancelled"
+                    job.message = "Job cancelled by user."
+                    job.save()
+                    return
+
+                _, start_time, end_time, segment_lyrics = plan[i]
+                vid_filename = os.path.join(output_dir, f"{job.id}_segment_{i}_video.mp4")
+
+                if generated_img_path:
+                    # The job list shows a small WebP preview, not the full image
+                    thumb_path = make_thumbnail(generated_img_path)
+
+                    # Update segment with image
+                    current_segments = job.segments
+                    # Find the segment by index and update it
+                    for seg in current_segments:
+                        if seg["index"] == i:
+                            seg["image"] = (
+                                "/" + generated_img_path
+                            )  # Ensure absolute path for frontend
+                            if thumb_path:
+                                seg["thumb"] = "/" + thumb_path
+                            seg["status"] = "image_ready"
+                            break
+                    job.segments = current_segments
+
+                    video_prompt = f"Animated cartoon scene of {segment_lyrics}, hand-drawn style, moving camera"
+                    segment_tasks_data.append(
+                        {
+                            "image": generated_img_path,
+                            "prompt": video_prompt,
+                            "output": vid_filename,
+                            "duration": end_time - start_time,
+                            "index": i,  # Store index to update DB later
+                        }
+                    )
+
+                # Update progress
+                job.progress = 20 + int((i + 1) / total_segments * 30)  # up to 50%
                 job.save()
-
-                video_prompt = f"Animated cartoon scene of {segment_lyrics}, hand-drawn style, moving camera"
-                segment_tasks_data.append(
-                    {
-                        "image": generated_img_path,
-                        "prompt": video_prompt,
-                        "output": vid_filename,
-                        "index": i,  # Store index to update DB later
-                    }
-                )
-
-            # Update progress
-            job.progress = 20 + int((i + 1) / 6 * 30)  # up to 50%
-            job.save()
+        clock.lap("images")
 
         # 3. Generate Videos
         job.refresh_from_db()
@@ -177,31 +192,57 @@ def run_video_generation(job_id):
         job.segments = current_segments
         job.save()
 
+        # Duplicates segments stuck in the tail (HEDGE_SEGMENTS)
+        hedger = SegmentHedger(generate_video_segment_independent, len(segment_tasks_data))
+
         async def run_async_generation():
             # We need to wrap the generate function to return the index too
-            async def generate_with_index(image, prompt, output, index):
-                result = await generate_video_segment_independent(image, prompt, output)
-                return (result, index)
+            async def generate_with_index(image, prompt, output, duration, index):
+                result = await hedger.run(
+                    image,
+                    prompt,
+                    output,
+                    duration=duration,
+                    job=str(job_id),
+                    priority=job.priority,
+                )
+                # Poster frame for the job list, extracted while other segments render
+                poster = await asyncio.to_thread(make_poster, result) if result else None
+                return (result, poster, index)
 
             tasks = [
-                generate_with_index(s["image"], s["prompt"], s["output"], s["index"])
+                generate_with_index(
+                    s["image"], s["prompt"], s["output"], s["duration"], s["index"]
+                )
                 for s in segment_tasks_data
             ]
-            return await asyncio.gather(*tasks)
+            try:
+                # Connect the Odyssey sessions up front; segments then reuse them
+                await odyssey_pools.get().warm(len(tasks))
+                return await asyncio.gather(*tasks)
+            finally:
+                await odyssey_pools.aclose()
+                await recording_downloader.aclose()
+                await gemini.aclose()
 
         results_with_index = asyncio.run(run_async_generation())
+        clock.lap("videos")
+        print(f"⏱️ Recording readiness (process total): {recording_readiness.format()}")
+        print(f"⏱️ Hedging: {hedger.summary()}")
 
         # Process results and update DB
         video_files = []
         current_segments = job.segments
 
-        for result, index in results_with_index:
+        for result, poster, index in results_with_index:
             if result:
                 video_files.append(result)
                 # Update segment with video
                 for seg in current_segments:
                     if seg["index"] == index:
                         seg["video"] = "/" + result
+                        if poster:
+                            seg["poster"] = "/" + poster
                         seg["status"] = "video_ready"
                         break
 
@@ -226,9 +267,9 @@ def run_video_generation(job_id):
         # 4. Stitch
         if video_files:
             final_output = os.path.join(output_dir, f"{job.id}_final.mp4")
-            clips = [VideoFileClip(v) for v in video_files]
-            final_clip = concatenate_videoclips(clips)
-            final_clip.write_videofile(final_output, fps=24)
+            # Stream copy where the segments match, re-encode only the others
+            if not stitch_segments(video_files, final_output):
+                raise RuntimeError("Stitching the video segments failed.")
 
             # Ensure the path is absolute or relative to MEDIA_ROOT for Django to serve it
             # The current path is relative to the backend directory, e.g. "media/generated_content/..."
@@ -250,12 +291,16 @@ def run_video_generation(job_id):
             job.progress = 100
             job.message = "Done!"
             job.save()
+            clock.lap("stitch")
+            clock.finish()
         else:
             job.status = "failed"
             job.message = "No video segments were generated."
             job.save()
+            clock.finish(ok=False)
 
     except Exception as e:
+        clock.finish(ok=False)
         job.status = "failed"
         job.message = str(e)
         job.save()
@@ -265,3 +310,34 @@ def run_video_generation(job_id):
 def start_generation_thread(job_id):
     thread = threading.Thread(target=run_video_generation, args=(job_id,))
     thread.start()
+
+
+def prepare_bulk_generation(job_ids):
+    """
+    Computes the sentiments of a bulk request in batched Gemini calls, so
+    the jobs find them in the cache instead of calling Gemini one by one,
+    then starts the jobs. Runs in the background: a slow provider must not
+    hold the request that queued the jobs.
+    """
+    try:
+        lyrics = []
+        for job in VideoJob.objects.filter(id__in=job_ids):
+            track = get_song_track_by_id(job.lrclib_id) if job.lrclib_id else None
+            found = track.get("lyrics") if track else None
+            if not found:
+                found = get_song_lyrics(f"{job.song_title} {job.artist}")
+            if found:
+                lyrics.append(found)
+        if lyrics:
+            analyze_sentiment_batch(lyrics)
+    except Exception as e:
+        # The jobs still run, computing their sentiment one by one
+        print(f"⚠️ Bulk sentiment prefetch failed: {e}")
+    finally:
+        for job_id in job_ids:
+            start_generation_thread(job_id)
+
+
+def start_bulk_generation(job_ids):
+    thread = threading.Thread(target=prepare_bulk_generation, args=(list(job_ids),))
+    thread.start()
@@ -1,3 +1,774 @@
-from django.test import TestCase
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from django.test import SimpleTestCase
+
+from .utils import (
+    media_probe,
+    segment_hedging,
+    sentiment_analysis,
+    stitching,
+    suggestion_cache,
+)
+from .utils.local_index import LocalLyricsIndex
+from .utils.lrc_timeline import parse_lrc
+from .utils.lyrics_cache import LyricsCache
+from .utils.media_probe import MediaInfo, MediaProbe
+from .utils.odyssey_pool import OdysseyPool, OdysseyPools
+from .utils.odyssey_recordings import IncompleteDownload, RecordingDownloader
+from .utils.rate_budget import RateBudget
+from .utils.render_plan import RenderPlan, RenderSegment, escape_filter_value
+from .utils.segment_hedging import SegmentHedger
+from .utils.segment_planner import WEB_POLICY, SegmentPolicy, plan_segments
+from .utils.sentiment_cache import SentimentCache
+from .utils.sentiment_lexicon import LABELS, LexiconClassifier
+from .utils.single_flight import SingleFlight
+from .utils.stream_scheduler import StreamScheduler
+from .utils.suggestion_cache import SuggestionCache
+
+
+class PlanSegmentsTailTests(SimpleTestCase):
+    cli_policy = SegmentPolicy(max_segment=5, max_total=40)
+
+    def test_short_tail_is_not_a_segment(self):
+        lyrics = parse_lrc("[00:01.00]a\n[00:06.00]b\n[00:10.50]c")
+        plan = list(plan_segments(lyrics, self.cli_policy))
+        self.assertEqual(
+            [(start, end) for _, start, end, _ in plan],
+            [(0.0, 5.0), (5.0, 10.0), (10.0, 15.0)],
+        )
+
+    def test_tail_cut_by_max_total_is_folded(self):
+        # The last line starts just before max_total: no 0.01 s segment
+        lyrics = parse_lrc("[00:30.00]a\n[00:35.00]b\n[00:39.99]c")
+        plan = plan_segments(lyrics, self.cli_policy)
+        self.assertEqual(plan.total_duration(), 40.0)
+        self.assertGreaterEqual(plan.duration(len(plan) - 1), 1.0)
+        self.assertTrue(all(plan.duration(i) <= 5 for i in range(len(plan))))
+        self.assertIn("c", plan.lyrics(len(plan) - 1))
+
+    def test_sliver_with_lyrics_is_kept(self):
+        # The previous segment is full, so the last line cannot be folded
+        lyrics = parse_lrc("[00:00.00]a\n[00:05.00]b\n[00:10.00]c\n[00:15.20]d")
+        plan = plan_segments(lyrics, SegmentPolicy(max_segment=5, max_total=15.5))
+        self.assertEqual(plan.intervals()[-1], (15.0, 15.5))
+        self.assertEqual(plan.lyrics(len(plan) - 1), "d")
+
+    def test_web_plan_ends_without_sliver(self):
+        lyrics = parse_lrc("[00:02.00]a\n[00:09.00]b\n[00:16.00]c\n[00:25.50]d")
+        plan = plan_segments(lyrics, WEB_POLICY)
+        last = len(plan) - 1
+        self.assertGreaterEqual(plan.duration(last), WEB_POLICY.min_segment)
+        self.assertLessEqual(plan.duration(last), WEB_POLICY.max_segment)
+
+
+class ParseLrcTests(SimpleTestCase):
+    def test_timestamp_inside_text_is_not_a_line(self):
+        timeline = parse_lrc("[00:01.00]foo [00:03.00]bar\nfoo [00:05.00]baz\n  [00:07.00]qux")
+        self.assertEqual(list(timeline), [(1.0, "foo [00:03.00]bar"), (7.0, "qux")])
+
+    def test_repeated_timestamps_at_line_start(self):
+        timeline = parse_lrc("[00:02.00][00:04.00]chorus\n[00:03.00]verse")
+        self.assertEqual(list(timeline), [(2.0, "chorus"), (3.0, "verse"), (4.0, "chorus")])
+
+
+class LexiconNegationTests(SimpleTestCase):
+    def setUp(self):
+        self.classifier = LexiconClassifier()
+
+    def test_negated_term_is_ignored(self):
+        self.assertIsNone(self.classifier.classify("I am not happy").bucket)
+
+    def test_negation_reaches_past_the_next_word(self):
+        result = self.classifier.classify("not feeling happy\ndon't feel good")
+        self.assertEqual(result.scores["happy"], 0)
+
+    def test_negation_window_ends(self):
+        result = self.classifier.classify("no, I swear we will dance")
+        self.assertGreater(result.scores["happy"], 0)
+
+    def test_negation_stops_at_the_end_of_the_line(self):
+        result = self.classifier.classify("I could never\nbe happy")
+        self.assertGreater(result.scores["happy"], 0)
+
+    def test_negator_still_counts_as_a_term(self):
+        result = self.classifier.classify("no more")
+        self.assertEqual(result.bucket, "sad")
+
+
+class TempDirMixin:
+    def setUp(self):
+        super().setUp()
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.tmp = self._tmp.name
+
+    def path(self, name):
+        return os.path.join(self.tmp, name)
+
+
+class SQLiteTTLCacheTests(TempDirMixin, SimpleTestCase):
+    track = {"id": 7, "title": "Song", "artist": "Artist", "lyrics": "[00:01.00]la", "synced": True}
+
+    def test_equivalent_queries_share_an_entry(self):
+        cache = LyricsCache(path=self.path("lyrics.sqlite3"))
+        cache.set("Song feat. Someone - Artist", self.track)
+        self.assertEqual(cache.get("song FT someone   artist")["id"], 7)
+        self.assertEqual(cache.get_by_id("7")["title"], "Song")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["stores"], stats["entries"]), (2, 1, 1))
+        self.assertEqual(stats["hit_rate"], 1.0)
+
+    def test_expired_entry_is_a_miss(self):
+        cache = LyricsCache(path=self.path("lyrics.sqlite3"), ttl=60)
+        cache.set("Song - Artist", self.track)
+        conn = cache._connect()
+        conn.execute("UPDATE lyrics SET created_at = created_at - 120")
+        conn.commit()
+        self.assertIsNone(cache.get("Song - Artist"))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["expired"]), (0, 1, 1))
+        self.assertEqual(stats["entries"], 0)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = SentimentCache(path=self.path("sentiment.sqlite3"), ttl=0, max_entries=2)
+        clock = itertools.count(1000)
+        with mock.patch("time.time", side_effect=lambda: next(clock)):
+            cache.set("a", "model", "Happy")
+            cache.set("b", "model", "Sad")
+            cache.get("a")
+            cache.set("c", "model", "Angry")
+        self.assertEqual(cache.get("a"), "Happy")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_ttl_evicts_on_write(self):
+        cache = SentimentCache(path=self.path("sentiment.sqlite3"), ttl=60)
+        cache.set("old", "model", "Sad")
+        conn = cache._connect()
+        conn.execute("UPDATE sentiment SET created_at = created_at - 120")
+        conn.commit()
+        cache.set("new", "model", "Happy")
+        stats = cache.stats()
+        self.assertEqual((stats["evictions"], stats["entries"]), (1, 1))
+
+
+class SingleFlightTests(SimpleTestCase):
+    def run_concurrently(self, fn, callers=3):
+        # The first caller leads; the others join while its call is in flight
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        outcomes = []
+
+        def leader_fn():
+            started.set()
+            release.wait(5)
+            return fn()
+
+        def call(fn):
+            try:
+                outcomes.append(flight.do("key", fn, timeout=5))
+            except Exception as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=call, args=(leader_fn,))]
+        threads[0].start()
+        started.wait(5)
+        for _ in range(callers - 1):
+            threads.append(threading.Thread(target=call, args=(self.fail,)))
+            threads[-1].start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        return outcomes
+
+    def test_concurrent_calls_share_one_result(self):
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            return "lyrics"
+
+        outcomes = self.run_concurrently(fetch)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(
+            sorted(outcomes, key=lambda o: o[1]),
+            [("lyrics", False), ("lyrics", True), ("lyrics", True)],
+        )
+
+    def test_error_reaches_every_caller(self):
+        def fetch():
+            raise ValueError("upstream down")
+
+        outcomes = self.run_concurrently(fetch)
+        self.assertEqual(len(outcomes), 3)
+        self.assertTrue(all(isinstance(o, ValueError) for o in outcomes))
+
+    def test_finished_call_is_not_cached(self):
+        flight = SingleFlight()
+        self.assertEqual(flight.do("key", lambda: 1), (1, False))
+        self.assertEqual(flight.do("key", lambda: 2), (2, False))
+
+
+class SuggestionCacheTests(SimpleTestCase):
+    def suggestions(self, *titles):
+        return [{"id": i, "title": t, "artist": "Artist", "album": None} for i, t in enumerate(titles)]
+
+    def test_complete_prefix_result_is_filtered(self):
+        cache = SuggestionCache(upstream_limit=20)
+        cache.store("be", self.suggestions("Beat It", "Believer", "Be My Baby"))
+        self.assertEqual([s["title"] for s in cache.lookup("beat")], ["Beat It"])
+        self.assertEqual([s["title"] for s in cache.lookup("be my")], ["Be My Baby"])
+        self.assertEqual(cache.stats()["prefix_hits"], 2)
+
+    def test_truncated_prefix_result_is_not_used(self):
+        cache = SuggestionCache(upstream_limit=3)
+        cache.store("be", self.suggestions("Beat It", "Believer", "Be My Baby"))
+        self.assertIsNone(cache.lookup("beat"))
+        # ...unless enough rows survive the filter to fill the dropdown
+        self.assertEqual(len(cache.lookup("bea", limit=1)), 1)
+
+    def test_expired_entries_and_lru_eviction(self):
+        cache = SuggestionCache(ttl=-1)
+        cache.store("beat it", self.suggestions("Beat It"))
+        self.assertIsNone(cache.lookup("beat it"))
+
+        cache = SuggestionCache(max_entries=1)
+        cache.store("abc", self.suggestions("Abc"))
+        cache.store("xyz", self.suggestions("Xyz"))
+        self.assertIsNone(cache.lookup("abc"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_get_suggestions_fetches_once_without_retries(self):
+        results = [
+            {"id": 1, "trackName": "Beat It", "artistName": "Michael Jackson", "syncedLyrics": "[00:01.00]x"}
+        ]
+        with mock.patch.object(suggestion_cache, "suggestion_cache", SuggestionCache()), mock.patch.object(
+            suggestion_cache.local_index, "search", return_value=[]
+        ), mock.patch.object(suggestion_cache.lrclib, "search", return_value=results) as search:
+            first = suggestion_cache.get_suggestions("beat")
+            second = suggestion_cache.get_suggestions("beat it")
+        search.assert_called_once_with("beat", timeout=suggestion_cache.SUGGESTION_TIMEOUT, interactive=True)
+        self.assertEqual(first, second)
+        self.assertEqual(first[0]["title"], "Beat It")
+        self.assertNotIn("_haystack", first[0])
+
+
+class LocalIndexTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        lrc_dir = self.path("lrc")
+        os.makedirs(lrc_dir)
+        with open(os.path.join(lrc_dir, "Queen - Bohemian Rhapsody.lrc"), "w") as f:
+            f.write("[al:A Night at the Opera]\n[00:01.00]Is this the real life?\n")
+        self.index = LocalLyricsIndex(path=self.path("index.sqlite3"))
+        self.assertEqual(self.index.import_lrc_directory(lrc_dir), 1)
+
+    def test_prefix_search(self):
+        results = self.index.search("bohem quee")
+        self.assertEqual([r["trackName"] for r in results], ["Bohemian Rhapsody"])
+        self.assertEqual(results[0]["artistName"], "Queen")
+        self.assertIn("[00:01.00]", results[0]["syncedLyrics"])
+        self.assertEqual(self.index.search("zeppelin"), [])
+
+    def test_corpus_tracks_have_negative_ids(self):
+        (result,) = self.index.search("bohemian")
+        self.assertLess(result["id"], 0)
+        # Ids arrive as strings from the query string
+        self.assertEqual(self.index.get(str(result["id"]))["trackName"], "Bohemian Rhapsody")
+        self.assertIsNone(self.index.get("abc"))
+
+    def test_missing_index_falls_through(self):
+        index = LocalLyricsIndex(path=self.path("missing.sqlite3"))
+        self.assertEqual(index.search("queen"), [])
+        self.assertIsNone(index.get(1))
+
+
+class SentimentTierTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.classifier = LexiconClassifier()
+        for patcher in (
+            mock.patch.object(sentiment_analysis, "lexicon_classifier", self.classifier),
+            mock.patch.object(
+                sentiment_analysis, "sentiment_cache", SentimentCache(path=self.path("sentiment.sqlite3"))
+            ),
+            mock.patch.object(sentiment_analysis, "SENTIMENT_MODE", "tiered"),
+            mock.patch.object(sentiment_analysis, "SENTIMENT_AUDIT_RATE", 0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_confident_lyrics_stay_local(self):
+        with mock.patch.object(sentiment_analysis, "_request_sentiment") as remote:
+            label = sentiment_analysis.analyze_sentiment("happy joy\nparty all night\ndance in the sunshine")
+        remote.assert_not_called()
+        self.assertEqual(label, LABELS["happy"])
+        self.assertEqual(self.classifier.stats()["local"], 1)
+
+    def test_unsure_lyrics_escalate_once(self):
+        mood = "Dark and Melancholic"
+        with mock.patch.object(sentiment_analysis, "_request_sentiment", return_value=mood) as remote:
+            self.assertEqual(sentiment_analysis.analyze_sentiment("the table and the chair"), mood)
+            self.assertEqual(sentiment_analysis.analyze_sentiment("the table and the chair"), mood)
+        remote.assert_called_once()
+        self.assertEqual(self.classifier.stats()["escalated"], 2)
+
+    def test_remote_failure_falls_back_to_local(self):
+        with mock.patch.object(sentiment_analysis, "_request_sentiment", return_value=None):
+            self.assertEqual(sentiment_analysis.analyze_sentiment("the table and the chair"), "Neutral")
+        self.assertEqual(self.classifier.stats()["remote_failures"], 1)
+
+    def test_token_limit_error_is_batch_too_large(self):
+        error = RuntimeError("400 INVALID_ARGUMENT: the input token count exceeds the maximum")
+        with mock.patch.object(sentiment_analysis.gemini, "generate_content", side_effect=error):
+            with self.assertRaises(sentiment_analysis.BatchTooLarge):
+                sentiment_analysis._request_sentiment_batch(["a", "b"])
+
+    def test_batch_too_large_is_split(self):
+        sizes = []
+
+        def request_batch(texts):
+            sizes.append(len(texts))
+            if len(texts) > 2:
+                raise sentiment_analysis.BatchTooLarge("output token limit")
+            return [f"Mood of {text}" for text in texts]
+
+        songs = ["first song", "second song", "third song", "fourth song", "fifth song"]
+        with mock.patch.object(sentiment_analysis, "SENTIMENT_MODE", "remote"), mock.patch.object(
+            sentiment_analysis, "_request_sentiment_batch", side_effect=request_batch
+        ), mock.patch.object(sentiment_analysis, "_request_sentiment", side_effect=lambda t: f"Mood of {t}"):
+            answers = sentiment_analysis.analyze_sentiment_batch(songs)
+            self.assertEqual(answers, [f"Mood of {song}" for song in songs])
+            self.assertEqual(sizes, [5, 2, 3, 2])
+            # Every answer was cached: a second batch sends nothing
+            sizes.clear()
+            self.assertEqual(sentiment_analysis.analyze_sentiment_batch(songs[:2]), answers[:2])
+            self.assertEqual(sizes, [])
+
+
+class RateBudgetTests(SimpleTestCase):
+    def test_tokens_run_out_after_the_burst(self):
+        budget = RateBudget(600, 4, burst=2)  # 10 tokens per second
+        started = time.monotonic()
+        for _ in range(3):
+            with budget:
+                pass
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual((budget.stats()["acquired"], budget.stats()["waited"]), (3, 1))
+
+    def test_concurrency_cap(self):
+        budget = RateBudget(6000, 1)
+        entered = threading.Event()
+
+        def second():
+            with budget:
+                entered.set()
+
+        with budget:
+            thread = threading.Thread(target=second)
+            thread.start()
+            self.assertFalse(entered.wait(0.2))
+        self.assertTrue(entered.wait(5))
+        thread.join(5)
+
+    def test_backoff_pauses_every_caller(self):
+        budget = RateBudget(6000, 2)
+        budget.backoff(0.2)
+        self.assertGreater(budget.stats()["paused_for"], 0)
+        started = time.monotonic()
+        asyncio.run(budget.acquire_async())
+        budget.release()
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        self.assertEqual(budget.stats()["backoffs"], 1)
+
+
+class FakeOdysseyClient:
+    def __init__(self, api_key):
+        self.is_connected = False
+
+    async def connect(self, on_video_frame):
+        self.is_connected = True
+
+    async def disconnect(self):
+        self.is_connected = False
+
+
+class OdysseyPoolTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {"ODYSSEY_API_KEY": "test"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pools = OdysseyPools(
+            size=2, idle_timeout=60, client_factory=FakeOdysseyClient, max_connections=1
+        )
+
+    def test_released_session_is_reused(self):
+        async def run():
+            pool = self.pools.get()
+            async with pool.lease() as first:
+                pass
+            async with pool.lease() as second:
+                pass
+            await self.pools.aclose()
+            return first, second
+
+        first, second = asyncio.run(run())
+        self.assertIs(first, second)
+        self.assertFalse(first.client.is_connected)
+        stats = self.pools.stats()
+        self.assertEqual((stats["connects"], stats["reuses"], stats["connected"]), (1, 1, 0))
+
+    def test_connect_over_budget_evicts_an_idle_session(self):
+        async def run():
+            pool = self.pools.get()
+            other = OdysseyPool(self.pools, 2, 60, asyncio.get_running_loop())
+            async with pool.lease() as idle:
+                pass
+            async with other.lease():
+                self.assertEqual(self.pools.connected, 1)
+            return idle
+
+        idle = asyncio.run(run())
+        self.assertFalse(idle.client.is_connected)
+        self.assertEqual(self.pools.stats()["evicted"], 1)
+
+    def test_connect_waits_for_a_leased_session(self):
+        async def run():
+            pool = self.pools.get()
+            other = OdysseyPool(self.pools, 2, 60, asyncio.get_running_loop())
+            async with pool.lease():
+                waiting = asyncio.create_task(other.acquire())
+                await asyncio.sleep(0.2)
+                self.assertFalse(waiting.done())
+            session = await asyncio.wait_for(waiting, 5)
+            self.assertEqual(self.pools.connected, 1)
+            await other.release(session)
+
+        asyncio.run(run())
+        self.assertEqual(self.pools.stats()["over_budget"], 0)
+
+    def test_warm_uses_only_free_budget(self):
+        async def run():
+            pool = self.pools.get()
+            await pool.warm(2)
+            return len(pool._idle)
+
+        self.assertEqual(asyncio.run(run()), 1)
+        self.assertEqual(self.pools.stats()["evicted"], 0)
+
+
+class StreamSchedulerTests(SimpleTestCase):
+    def test_free_slot_goes_to_the_job_holding_fewest(self):
+        async def run():
+            scheduler = StreamScheduler(2)
+            await scheduler.acquire("a")
+            await scheduler.acquire("a")
+            granted = []
+
+            async def wait(name, job):
+                await scheduler.acquire(job)
+                granted.append(name)
+
+            waiters = [
+                asyncio.create_task(wait(name, job))
+                for name, job in (("a2", "a"), ("a3", "a"), ("b1", "b"))
+            ]
+            await asyncio.sleep(0.05)
+            self.assertEqual(granted, [])
+            scheduler.release("a")
+            await asyncio.sleep(0.05)
+            scheduler.release("a")
+            await asyncio.sleep(0.05)
+            for task in waiters:
+                task.cancel()
+            await asyncio.gather(*waiters, return_exceptions=True)
+            return granted, scheduler.stats()
+
+        granted, stats = asyncio.run(run())
+        self.assertEqual(granted, ["b1", "a2"])
+        self.assertEqual(stats["cancelled"], 1)
+
+    def test_higher_priority_is_served_first(self):
+        async def run():
+            scheduler = StreamScheduler(1)
+            await scheduler.acquire("a")
+            granted = []
+
+            async def wait(job, priority):
+                async with scheduler.slot(job, priority):
+                    granted.append(job)
+
+            waiters = [asyncio.create_task(wait("low", 0)), asyncio.create_task(wait("high", 5))]
+            await asyncio.sleep(0.05)
+            scheduler.release("a")
+            await asyncio.gather(*waiters)
+            return granted
+
+        self.assertEqual(asyncio.run(run()), ["high", "low"])
+
+
+class SegmentHedgerTests(SimpleTestCase):
+    def setUp(self):
+        for patcher in (
+            mock.patch.object(segment_hedging, "HEDGE_MIN_SAMPLES", 1),
+            mock.patch.object(segment_hedging, "HEDGE_MAX_EXTRA", 0.25),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.outputs = []
+
+    async def generate(self, image_path, prompt, output_filename, duration=5, started=None, **kwargs):
+        self.outputs.append(output_filename)
+        if started is not None:
+            started.set()
+        if output_filename.endswith("_hedge.mp4"):
+            return None  # The duplicate fails, the primary still wins
+        await asyncio.sleep(0.1)
+        return output_filename
+
+    def test_hedges_stay_within_the_budget(self):
+        hedger = SegmentHedger(self.generate, 4, enabled=True)
+        self.assertEqual(hedger.budget, 1)
+        # Every segment already runs past the job's percentile
+        hedger._overheads = [-1.0] * 20
+
+        async def run():
+            return [await hedger.run("img.png", "prompt", f"seg_{i}.mp4", duration=0) for i in range(3)]
+
+        exhausted = segment_hedging.hedge_stats.stats()["budget_exhausted"]
+        self.assertEqual(asyncio.run(run()), ["seg_0.mp4", "seg_1.mp4", "seg_2.mp4"])
+        self.assertEqual(hedger.hedged, 1)
+        self.assertEqual([o for o in self.outputs if o.endswith("_hedge.mp4")], ["seg_0_hedge.mp4"])
+        self.assertEqual(segment_hedging.hedge_stats.stats()["budget_exhausted"] - exhausted, 2)
+
+    def test_disabled_hedger_runs_the_segment_once(self):
+        hedger = SegmentHedger(self.generate, 4, enabled=False)
+        self.assertEqual(hedger.budget, 0)
+        self.assertEqual(asyncio.run(hedger.run("img.png", "prompt", "seg_0.mp4", duration=0)), "seg_0.mp4")
+        self.assertEqual(self.outputs, ["seg_0.mp4"])
+
+
+class _DroppedStream(httpx.AsyncByteStream):
+    def __init__(self, data):
+        self.data = data
+
+    async def __aiter__(self):
+        yield self.data
+        raise httpx.ReadError("connection reset")
+
+
+class RecordingDownloaderTests(TempDirMixin, SimpleTestCase):
+    body = b"0123456789"
+
+    def download(self, handler, retries=2):
+        # httpx buffers up to a chunk; the fake streams drop after 4 bytes
+        downloader = RecordingDownloader(chunk_size=4, retries=retries)
+        output = self.path("segment.mp4")
+
+        async def run():
+            loop = asyncio.get_running_loop()
+            downloader._clients[loop] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            try:
+                return await downloader.download("https://recordings.test/segment.mp4", output)
+            finally:
+                await downloader.aclose()
+
+        return downloader, output, run
+
+    def test_dropped_connection_resumes_with_range(self):
+        ranges = []
+
+        def handler(request):
+            ranges.append(request.headers.get("range"))
+            if not request.headers.get("range"):
+                return httpx.Response(
+                    200, headers={"content-length": "10"}, stream=_DroppedStream(self.body[:4])
+                )
+            return httpx.Response(206, headers={"content-range": "bytes 4-9/10"}, content=self.body[4:])
+
+        downloader, output, run = self.download(handler)
+        self.assertEqual(asyncio.run(run()), output)
+        self.assertEqual(ranges, [None, "bytes=4-"])
+        with open(output, "rb") as f:
+            self.assertEqual(f.read(), self.body)
+        self.assertEqual((downloader.stats()["resumes"], downloader.stats()["bytes"]), (1, 10))
+
+    def test_ignored_range_restarts_the_file(self):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if not calls[1:]:
+                return httpx.Response(
+                    200, headers={"content-length": "10"}, stream=_DroppedStream(self.body[:4])
+                )
+            return httpx.Response(200, content=self.body)
+
+        downloader, output, run = self.download(handler)
+        asyncio.run(run())
+        with open(output, "rb") as f:
+            self.assertEqual(f.read(), self.body)
+        self.assertEqual(downloader.stats()["restarts"], 1)
+
+    def test_short_body_fails_the_length_check(self):
+        def handler(request):
+            return httpx.Response(200, headers={"content-length": "10"}, content=self.body[:6])
+
+        downloader, output, run = self.download(handler, retries=0)
+        with self.assertRaises(IncompleteDownload):
+            asyncio.run(run())
+        self.assertFalse(os.path.exists(output))
+        self.assertFalse(os.path.exists(f"{output}.part"))
+        self.assertEqual(downloader.stats()["failures"], 1)
+
+
+class RenderPlanTests(TempDirMixin, SimpleTestCase):
+    def test_frame_budget(self):
+        segments = [RenderSegment(f"{i}.mp4", duration=2.0) for i in range(4)]
+        plan = RenderPlan(segments, "out.mp4", max_duration=5, fps=24)
+        self.assertEqual(plan.frames, [48, 48, 24])
+        self.assertEqual(plan.duration, 5.0)
+        self.assertIn("trim=end_frame=24", plan.filter_complex())
+
+    def test_uncut_clips_take_the_rest_of_the_budget(self):
+        segments = [RenderSegment("a.mp4", duration=0.01), RenderSegment("b.mp4"), RenderSegment("c.mp4")]
+        plan = RenderPlan(segments, "out.mp4", max_duration=3, fps=24)
+        # 0.01 s is no frame at all; b gets the whole budget, c nothing
+        self.assertEqual([s.video for s in plan.segments], ["b.mp4"])
+        self.assertEqual(plan.frames, [72])
+        self.assertIsNone(RenderPlan(segments[1:], "out.mp4").duration)
+
+    def test_filter_values_are_escaped_twice(self):
+        self.assertEqual(escape_filter_value("a:b"), r"a\\:b")
+        self.assertEqual(escape_filter_value("a'b"), r"a\\\'b")
+        self.assertEqual(escape_filter_value("a,b;c[d]"), r"a\,b\;c\[d\]")
+
+    def test_captions_path_is_escaped_in_the_graph(self):
+        captions = self.path("it's, [1]: captions.txt")
+        with open(captions, "w") as f:
+            f.write("la la")
+        plan = RenderPlan([RenderSegment("a.mp4", captions, 2.0)], "out.mp4")
+        graph = plan.filter_complex()
+        self.assertIn(f"drawtext=textfile={escape_filter_value(os.path.abspath(captions))}:", graph)
+        self.assertNotIn(captions, graph)
+        self.assertNotIn("drawtext", plan.filter_complex(captions=False))
+
+
+def _info(codec="h264", width=1280, height=720, audio=None):
+    return MediaInfo(5.0, codec, width, height, "24/1", "yuv420p", "1/12288", audio)
+
+
+class StitchSegmentsTests(TempDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.videos = [self.path(f"seg_{i}.mp4") for i in range(3)]
+        for video in self.videos:
+            open(video, "wb").close()
+        self.output = self.path("final.mp4")
+        self.commands = []
+
+    def ffmpeg(self, command, **kwargs):
+        self.commands.append(command)
+        open(command[-1], "wb").close()
+        return subprocess.CompletedProcess(command, 0, "", "")
+
+    def stitch(self, infos):
+        infos = dict(zip(self.videos, infos))
+        with mock.patch.object(stitching.media_probe, "probe_many", return_value=infos), mock.patch.object(
+            stitching.subprocess, "run", side_effect=self.ffmpeg
+        ), mock.patch.object(stitching, "render", return_value=self.output) as render:
+            result = stitching.stitch_segments(self.videos, self.output)
+        return result, render
+
+    def test_matching_segments_are_stream_copied(self):
+        result, render = self.stitch([_info()] * 3)
+        self.assertEqual(result, self.output)
+        render.assert_not_called()
+        (command,) = self.commands
+        self.assertEqual(command[command.index("-c") + 1], "copy")
+        self.assertTrue(os.path.exists(self.output))
+
+    def test_only_the_odd_segment_is_reencoded(self):
+        result, render = self.stitch([_info(), _info(width=640, height=480), _info()])
+        self.assertEqual(result, self.output)
+        render.assert_not_called()
+        normalize, concat = self.commands
+        self.assertEqual(normalize[normalize.index("-i") + 1], self.videos[1])
+        self.assertEqual(normalize[-1], self.path("seg_1_concat.mp4"))
+        self.assertIn("scale=1280:720", normalize[normalize.index("-vf") + 1])
+        self.assertEqual(concat[concat.index("-c") + 1], "copy")
+        # The normalized copy is temporary
+        self.assertFalse(os.path.exists(self.path("seg_1_concat.mp4")))
+
+    def test_unknown_codec_or_mixed_audio_reencodes_everything(self):
+        for infos in ([_info("vp9")] * 3, [_info(), _info(audio="aac"), _info()]):
+            self.commands = []
+            result, render = self.stitch(infos)
+            self.assertEqual(result, self.output)
+            render.assert_called_once()
+            self.assertEqual(self.commands, [])
+
+
+class MediaProbeTests(TempDirMixin, SimpleTestCase):
+    ffprobe_output = {
+        "streams": [
+            {"codec_type": "video", "codec_name": "h264", "width": 1280, "height": 720,
+             "pix_fmt": "yuv420p", "r_frame_rate": "24/1", "time_base": "1/12288"},
+            {"codec_type": "audio", "codec_name": "aac"},
+        ],
+        "format": {"duration": "5.000000"},
+    }
+
+    def setUp(self):
+        super().setUp()
+        self.videos = [self.path(f"seg_{i}.mp4") for i in range(2)]
+        for video in self.videos:
+            with open(video, "wb") as f:
+                f.write(b"x")
+        self.probe = MediaProbe(workers=2)
+
+    def ffprobe(self, command, **kwargs):
+        return subprocess.CompletedProcess(command, 0, json.dumps(self.ffprobe_output), "")
+
+    def test_output_is_parsed(self):
+        with mock.patch.object(media_probe.subprocess, "run", side_effect=self.ffprobe):
+            info = self.probe.probe_many(self.videos[:1])[self.videos[0]]
+        self.assertEqual(info, _info(audio="aac"))
+        self.assertEqual(info.fps, 24.0)
+
+    def test_unchanged_files_are_probed_once(self):
+        with mock.patch.object(media_probe.subprocess, "run", side_effect=self.ffprobe) as run:
+            first = self.probe.probe_many(self.videos)
+            second = self.probe.probe_many(self.videos)
+        self.assertEqual(first, second)
+        self.assertEqual(run.call_count, 2)
+        stats = self.probe.stats()
+        self.assertEqual((stats["probes"], stats["hits"], stats["cached"]), (2, 2, 2))
+
+    def test_changed_file_is_probed_again(self):
+        with mock.patch.object(media_probe.subprocess, "run", side_effect=self.ffprobe) as run:
+            self.probe.probe_many(self.videos)
+            with open(self.videos[0], "ab") as f:
+                f.write(b"more")
+            self.probe.probe_many(self.videos)
+        self.assertEqual(run.call_count, 3)
+        self.assertEqual(self.probe.stats()["hits"], 1)
+
+    def test_failures_are_not_cached(self):
+        failed = subprocess.CompletedProcess([], 1, "", "moov atom not found")
+        with mock.patch.object(media_probe.subprocess, "run", return_value=failed) as run:
+            self.assertEqual(self.probe.probe_many(self.videos[:1]), {self.videos[0]: None})
+            self.probe.probe_many(self.videos[:1])
+        self.assertEqual(run.call_count, 2)
+        self.assertEqual(self.probe.probe_many([self.path("missing.mp4")]), {self.path("missing.mp4"): None})
@@ -9,6 +9,7 @@ from .views import (
     search_suggestions,
     search_lyrics,
     about,
+    cache_stats,
 )
 
 router = DefaultRouter()
@@ -23,6 +24,7 @@ urlpatterns = [
     path("search-suggestions/", search_suggestions, name="search_suggestions"),
     path("jobs-partial/", job_list_partial, name="job_list_partial"),
     path("cancel/<uuid:job_id>/", cancel_job, name="cancel_job"),
+    path("stats/", cache_stats, name="cache_stats"),
     # API URLs (keep for compatibility)
     path("api/", include(router.urls)),
 ]
@@ -0,0 +1,17 @@
+import os
+import threading
+
+
+def write_atomic(path, data):
+    """
+    Writes bytes to path through a temporary file and a rename, so readers
+    (the video step, the web UI, other workers) never see a half-written file.
+    """
+    tmp = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
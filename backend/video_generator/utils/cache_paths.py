@@ -0,0 +1,25 @@
+import os
+
+# Directory shared by the on-disk caches (lyrics, sentiment, images, ...).
+# Both the Django workers and the CLI resolve it the same way so they can
+# reuse each other's results. Override with ODYSSEY_CACHE_DIR.
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "cache",
+)
+
+
+def get_cache_dir():
+    """
+    Returns the cache directory, creating it if needed.
+    """
+    cache_dir = os.environ.get("ODYSSEY_CACHE_DIR", DEFAULT_CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def cache_path(filename):
+    """
+    Returns the absolute path of a file inside the cache directory.
+    """
+    return os.path.join(get_cache_dir(), filename)
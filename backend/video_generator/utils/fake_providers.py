@@ -0,0 +1,527 @@
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image as PILImage
+
+# Offline stand-ins for LRCLIB, Gemini and Odyssey, used by the load test
+# (`manage.py loadtest`). LRCLIB and the recording downloads are served by
+# a local HTTP server; Gemini and Odyssey are replaced by fake clients.
+
+WORDS = (
+    "night", "light", "heart", "road", "rain", "fire", "dream", "home", "sky",
+    "love", "tears", "dance", "alone", "sun", "shadow", "river", "golden",
+    "broken", "smile", "cold", "forever", "city", "stars", "falling",
+)
+
+
+class LatencyProfile:
+    """
+    Log-normal latency described by its median and p95, in seconds.
+    """
+
+    def __init__(self, median, p95=None):
+        self.median = max(0.0, median)
+        self.p95 = max(self.median, p95 if p95 is not None else median)
+        # p95 = median * exp(1.645 * sigma)
+        self.sigma = math.log(self.p95 / self.median) / 1.645 if self.median and self.p95 > self.median else 0.0
+
+    @classmethod
+    def parse(cls, value):
+        """
+        "0.8" -> median 0.8s; "0.8:2.5" -> median 0.8s, p95 2.5s.
+        """
+        median, _, p95 = str(value).partition(":")
+        return cls(float(median), float(p95) if p95 else None)
+
+    def sample(self, rng=random):
+        if not self.median:
+            return 0.0
+        return self.median * math.exp(rng.gauss(0, self.sigma)) if self.sigma else self.median
+
+    def __repr__(self):
+        return f"{self.median:g}:{self.p95:g}"
+
+
+class FaultProfile:
+    """
+    Share of calls answered with a 429 and share failing outright.
+    """
+
+    def __init__(self, rate_429=0.0, failure_rate=0.0):
+        self.rate_429 = rate_429
+        self.failure_rate = failure_rate
+
+    def draw(self, rng=random):
+        """
+        Returns None, "429" or "failure".
+        """
+        roll = rng.random()
+        if roll < self.rate_429:
+            return "429"
+        if roll < self.rate_429 + self.failure_rate:
+            return "failure"
+        return None
+
+
+def synthetic_track(query, song_seconds):
+    """
+    Deterministic LRCLIB-style track with synced lyrics for any query.
+    """
+    seed = zlib.crc32(query.encode("utf-8"))
+    rng = random.Random(seed)
+    lines = []
+    t = rng.uniform(0.5, 3.0)
+    while t < song_seconds:
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 7)))
+        minutes, seconds = divmod(t, 60)
+        lines.append(f"[{int(minutes):02d}:{seconds:05.2f}] {text.capitalize()}")
+        t += rng.uniform(2.5, 5.0)
+    title, _, artist = query.partition(" - ")
+    return {
+        "id": seed & 0x7FFFFFFF,
+        "trackName": title or query,
+        "artistName": artist or "Load Test",
+        "albumName": "Synthetic",
+        "duration": song_seconds,
+        "syncedLyrics": "\n".join(lines),
+        "plainLyrics": "\n".join(line.split("] ", 1)[1] for line in lines),
+    }
+
+
+def _find_ffmpeg():
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        return ffmpeg
+    try:
+        import imageio_ffmpeg
+
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return None
+
+
+def make_test_clip(path, seconds=6):
+    """
+    Renders a small test-pattern MP4 served as every fake recording.
+    Returns True on success.
+    """
+    ffmpeg = _find_ffmpeg()
+    if not ffmpeg:
+        print("⚠️ No ffmpeg found: fake recordings will not be valid videos, stitching will fail.")
+        return False
+    command = [
+        ffmpeg,
+        "-v",
+        "error",
+        "-f",
+        "lavfi",
+        "-i",
+        f"testsrc=size=640x360:rate=24:duration={seconds}",
+        "-pix_fmt",
+        "yuv420p",
+        "-y",
+        path,
+    ]
+    result = subprocess.run(command, capture_output=True, text=True, check=False)
+    if result.returncode != 0:
+        print(f"⚠️ Could not render the fake recording: {result.stderr.strip()}")
+        return False
+    return True
+
+
+class FakeProviders:
+    """
+    Starts the fake LRCLIB/media server and swaps fake Gemini and Odyssey
+    clients into the pipeline. Use as a context manager:
+
+        with FakeProviders(image_latency=LatencyProfile(4, 9)) as fakes:
+            run_video_generation(job.id)
+        print(fakes.stats())
+    """
+
+    def __init__(
+        self,
+        song_seconds=30,
+        lrclib_latency=LatencyProfile(0.15, 0.6),
+        text_latency=LatencyProfile(0.8, 2.0),
+        image_latency=LatencyProfile(5.0, 12.0),
+        connect_latency=LatencyProfile(1.5, 4.0),
+        recording_latency=LatencyProfile(4.0, 10.0),
+        lrclib_faults=FaultProfile(),
+        gemini_faults=FaultProfile(),
+        odyssey_faults=FaultProfile(),
+        seed=None,
+    ):
+        self.song_seconds = song_seconds
+        self.lrclib_latency = lrclib_latency
+        self.text_latency = text_latency
+        self.image_latency = image_latency
+        self.connect_latency = connect_latency
+        self.recording_latency = recording_latency
+        self.lrclib_faults = lrclib_faults
+        self.gemini_faults = gemini_faults
+        self.odyssey_faults = odyssey_faults
+        self.rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+        self._tracks = {}
+        self._recordings = {}
+        self._server = None
+        self._restore = []
+        self.workdir = None
+        self.url = None
+        self.image_bytes = b""
+        self.clip_bytes = b""
+
+    # Shared helpers
+
+    def count(self, stat, amount=1):
+        with self._stats_lock:
+            self._stats[stat] = self._stats.get(stat, 0) + amount
+
+    def _draw(self, profile):
+        with self._rng_lock:
+            return profile.sample(self.rng)
+
+    def _fault(self, faults, provider):
+        with self._rng_lock:
+            fault = faults.draw(self.rng)
+        if fault:
+            self.count(f"{provider}_{fault}")
+        return fault
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(sorted(self._stats.items()))
+
+    # Lifecycle
+
+    def start(self):
+        self.workdir = tempfile.mkdtemp(prefix="fake_providers_")
+
+        # A noisy 1024x1024 PNG costs about as much to decode as a real one
+        buffer = io.BytesIO()
+        noise = PILImage.effect_noise((1024, 1024), 48).convert("RGB")
+        noise.save(buffer, "PNG")
+        self.image_bytes = buffer.getvalue()
+
+        clip_path = os.path.join(self.workdir, "recording.mp4")
+        if make_test_clip(clip_path):
+            with open(clip_path, "rb") as f:
+                self.clip_bytes = f.read()
+        else:
+            self.clip_bytes = b"\0" * 1024
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _handler_for(self))
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, name="fake-providers", daemon=True
+        ).start()
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        print(f"🧪 Fake providers listening on {self.url}")
+        return self
+
+    def install(self):
+        """
+        Points the shared LRCLIB clients at the local server and swaps in
+        the fake Gemini and Odyssey clients.
+        """
+        try:
+            from .gemini_client import gemini
+            from .lrclib_client import async_lrclib, lrclib
+            from .odyssey_pool import odyssey_pools
+        except ImportError:
+            from gemini_client import gemini
+            from lrclib_client import async_lrclib, lrclib
+            from odyssey_pool import odyssey_pools
+
+        self._patch(lrclib, "base_url", self.url)
+        self._patch(async_lrclib, "base_url", self.url)
+        # Async LRCLIB clients are cached per loop with the old base URL
+        async_lrclib._clients.clear()
+        self._patch(gemini, "client_factory", partial(FakeGeminiClient, self))
+        gemini.reset()
+        self._patch(odyssey_pools, "client_factory", partial(FakeOdyssey, self))
+        for key in ("GOOGLE_API_KEY", "ODYSSEY_API_KEY"):
+            if not os.environ.get(key):
+                self._restore.append(partial(os.environ.pop, key, None))
+                os.environ[key] = "fake"
+        return self
+
+    def _patch(self, target, name, value):
+        self._restore.append(partial(setattr, target, name, getattr(target, name)))
+        setattr(target, name, value)
+
+    def uninstall(self):
+        for restore in reversed(self._restore):
+            restore()
+        self._restore = []
+        try:
+            from .gemini_client import gemini
+        except ImportError:
+            from gemini_client import gemini
+        gemini.reset()
+
+    def stop(self):
+        self.uninstall()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self.workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start().install()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    # LRCLIB
+
+    def track(self, query):
+        track = synthetic_track(query, self.song_seconds)
+        self._tracks[track["id"]] = query
+        return track
+
+    def track_by_id(self, track_id):
+        query = self._tracks.get(track_id)
+        return self.track(query) if query is not None else None
+
+    # Gemini
+
+    def gemini_call(self, model, contents, config):
+        """
+        Returns (delay, response or exception) for one generate_content call.
+        """
+        is_image = "image" in model
+        delay = self._draw(self.image_latency if is_image else self.text_latency)
+        self.count("gemini_image_calls" if is_image else "gemini_text_calls")
+
+        fault = self._fault(self.gemini_faults, "gemini")
+        if fault == "429":
+            return delay / 10, Exception("429 RESOURCE_EXHAUSTED: fake quota exceeded")
+        if fault == "failure":
+            return delay, Exception("500 INTERNAL: injected failure")
+
+        if is_image:
+            part = SimpleNamespace(
+                inline_data=SimpleNamespace(data=self.image_bytes, mime_type="image/png"),
+                text=None,
+            )
+            return delay, SimpleNamespace(parts=[part], text=None)
+
+        prompt = "\n".join(str(c) for c in contents)
+        if config and config.get("response_mime_type") == "application/json":
+            songs = prompt.count("### Song ")
+            text = json.dumps(
+                [{"id": i, "sentiment": "Melancholic and Reflective"} for i in range(songs)]
+            )
+        else:
+            text = "Melancholic and Reflective"
+        part = SimpleNamespace(inline_data=None, text=text)
+        return delay, SimpleNamespace(parts=[part], text=text)
+
+    # Odyssey
+
+    def end_recording(self, stream_id):
+        self._recordings[stream_id] = time.monotonic() + self._draw(self.recording_latency)
+
+    def recording_ready(self, stream_id):
+        ready_at = self._recordings.get(stream_id)
+        return ready_at is not None and time.monotonic() >= ready_at
+
+
+def _handler_for(providers):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_recording(self):
+            providers.count("recording_downloads")
+            body = providers.clip_bytes
+            offset = 0
+            range_header = self.headers.get("Range", "")
+            if range_header.startswith("bytes=") and range_header.endswith("-"):
+                offset = min(int(range_header[6:-1] or 0), len(body))
+                providers.count("recording_range_requests")
+            self.send_response(206 if offset else 200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(len(body) - offset))
+            if offset:
+                self.send_header("Content-Range", f"bytes {offset}-{len(body) - 1}/{len(body)}")
+            self.end_headers()
+            if providers._fault(providers.odyssey_faults, "download") == "failure":
+                # Drop the connection halfway through the body
+                self.wfile.write(body[offset : offset + (len(body) - offset) // 2])
+                self.close_connection = True
+                return
+            self.wfile.write(body[offset:])
+
+        def _send_json(self, status, payload):
+            self._send(status, json.dumps(payload).encode("utf-8"))
+
+        def do_GET(self):
+            url = urlparse(self.path)
+
+            if url.path.startswith("/media/"):
+                return self._send_recording()
+
+            providers.count("lrclib_requests")
+            time.sleep(providers._draw(providers.lrclib_latency))
+            fault = providers._fault(providers.lrclib_faults, "lrclib")
+            if fault == "429":
+                return self._send_json(429, {"message": "fake rate limit"})
+            if fault == "failure":
+                return self._send_json(503, {"message": "injected failure"})
+
+            if url.path == "/api/search":
+                query = parse_qs(url.query).get("q", [""])[0]
+                return self._send_json(200, [providers.track(query)] if query else [])
+            if url.path.startswith("/api/get/"):
+                try:
+                    track = providers.track_by_id(int(url.path.rsplit("/", 1)[1]))
+                except ValueError:
+                    track = None
+                if track is None:
+                    return self._send_json(404, {"message": "not found"})
+                return self._send_json(200, track)
+            return self._send_json(404, {"message": "not found"})
+
+    return Handler
+
+
+class _FakeModels:
+    def __init__(self, providers):
+        self.providers = providers
+
+    def generate_content(self, model, contents, config=None):
+        delay, result = self.providers.gemini_call(model, contents, config)
+        time.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class _FakeAsyncModels:
+    def __init__(self, providers):
+        self.providers = providers
+
+    async def generate_content(self, model, contents, config=None):
+        delay, result = self.providers.gemini_call(model, contents, config)
+        await asyncio.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class FakeGeminiClient:
+    """
+    Mimics the parts of `genai.Client` the pipeline uses.
+    """
+
+    def __init__(self, providers, api_key=None):
+        self.models = _FakeModels(providers)
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(providers))
+
+
+class FakeOdyssey:
+    """
+    Mimics the Odyssey client: connect, stream, end, fetch the recording.
+    Recordings become available a sampled delay after end_stream(); while a
+    stream runs, small solid-colour frames are delivered to on_video_frame.
+    """
+
+    FRAME_SIZE = (320, 180)
+    FRAME_RATE = 24
+
+    def __init__(self, providers, api_key=None):
+        self.providers = providers
+        self.connected = False
+        self._stream_id = None
+        self._on_video_frame = None
+        self._frames_task = None
+
+    async def _maybe_fail(self, what):
+        fault = self.providers._fault(self.providers.odyssey_faults, "odyssey")
+        if fault == "429":
+            raise Exception(f"429 Too Many Requests ({what})")
+        if fault == "failure":
+            raise Exception(f"Injected Odyssey failure ({what})")
+
+    async def connect(self, on_video_frame=None, **kwargs):
+        self.providers.count("odyssey_connects")
+        await asyncio.sleep(self.providers._draw(self.providers.connect_latency))
+        await self._maybe_fail("connect")
+        self._on_video_frame = on_video_frame
+        self.connected = True
+
+    async def _emit_frames(self):
+        width, height = self.FRAME_SIZE
+        index = 0
+        while True:
+            shade = (index * 4) % 256
+            frame = SimpleNamespace(
+                data=bytes((shade, 64, 255 - shade)) * (width * height),
+                width=width,
+                height=height,
+            )
+            if self._on_video_frame is not None:
+                self._on_video_frame(frame)
+            index += 1
+            await asyncio.sleep(1 / self.FRAME_RATE)
+
+    async def start_stream(self, prompt, portrait=False, image=None, **kwargs):
+        if not self.connected:
+            raise Exception("Not connected")
+        await asyncio.sleep(0.05)
+        await self._maybe_fail("start_stream")
+        self.providers.count("odyssey_streams")
+        self._stream_id = uuid.uuid4().hex
+        self._frames_task = asyncio.create_task(self._emit_frames())
+        return self._stream_id
+
+    async def end_stream(self):
+        if self._frames_task is not None:
+            self._frames_task.cancel()
+            self._frames_task = None
+        if self._stream_id:
+            self.providers.end_recording(self._stream_id)
+        self._stream_id = None
+
+    async def get_recording(self, stream_id):
+        self.providers.count("odyssey_recording_polls")
+        await asyncio.sleep(0.02)
+        if not self.providers.recording_ready(stream_id):
+            raise Exception(f"Recording {stream_id} not found")
+        return SimpleNamespace(video_url=f"{self.providers.url}/media/{stream_id}.mp4")
+
+    async def disconnect(self):
+        if self._frames_task is not None:
+            self._frames_task.cancel()
+            self._frames_task = None
+        self.connected = False
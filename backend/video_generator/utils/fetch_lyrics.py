@@ -1,6 +1,48 @@
-import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+try:
+    from .local_index import local_index
+    from .lrclib_client import async_lrclib, lrclib
+    from .lyrics_cache import lyrics_cache
+except ImportError:
+    from local_index import local_index
+    from lrclib_client import async_lrclib, lrclib
+    from lyrics_cache import lyrics_cache
+
+
+def track_from_result(item):
+    """
+    Converts an LRCLIB API result into the track dict stored in the lyrics cache.
+    Prefers syncedLyrics and falls back to plainLyrics.
+    """
+    return {
+        "id": item.get("id"),
+        "title": item.get("trackName", "Unknown Track"),
+        "artist": item.get("artistName", "Unknown Artist"),
+        "album": item.get("albumName", "Unknown Album"),
+        "duration": item.get("duration"),
+        "lyrics": item.get("syncedLyrics") or item.get("plainLyrics"),
+        "synced": bool(item.get("syncedLyrics")),
+    }
+
+
+def get_song_track(query):
+    """
+    Returns the best LRCLIB match for a query as a track dict
+    (id, title, artist, album, duration, lyrics, synced), or None.
+    Served from the shared lyrics cache or the local index when possible.
+    """
+    cached = lyrics_cache.get(query)
+    if cached:
+        print(f"⚡ Lyrics cache hit for: '{query}' (LRCLIB id {cached['id']})")
+        return cached
+
+    local = _local_search(query)
+    if local:
+        return local
+
+    track = search_song_track(query)
+    if track and track.get("lyrics"):
+        lyrics_cache.set(query, track)
+    return track
 
 
 def get_song_lyrics(query):
@@ -8,57 +50,154 @@ def get_song_lyrics(query):
     Fetches lyrics from LRCLIB.net based on a search query (Song Title + Artist).
     Returns the plain lyrics if found, or None.
     """
-    base_url = "https://lrclib.net/api/search"
-    params = {"q": query}
+    track = get_song_track(query)
+    if not track:
+        return None
+    return track.get("lyrics")
 
+
+def search_song_track(query):
+    """
+    Searches LRCLIB.net directly (bypassing the cache) and returns the best match
+    as a track dict, or None.
+    """
     print(f"🔍 Searching LRCLIB for: '{query}'...")
 
     try:
-        # Configure retries
-        session = requests.Session()
-        retries = Retry(
-            total=5,
-            backoff_factor=1,
-            status_forcelist=[500, 502, 503, 504],
-            allowed_methods=["GET"],
-        )
-        session.mount("https://", HTTPAdapter(max_retries=retries))
-
-        # LRCLIB encourages a user agent
-        headers = {
-            "User-Agent": "OdysseyHackathonBot/1.0 (https://github.com/odysseyml/odyssey-hackathon)"
-        }
-
-        # Increased timeout and verify=True (default)
-        response = session.get(base_url, params=params, headers=headers, timeout=15)
-        response.raise_for_status()
-
-        results = response.json()
-
-        if not results:
-            print("❌ No results found.")
-            return None
-
-        # Get the best match (usually the first one)
-        track = results[0]
-        artist = track.get("artistName", "Unknown Artist")
-        title = track.get("trackName", "Unknown Track")
-        album = track.get("albumName", "Unknown Album")
-
-        print(f"✅ Found: '{title}' by '{artist}' (Album: {album})")
-
-        # Prefer syncedLyrics, fall back to plainLyrics
-        lyrics = track.get("syncedLyrics")
-        if not lyrics:
-            print("⚠️ No synced lyrics found, checking for plain lyrics...")
-            lyrics = track.get("plainLyrics")
-
-        return lyrics
+        results = lrclib.search(query)
+    except Exception as e:
+        print(f"❌ Error fetching lyrics: {e}")
+        return None
+
+    return _best_match(results)
+
+
+def get_song_track_by_id(track_id):
+    """
+    Returns the LRCLIB track with the given id as a track dict, or None.
+    Used when the user already picked a search suggestion, so no second search is needed.
+    """
+    cached = lyrics_cache.get_by_id(track_id)
+    if cached:
+        print(f"⚡ Lyrics cache hit for LRCLIB id {track_id}")
+        return cached
+
+    local = local_index.get(track_id)
+    if local:
+        print(f"📚 Local index hit for LRCLIB id {track_id}")
+        return track_from_result(local)
+
+    print(f"🔍 Fetching LRCLIB track {track_id}...")
+    try:
+        item = lrclib.get(track_id)
+    except Exception as e:
+        print(f"❌ Error fetching lyrics: {e}")
+        return None
+
+    return _store_by_id(item)
+
+
+async def async_get_song_track(query):
+    """
+    asyncio variant of get_song_track for the async pipeline.
+    """
+    cached = lyrics_cache.get(query)
+    if cached:
+        print(f"⚡ Lyrics cache hit for: '{query}' (LRCLIB id {cached['id']})")
+        return cached
+
+    local = _local_search(query)
+    if local:
+        return local
+
+    print(f"🔍 Searching LRCLIB for: '{query}'...")
+    try:
+        results = await async_lrclib.search(query)
+    except Exception as e:
+        print(f"❌ Error fetching lyrics: {e}")
+        return None
+
+    track = _best_match(results)
+    if track and track.get("lyrics"):
+        lyrics_cache.set(query, track)
+    return track
+
+
+async def async_get_song_lyrics(query):
+    """
+    asyncio variant of get_song_lyrics.
+    """
+    track = await async_get_song_track(query)
+    if not track:
+        return None
+    return track.get("lyrics")
+
+
+async def async_get_song_track_by_id(track_id):
+    """
+    asyncio variant of get_song_track_by_id.
+    """
+    cached = lyrics_cache.get_by_id(track_id)
+    if cached:
+        print(f"⚡ Lyrics cache hit for LRCLIB id {track_id}")
+        return cached
+
+    local = local_index.get(track_id)
+    if local:
+        print(f"📚 Local index hit for LRCLIB id {track_id}")
+        return track_from_result(local)
 
+    print(f"🔍 Fetching LRCLIB track {track_id}...")
+    try:
+        item = await async_lrclib.get(track_id)
     except Exception as e:
         print(f"❌ Error fetching lyrics: {e}")
         return None
 
+    return _store_by_id(item)
+
+
+def _local_search(query):
+    results = local_index.search(query, limit=1)
+    if not results:
+        return None
+    track = track_from_result(results[0])
+    if not track.get("lyrics"):
+        return None
+    print(f"📚 Local index hit: '{track['title']}' by '{track['artist']}'")
+    return track
+
+
+def _best_match(results):
+    if not results:
+        print("❌ No results found.")
+        return None
+
+    # Get the best match (usually the first one)
+    track = track_from_result(results[0])
+
+    print(
+        f"✅ Found: '{track['title']}' by '{track['artist']}' (Album: {track['album']})"
+    )
+
+    if not track["synced"]:
+        print("⚠️ No synced lyrics found, checking for plain lyrics...")
+
+    return track
+
+
+def _store_by_id(item):
+    if not item:
+        print("❌ Track not found.")
+        return None
+
+    track = track_from_result(item)
+    print(f"✅ Found: '{track['title']}' by '{track['artist']}'")
+    if track.get("lyrics"):
+        # Cache under the same query the worker will build from the job
+        lyrics_cache.set(f"{track['title']} {track['artist']}", track)
+    return track
+
 
 if __name__ == "__main__":
     search_query = input("Enter song name and artist: ")
@@ -0,0 +1,188 @@
+import asyncio
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+try:
+    from .stats_registry import register_stats
+except ImportError:
+    from stats_registry import register_stats
+
+# Encode the frames of the Odyssey stream locally instead of downloading
+# the server-side recording (which then only serves as a fallback)
+FRAME_CAPTURE = os.environ.get("FRAME_CAPTURE", "0").lower() in ("1", "true", "yes", "on")
+FRAME_CAPTURE_FPS = int(os.environ.get("FRAME_CAPTURE_FPS", 24))
+# Frames buffered between the stream callback and the encoder before dropping
+FRAME_CAPTURE_BUFFER = int(os.environ.get("FRAME_CAPTURE_BUFFER", 48))
+
+_STOP = object()
+
+
+def _frame_bytes(frame):
+    """
+    Returns (width, height, channels, raw bytes) of an Odyssey video frame:
+    either an object with a (H, W, C) uint8 `data` array, or raw RGB bytes
+    with `width`/`height`.
+    """
+    data = getattr(frame, "data", frame)
+    shape = getattr(data, "shape", None)
+    if shape is not None:
+        height, width = shape[0], shape[1]
+        channels = shape[2] if len(shape) > 2 else 1
+        return width, height, channels, data.tobytes()
+    width, height = frame.width, frame.height
+    raw = bytes(data)
+    return width, height, len(raw) // (width * height), raw
+
+
+class FrameRecorder:
+    """
+    Pipes the frames of one stream into an ffmpeg process (rawvideo on
+    stdin) and produces an MP4 once the stream ends.
+
+    `on_frame` is called by the Odyssey client and only enqueues; a writer
+    thread feeds ffmpeg at a constant FRAME_CAPTURE_FPS, repeating or
+    skipping frames according to their arrival time. Frames that arrive
+    while the buffer is full are dropped.
+    """
+
+    def __init__(self, output_file, fps=FRAME_CAPTURE_FPS, buffer=FRAME_CAPTURE_BUFFER):
+        self.output_file = output_file
+        self.fps = fps
+        self.frames = 0
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=buffer)
+        self._process = None
+        self._started_at = None
+        self._error = None
+        self._tmp_file = f"{output_file}.capture.mp4"
+        self._writer = threading.Thread(target=self._write_frames, daemon=True)
+        self._writer.start()
+
+    def on_frame(self, frame):
+        if self._started_at is None:
+            self._started_at = time.monotonic()
+        try:
+            self._queue.put_nowait((time.monotonic() - self._started_at, frame))
+        except queue.Full:
+            self.dropped += 1
+
+    def _start_encoder(self, width, height, channels):
+        ffmpeg = shutil.which("ffmpeg")
+        if not ffmpeg:
+            raise RuntimeError("ffmpeg is not installed or not in your PATH.")
+        pix_fmt = {1: "gray", 3: "rgb24", 4: "rgba"}[channels]
+        command = [
+            ffmpeg,
+            "-v",
+            "error",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            pix_fmt,
+            "-s",
+            f"{width}x{height}",
+            "-framerate",
+            str(self.fps),
+            "-i",
+            "-",
+            "-c:v",
+            "libx264",
+            "-preset",
+            "veryfast",
+            "-pix_fmt",
+            "yuv420p",
+            "-movflags",
+            "+faststart",
+            "-y",
+            self._tmp_file,
+        ]
+        return subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+
+    def _write_frames(self):
+        size = None
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    return
+                offset, frame = item
+                width, height, channels, raw = _frame_bytes(frame)
+                if self._process is None:
+                    size = (width, height, channels)
+                    self._process = self._start_encoder(*size)
+                elif (width, height, channels) != size:
+                    continue  # The encoder cannot change resolution mid-stream
+                self.frames += 1
+                # Constant frame rate: a frame ahead of its slot is skipped,
+                # one after a gap is repeated until the gap is filled
+                target = round(offset * self.fps) + 1
+                while self.written < target:
+                    self._process.stdin.write(raw)
+                    self.written += 1
+        except Exception as e:
+            self._error = e
+            # Keep draining so on_frame never blocks
+            while self._queue.get() is not _STOP:
+                pass
+
+    def _close(self):
+        self._queue.put(_STOP)
+        self._writer.join()
+        if self._process is None:
+            return None
+        # Closes stdin (end of input) and waits for the encoder
+        _, stderr = self._process.communicate()
+        if self._error is not None:
+            print(f"   ⚠️ Frame capture failed: {self._error}")
+            return None
+        if self._process.returncode != 0:
+            print(f"   ⚠️ Frame encoder failed: {stderr.decode(errors='replace').strip()}")
+            return None
+        if not self.frames:
+            return None
+        os.replace(self._tmp_file, self.output_file)
+        return self.output_file
+
+    async def finish(self):
+        """
+        Flushes the encoder. Returns the MP4 path, or None if nothing usable
+        was captured (the caller then falls back to the recording).
+        """
+        try:
+            result = await asyncio.to_thread(self._close)
+        except Exception as e:
+            print(f"   ⚠️ Frame capture failed: {e}")
+            result = None
+        if result is None and os.path.exists(self._tmp_file):
+            os.remove(self._tmp_file)
+        frame_capture_stats.record(result is not None, self.frames, self.dropped)
+        return result
+
+
+class FrameCaptureStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"captured": 0, "fallbacks": 0, "frames": 0, "dropped_frames": 0}
+
+    def record(self, ok, frames, dropped):
+        with self._lock:
+            self._stats["captured" if ok else "fallbacks"] += 1
+            self._stats["frames"] += frames
+            self._stats["dropped_frames"] += dropped
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["enabled"] = FRAME_CAPTURE
+        return stats
+
+
+frame_capture_stats = FrameCaptureStats()
+register_stats("frame_capture", frame_capture_stats.stats)
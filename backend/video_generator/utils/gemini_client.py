@@ -0,0 +1,149 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+from dotenv import load_dotenv
+from google import genai
+
+try:
+    from .latency_stats import LatencyStats
+    from .stats_registry import register_stats
+except ImportError:
+    from latency_stats import LatencyStats
+    from stats_registry import register_stats
+
+# Load environment variables
+load_dotenv()
+
+# Per-request timeout in seconds (image generation can take a while)
+GEMINI_TIMEOUT = float(os.environ.get("GEMINI_TIMEOUT", 120))
+GEMINI_POOL_SIZE = int(os.environ.get("GEMINI_POOL_SIZE", 16))
+
+
+class GeminiProvider:
+    """
+    Process-wide source of Gemini clients.
+
+    The synchronous client (and its keep-alive connection pool) is created
+    once and shared by every thread. Async clients are bound to the event
+    loop that uses them, and each job runs its own `asyncio.run`, so one
+    client is kept per running loop. `generate_content` and
+    `agenerate_content` wrap the SDK calls and record per-model latency.
+    """
+
+    def __init__(self, timeout=GEMINI_TIMEOUT, pool_size=GEMINI_POOL_SIZE, client_factory=None):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        # Optional callable(api_key) -> client, e.g. the offline fakes of the load test
+        self.client_factory = client_factory
+        self.latency = LatencyStats()
+        self._lock = threading.Lock()
+        self._client = None
+        self._api_key = None
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def _new_client(self, api_key):
+        if self.client_factory is not None:
+            return self.client_factory(api_key)
+        limits = {
+            "max_connections": self.pool_size,
+            "max_keepalive_connections": self.pool_size,
+        }
+        try:
+            import httpx
+
+            http_options = genai.types.HttpOptions(
+                timeout=int(self.timeout * 1000),
+                client_args={"limits": httpx.Limits(**limits)},
+                async_client_args={"limits": httpx.Limits(**limits)},
+            )
+        except Exception:
+            # Older SDKs only accept a timeout
+            http_options = genai.types.HttpOptions(timeout=int(self.timeout * 1000))
+        return genai.Client(api_key=api_key, http_options=http_options)
+
+    def _api_key_or_raise(self):
+        api_key = os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            raise RuntimeError("GOOGLE_API_KEY not found in environment variables.")
+        return api_key
+
+    def reset(self):
+        """
+        Drops the cached clients so the next call builds new ones.
+        """
+        with self._lock:
+            self._client = None
+            self._api_key = None
+            self._async_clients = weakref.WeakKeyDictionary()
+
+    def client(self):
+        """
+        Returns the shared synchronous client.
+        """
+        api_key = self._api_key_or_raise()
+        with self._lock:
+            if self._client is None or self._api_key != api_key:
+                self._client = self._new_client(api_key)
+                self._api_key = api_key
+            return self._client
+
+    def aio(self):
+        """
+        Returns the async client (`client.aio`) for the running event loop.
+        """
+        api_key = self._api_key_or_raise()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._async_clients.get(loop)
+            if entry is None or entry[0] != api_key:
+                entry = (api_key, self._new_client(api_key))
+                self._async_clients[loop] = entry
+            return entry[1].aio
+
+    async def aclose(self):
+        """
+        Closes the async client of the running event loop (and its
+        connection pool). Call it when the job's loop is done.
+        """
+        with self._lock:
+            entry = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if entry is None:
+            return
+        aclose = getattr(entry[1].aio, "aclose", None)  # Older SDKs and the fakes have none
+        if aclose is not None:
+            await aclose()
+
+    def generate_content(self, model, contents, config=None):
+        started = time.monotonic()
+        ok = False
+        try:
+            response = self.client().models.generate_content(
+                model=model, contents=contents, config=config
+            )
+            ok = True
+            return response
+        finally:
+            self.latency.record(model, time.monotonic() - started, ok)
+
+    async def agenerate_content(self, model, contents, config=None):
+        started = time.monotonic()
+        ok = False
+        try:
+            response = await self.aio().models.generate_content(
+                model=model, contents=contents, config=config
+            )
+            ok = True
+            return response
+        finally:
+            self.latency.record(model, time.monotonic() - started, ok)
+
+    def stats(self):
+        return self.latency.stats()
+
+
+# Shared provider used by the image and sentiment utilities
+gemini = GeminiProvider()
+register_stats("gemini_latency", gemini.stats)
@@ -1,26 +1,39 @@
 import subprocess
 import asyncio
 import os
-import re
 import time
-import requests
 import sys
+from contextlib import AsyncExitStack
 from pathlib import Path
 from dotenv import load_dotenv
-from .fetch_lyrics import get_song_lyrics
-from .lyrics_to_image import generate_image_from_lyrics
+from .fetch_lyrics import async_get_song_lyrics, get_song_lyrics
+from .latency_stats import StageClock
+from .lrc_timeline import as_timeline, parse_lrc
+from .lrclib_client import async_lrclib
+from .segment_planner import SegmentPolicy, plan_segments
+from .lyrics_to_image import async_generate_image_from_lyrics, image_output_path
 from .sentiment_analysis import analyze_sentiment
-from odyssey import Odyssey
+from .frame_capture import FRAME_CAPTURE, FrameRecorder
+from .gemini_client import gemini
+from .odyssey_pool import odyssey_pools
+from .odyssey_recordings import (
+    recording_downloader,
+    recording_readiness,
+    wait_for_recording,
+)
+from .render_plan import CAPTION_STYLE, RenderSegment, build_render_plan, render
+from .segment_hedging import SegmentHedger
+from .stream_scheduler import stream_scheduler
 
 # Handle both relative and absolute imports
 try:
-    from .fetch_lyrics import get_song_lyrics
-    from .lyrics_to_image import generate_image_from_lyrics
+    from .fetch_lyrics import async_get_song_lyrics, get_song_lyrics
+    from .lyrics_to_image import async_generate_image_from_lyrics, image_output_path
 except ImportError:
     # When run directly, use absolute imports
     sys.path.insert(0, os.path.dirname(__file__))
-    from fetch_lyrics import get_song_lyrics
-    from lyrics_to_image import generate_image_from_lyrics
+    from fetch_lyrics import async_get_song_lyrics, get_song_lyrics
+    from lyrics_to_image import async_generate_image_from_lyrics, image_output_path
 
 # Load environment variables
 load_dotenv()
@@ -28,80 +41,16 @@ load_dotenv()
 # Maximum video duration in seconds
 MAX_VIDEO_DURATION = 40  # 1 minute max
 
-
-def get_video_duration(video_path):
-    """
-    Gets the actual duration of a video file in seconds using ffprobe.
-    Returns None if the duration cannot be determined.
-    """
-    try:
-        command = [
-            "ffprobe",
-            "-v",
-            "error",
-            "-show_entries",
-            "format=duration",
-            "-of",
-            "default=noprint_wrappers=1:nokey=1:nokey=1",
-            video_path,
-        ]
-        result = subprocess.run(command, capture_output=True, text=True, check=False)
-        if result.returncode == 0 and result.stdout.strip():
-            return float(result.stdout.strip())
-    except Exception as e:
-        print(f"⚠️ Error getting video duration for {video_path}: {e}")
-    return None
-
-
-def trim_video_to_duration(input_video, output_video, max_duration):
-    """
-    Trims a video to a maximum duration using FFmpeg.
-    Returns True if successful, False otherwise.
-    """
-    try:
-        command = [
-            "ffmpeg",
-            "-i",
-            input_video,
-            "-t",
-            str(max_duration),
-            "-c:v",
-            "copy",
-            "-c:a",
-            "copy",
-            "-y",
-            output_video,
-        ]
-        result = subprocess.run(command, capture_output=True, text=True, check=False)
-        if result.returncode == 0:
-            print(f"   ✅ Trimmed {os.path.basename(input_video)} to {max_duration}s")
-            return True
-        else:
-            print(f"   ⚠️ Failed to trim video: {result.stderr}")
-            return False
-    except Exception as e:
-        print(f"   ⚠️ Error trimming video: {e}")
-        return False
+# Segment plan for the CLI: lyric-aligned segments of at most 5 seconds
+CLI_POLICY = SegmentPolicy(max_segment=5, max_total=MAX_VIDEO_DURATION)
 
 
 def parse_lrc_lyrics(lrc_text):
     """
-    Parses LRC lyrics into a list of (timestamp_seconds, text).
+    Parses LRC lyrics into a LyricTimeline of (timestamp_seconds, text) lines.
+    See lrc_timeline.parse_lrc for the supported LRC extensions.
     """
-    lines = []
-    # Regex for [mm:ss.xx] or [mm:ss]
-    pattern = re.compile(r"\[(\d+):(\d+(?:\.\d+)?)\](.*)")
-
-    for line in lrc_text.split("\n"):
-        match = pattern.match(line.strip())
-        if match:
-            minutes = int(match.group(1))
-            seconds = float(match.group(2))
-            text = match.group(3).strip()
-            total_seconds = minutes * 60 + seconds
-            lines.append((total_seconds, text))
-
-    return sorted(lines, key=lambda x: x[0])
+    return parse_lrc(lrc_text)
 
 
 def get_intelligent_segments(parsed_lyrics, max_duration=5):
@@ -109,75 +58,17 @@ def get_intelligent_segments(parsed_lyrics, max_duration=5):
     Creates video segments based on LRC timestamps (max_duration per segment).
     If a gap between lyrics is > max_duration, subdivides it equally.
     Returns list of (segment_index, start_time, end_time, lyrics_text).
-    Respects MAX_VIDEO_DURATION limit.
+    Respects MAX_VIDEO_DURATION limit. See segment_planner.plan_segments.
     """
-    if not parsed_lyrics:
-        # No lyrics - create a single segment
-        return [(0, 0, min(10, MAX_VIDEO_DURATION), "(Instrumental / Music)")]
-
-    segments = []
-    segment_index = 0
-
-    # Get total duration from last timestamp + 5 seconds buffer, but cap at MAX_VIDEO_DURATION
-    total_duration = min(parsed_lyrics[-1][0] + 5, MAX_VIDEO_DURATION)
-
-    current_time = 0
-
-    for idx, (timestamp, text) in enumerate(parsed_lyrics):
-        # If there's a large gap before this timestamp, fill it
-        if timestamp - current_time > max_duration:
-            gap_duration = timestamp - current_time
-            num_sub_segments = int(gap_duration / max_duration) + (
-                1 if gap_duration % max_duration else 0
-            )
-            sub_duration = gap_duration / num_sub_segments
-
-            for j in range(num_sub_segments):
-                seg_start = current_time + (j * sub_duration)
-                seg_end = current_time + ((j + 1) * sub_duration)
-                segments.append(
-                    (segment_index, seg_start, seg_end, "(Instrumental / Music)")
-                )
-                segment_index += 1
-
-            current_time = timestamp
-
-        # Now add segment for the current lyric
-        # Look ahead to next timestamp (or use max_duration)
-        if idx + 1 < len(parsed_lyrics):
-            next_timestamp = parsed_lyrics[idx + 1][0]
-            end_time = min(current_time + max_duration, next_timestamp)
-        else:
-            end_time = current_time + max_duration
-
-        # Collect all lyrics until end_time
-        segment_lyrics = text
-        for future_idx in range(idx + 1, len(parsed_lyrics)):
-            if parsed_lyrics[future_idx][0] < end_time:
-                segment_lyrics += " " + parsed_lyrics[future_idx][1]
-            else:
-                break
-
-        segments.append((segment_index, current_time, end_time, segment_lyrics.strip()))
-        segment_index += 1
-        current_time = end_time
-
-        # Stop if we've gone past total duration
-        if current_time >= total_duration:
-            break
-
-    return segments
+    policy = SegmentPolicy(max_segment=max_duration, max_total=MAX_VIDEO_DURATION)
+    return list(plan_segments(parsed_lyrics, policy))
 
 
 def get_lyrics_for_interval(parsed_lyrics, start_time, end_time):
     """
     Returns text of lyrics that fall within the interval.
     """
-    texts = []
-    for t, text in parsed_lyrics:
-        if start_time <= t < end_time:
-            texts.append(text)
-    return " ".join(texts).strip()
+    return as_timeline(parsed_lyrics).text_between(start_time, end_time)
 
 
 def create_captions_file(lyrics, captions_path):
@@ -212,7 +103,7 @@ def add_lyrics_to_video(input_video, captions_path, output_video):
         abs_captions_path = os.path.abspath(captions_path)
 
         # FFmpeg command with drawtext filter - NO QUOTES around file path for subprocess
-        filter_str = f"drawtext=textfile={abs_captions_path}:fontcolor=white:fontsize=36:x=(w-text_w)/2:y=h-100:line_spacing=4:box=1:boxcolor=black@0.5:boxborderw=5"
+        filter_str = f"drawtext=textfile={abs_captions_path}:{CAPTION_STYLE}"
 
         command = [
             "ffmpeg",
@@ -253,16 +144,26 @@ def add_lyrics_to_video(input_video, captions_path, output_video):
 
 
 async def generate_video_segment_independent(
-    image_path, prompt, output_filename, duration=5, captions_path=None, semaphore=None
+    image_path,
+    prompt,
+    output_filename,
+    duration=5,
+    captions_path=None,
+    semaphore=None,
+    job="default",
+    priority=0,
+    started=None,
 ):
     """
-    Generates a video segment using a dedicated Odyssey client instance.
-    Applies lyrics overlay if captions_path is provided.
+    Generates a video segment on a warm session leased from the event
+    loop's Odyssey pool. Applies lyrics overlay if captions_path is provided.
     This allows parallel execution if the API supports concurrent connections.
-    Uses a semaphore to limit concurrent connections to 3.
+    Streams wait for a slot of the process-wide scheduler, shared fairly
+    between jobs (`job`, `priority`), unless a semaphore is passed.
+    `started` (an asyncio.Event) is set once the slot was granted.
     """
     if semaphore is None:
-        semaphore = asyncio.Semaphore(3)
+        semaphore = stream_scheduler.slot(job, priority)
 
     # Check if video already exists (final or raw)
     raw_video_path = output_filename.replace(".mp4", "_raw.mp4")
@@ -285,53 +186,71 @@ async def generate_video_segment_independent(
             os.rename(raw_video_path, output_filename)
             return output_filename
 
-    async with semaphore:
-        print(f"🎬 Starting video generation for: {output_filename}")
+    recorder = captured = recording = None
 
-        odyssey_key = os.environ.get("ODYSSEY_API_KEY")
-        if not odyssey_key:
-            print("Error: ODYSSEY_API_KEY not found.")
-            return None
-
-        client = Odyssey(api_key=odyssey_key)
-
-        try:
-            await client.connect(on_video_frame=lambda f: None)
+    try:
+        async with AsyncExitStack() as leased:
+            async with semaphore:
+                if started is not None:
+                    started.set()
+                print(f"🎬 Starting video generation for: {output_filename}")
+
+                odyssey_key = os.environ.get("ODYSSEY_API_KEY")
+                if not odyssey_key:
+                    print("Error: ODYSSEY_API_KEY not found.")
+                    return None
+
+                # Optional local encoding of the streamed frames
+                recorder = FrameRecorder(raw_video_path) if FRAME_CAPTURE else None
+
+                # A pre-connected session: no handshake unless the pool is cold
+                session = await leased.enter_async_context(odyssey_pools.get().lease())
+                client = session.client
+                if recorder is not None:
+                    session.frame_handler = recorder.on_frame
+
+                # Start stream with image (using 'image' parameter, not deprecated 'image_path')
+                stream_id = await client.start_stream(
+                    prompt, portrait=False, image=image_path
+                )
+                print(f"   Stream started ({output_filename}): {stream_id}")
+
+                # Wait for the desired duration
+                await asyncio.sleep(duration)
+
+                # End stream
+                await client.end_stream()
+                print(f"   Stream ended ({output_filename}).")
+
+            # The stream slot is free again: the next segment can start
+            # streaming while this recording is being prepared. The session
+            # stays leased, so the recording is looked up on the connection
+            # that made it and the pool cannot hand it out or disconnect it.
+            if recorder is not None:
+                captured = await recorder.finish()
+                recorder = None
+                if not captured:
+                    print(f"   Frame capture unavailable, falling back to the recording ({output_filename}).")
+            if not captured:
+                recording = await wait_for_recording(client, stream_id, f"({output_filename})")
 
-            # Start stream with image (using 'image' parameter, not deprecated 'image_path')
-            stream_id = await client.start_stream(
-                prompt, portrait=False, image=image_path
-            )
-            print(f"   Stream started ({output_filename}): {stream_id}")
-
-            # Wait for the desired duration
-            await asyncio.sleep(duration)
-
-            # End stream
-            await client.end_stream()
-            print(f"   Stream ended ({output_filename}).")
-
-            # Wait for recording to be ready and retry if not found
-            recording = None
-            max_retries = 10  # Increased retries
-            for attempt in range(max_retries):
-                try:
-                    await asyncio.sleep(3)  # Wait 3 seconds before each attempt
-                    recording = await client.get_recording(stream_id)
-                    if recording and recording.video_url:
-                        break
-                except Exception as e:
-                    if attempt == max_retries - 1:
-                        print(
-                            f"   Failed to get recording after {max_retries} attempts: {e}"
-                        )
-                        # Don't raise, just let it fail gracefully
-                        print(
-                            f"   Retry {attempt + 1}/{max_retries} for {output_filename}: {e}"
-                        )
+    except Exception as e:
+        print(f"❌ Error generating video segment {output_filename}: {e}")
+        if recorder is not None:
+            await recorder.finish()
+        return None
+    except asyncio.CancelledError:
+        # E.g. the losing side of a hedged segment: stop the encoder too
+        if recorder is not None:
+            await recorder.finish()
+        raise
 
+    try:
+        if captured:
+            print(f"✅ Captured raw video segment from the stream: {raw_video_path}")
+        else:
             if not recording:
-                print(f"❌ Recording not found for {output_filename} after retries.")
+                print(f"❌ Recording not found for {output_filename} before the deadline.")
                 return None
 
             video_url = recording.video_url
@@ -341,173 +260,48 @@ async def generate_video_segment_independent(
                 return None
 
             print(f"   Downloading video from: {video_url}")
-            v_response = requests.get(video_url)
 
-            # Save raw video to temporary file
-            raw_video_path = output_filename.replace(".mp4", "_raw.mp4")
-            with open(raw_video_path, "wb") as f:
-                f.write(v_response.content)
+            # Stream the raw video to disk (resumable, published atomically)
+            await recording_downloader.download(video_url, raw_video_path)
             print(f"✅ Saved raw video segment: {raw_video_path}")
 
-            # Apply lyrics overlay if captions file provided
-            if captions_path and os.path.exists(captions_path):
-                final_video = add_lyrics_to_video(
-                    raw_video_path, captions_path, output_filename
-                )
-                # Clean up raw video after captions applied
-                if final_video == output_filename and os.path.exists(raw_video_path):
-                    os.remove(raw_video_path)
-                return final_video
-            else:
-                # No captions, return raw video
-                os.rename(raw_video_path, output_filename)
-                return output_filename
-
-        except Exception as e:
-            print(f"❌ Error generating video segment {output_filename}: {e}")
-            return None
-        finally:
-            await client.disconnect()
-
-
-def validate_and_trim_videos(video_files, max_duration=MAX_VIDEO_DURATION):
-    """
-    Validates video durations and trims files if necessary to stay within max_duration.
-    Returns a list of validated/trimmed video paths.
-    """
-    print(f"\n📏 Checking video durations (max: {max_duration}s)...")
-
-    validated_videos = []
-    total_duration = 0
-
-    for i, video_path in enumerate(video_files):
-        if not os.path.exists(video_path):
-            print(f"   ⚠️ Video not found: {video_path}")
-            continue
-
-        actual_duration = get_video_duration(video_path)
-        if actual_duration is None:
-            print(
-                f"   ⚠️ Could not determine duration of {os.path.basename(video_path)}"
-            )
-            validated_videos.append(video_path)
-            continue
-
-        remaining_budget = max_duration - total_duration
-
-        if actual_duration > remaining_budget:
-            # Need to trim this video
-            trimmed_path = video_path.replace(".mp4", "_trimmed.mp4")
-            print(
-                f"   ⚠️ {os.path.basename(video_path)}: {actual_duration:.1f}s exceeds budget of {remaining_budget:.1f}s"
+        # Apply lyrics overlay if captions file provided
+        if captions_path and os.path.exists(captions_path):
+            final_video = add_lyrics_to_video(
+                raw_video_path, captions_path, output_filename
             )
-
-            if trim_video_to_duration(video_path, trimmed_path, remaining_budget):
-                validated_videos.append(trimmed_path)
-                total_duration += remaining_budget
-                print(
-                    f"   ✅ Total duration so far: {total_duration:.1f}s / {max_duration}s"
-                )
-                # Stop if we've hit the max
-                if total_duration >= max_duration:
-                    print(
-                        f"   ⚠️ Reached maximum duration limit. Stopping video inclusion."
-                    )
-                    break
-            else:
-                # Trimming failed, skip this video
-                print(f"   ⚠️ Failed to trim {os.path.basename(video_path)}, skipping.")
+            # Clean up raw video after captions applied
+            if final_video == output_filename and os.path.exists(raw_video_path):
+                os.remove(raw_video_path)
+            return final_video
         else:
-            # Video fits within budget
-            validated_videos.append(video_path)
-            total_duration += actual_duration
-            print(
-                f"   ✅ {os.path.basename(video_path)}: {actual_duration:.1f}s (total: {total_duration:.1f}s / {max_duration}s)"
-            )
-
-            # Stop if we've hit the max
-            if total_duration >= max_duration:
-                print(f"   ⚠️ Reached maximum duration limit. Stopping video inclusion.")
-                break
-
-    print(f"\n📊 Final video duration: {total_duration:.1f}s / {max_duration}s")
-    return validated_videos
-
-
-def stitch_videos_ffmpeg(
-    video_files, output_filename="final_music_video.mp4", list_filename="list.txt"
-):
-    """
-    Stitches a list of video files together using FFmpeg.
-    Validates durations before stitching to ensure compliance with MAX_VIDEO_DURATION.
-    """
-    if not video_files:
-        print("No video files to stitch.")
-        return None
-
-    # Validate and trim videos to stay within max duration
-    video_files = validate_and_trim_videos(video_files, MAX_VIDEO_DURATION)
+            # No captions, return raw video
+            os.rename(raw_video_path, output_filename)
+            return output_filename
 
-    if not video_files:
-        print("No valid videos to stitch after validation.")
+    except Exception as e:
+        print(f"❌ Error generating video segment {output_filename}: {e}")
         return None
 
-    print("\n🧵 Stitching videos together with FFmpeg...")
 
+async def main(query=None):
     try:
-        # Get the song directory from the output filename
-        song_dir = os.path.dirname(output_filename)
-
-        # Create the list file for FFmpeg with relative paths
-        with open(list_filename, "w") as f:
-            for v in video_files:
-                f.write(f"file '{os.path.basename(v)}'\n")
-
-        # Run FFmpeg command from within the song directory
-        command = [
-            "ffmpeg",
-            "-f",
-            "concat",
-            "-safe",
-            "0",
-            "-i",
-            os.path.basename(list_filename),
-            "-c",
-            "copy",
-            os.path.basename(output_filename),
-            "-y",  # Overwrite output file if it exists
-        ]
-
-        result = subprocess.run(
-            command, check=True, capture_output=True, text=True, cwd=song_dir
-        )
-        print(result.stdout)
-        print(result.stderr)
-
-        print(f"\n🎉 Final video saved: {output_filename}")
-        return output_filename
-
-    except FileNotFoundError:
-        print("Error: ffmpeg is not installed or not in your PATH.")
-        print("Please install ffmpeg to use this feature.")
-    except subprocess.CalledProcessError as e:
-        print(f"Error during ffmpeg execution: {e}")
-        print(f"FFmpeg stdout: {e.stdout}")
-        print(f"FFmpeg stderr: {e.stderr}")
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        return await _generate_music_video(query)
     finally:
-        # Clean up the list file
-        if os.path.exists(list_filename):
-            os.remove(list_filename)
-    return None
+        # The per-loop clients of this run, whichever way it ended
+        await odyssey_pools.aclose()
+        await recording_downloader.aclose()
+        await async_lrclib.aclose()
+        await gemini.aclose()
 
 
-async def main():
+async def _generate_music_video(query):
     # 1. Get Song Info
     import sys
 
-    if len(sys.argv) > 1:
+    if query is not None:
+        pass
+    elif len(sys.argv) > 1:
         query = " ".join(sys.argv[1:])
     else:
         try:
@@ -524,9 +318,12 @@ async def main():
     images_dir = os.path.join(song_dir, "images")
     os.makedirs(images_dir, exist_ok=True)
 
-    raw_lyrics = get_song_lyrics(query)
+    clock = StageClock("cli")
+    raw_lyrics = await async_get_song_lyrics(query)
+    clock.lap("lyrics", ok=bool(raw_lyrics))
     if not raw_lyrics:
         print("Could not find lyrics. Exiting.")
+        clock.finish(ok=False)
         return
 
     # Save lyrics to a file
@@ -540,14 +337,15 @@ async def main():
     # Analyze sentiment
     sentiment = analyze_sentiment(raw_lyrics)
     print(f"🧠 Detected Sentiment: {sentiment}")
+    clock.lap("sentiment")
 
     full_lyrics_text = raw_lyrics
     parsed_lyrics = []
 
     if is_lrc:
-        parsed_lyrics = parse_lrc_lyrics(raw_lyrics)
+        parsed_lyrics = parse_lrc(raw_lyrics)
         # Extract just text for full context
-        full_lyrics_text = " ".join([text for _, text in parsed_lyrics])
+        full_lyrics_text = parsed_lyrics.full_text()
         print(f"✅ Parsed {len(parsed_lyrics)} synced lyric lines.")
     else:
         print("⚠️ Warning: Lyrics are not time-synced. Will split text evenly.")
@@ -555,57 +353,59 @@ async def main():
     # List to store task data for parallel execution
     segment_tasks_data = []
 
-    # 3. Generate Images (Sequential to avoid Gemini rate limits)
+    # 3. Generate Images (concurrent, rate limited by the shared image budget)
     print("\n📸 Generating images for all segments first...")
 
-    # Get intelligent segments based on LRC timestamps
-    if is_lrc:
-        segments = get_intelligent_segments(parsed_lyrics, max_duration=5)
-    else:
-        # Fallback: create segments that fit within MAX_VIDEO_DURATION
-        # Use 10-second segments up to the max duration
-        segments = []
-        for i in range(MAX_VIDEO_DURATION // 10):
-            start = i * 10
-            end = (i + 1) * 10
-            if start >= MAX_VIDEO_DURATION:
-                break
-            end = min(end, MAX_VIDEO_DURATION)
-            segments.append((i, start, end, "(Instrumental / Music)"))
+    # Plan segments from the LRC timestamps (fixed slots when not synced)
+    segments = plan_segments(parsed_lyrics, CLI_POLICY)
 
     total_segments = len(segments)
 
+    # Prompt combines full context (mood) and specific segment
+    context_str = f"Song: {query}. Context: {full_lyrics_text[:200]}..."
+
+    image_paths = {}
+    image_requests = []
+    pending_indices = []
     for segment_index, start_time, end_time, segment_lyrics in segments:
         print(
             f"\n--- Preparing Segment {segment_index + 1}/{total_segments} ({start_time:.1f}s - {end_time:.1f}s) ---"
         )
-
-        if not segment_lyrics or segment_lyrics == "(Instrumental / Music)":
-            segment_lyrics = "(Instrumental / Music)"
-
         print(f"🎵 Lyrics: {segment_lyrics}")
 
-        # Generate Image
-        # Prompt combines full context (mood) and specific segment
-        context_str = f"Song: {query}. Context: {full_lyrics_text[:200]}..."
-
-        img_filename = os.path.join(images_dir, f"segment_{segment_index}.png")
-        vid_filename = os.path.join(song_dir, f"segment_{segment_index}.mp4")
-        duration = end_time - start_time
+        img_filename = image_output_path(
+            os.path.join(images_dir, f"segment_{segment_index}.png")
+        )
 
         # Check if image already exists
         if os.path.exists(img_filename):
             print(f"   Image {img_filename} already exists. Using existing image.")
-            generated_img_path = img_filename
+            image_paths[segment_index] = img_filename
         else:
-            generated_img_path = generate_image_from_lyrics(
-                segment_lyrics,
-                output_file=img_filename,
-                sentiment=sentiment,
-                segment_lyrics=segment_lyrics,
-                context=context_str,
+            pending_indices.append(segment_index)
+            image_requests.append(
+                {
+                    "lyrics": segment_lyrics,
+                    "output_file": img_filename,
+                    "sentiment": sentiment,
+                    "segment_lyrics": segment_lyrics,
+                    "context": context_str,
+                }
             )
 
+    # Generate the missing images concurrently on the event loop, within
+    # the shared rate budget
+    generated = await asyncio.gather(
+        *(async_generate_image_from_lyrics(**kwargs) for kwargs in image_requests)
+    )
+    image_paths.update(zip(pending_indices, generated))
+    clock.lap("images")
+
+    for segment_index, start_time, end_time, segment_lyrics in segments:
+        generated_img_path = image_paths.get(segment_index)
+        vid_filename = os.path.join(song_dir, f"segment_{segment_index}.mp4")
+        duration = end_time - start_time
+
         if generated_img_path:
             video_prompt = f"Subtle animation of {segment_lyrics}, {sentiment.lower()} cartoon style, minimal motion, atmospheric, landscape orientation"
 
@@ -628,7 +428,9 @@ async def main():
                 }
             )
         else:
-            print("Skipping video generation for this segment due to image failure.")
+            print(
+                f"Skipping video generation for segment {segment_index} due to image failure."
+            )
 
     # 4. Generate Videos (Parallel with concurrency limit)
     video_files = []
@@ -636,34 +438,45 @@ async def main():
         print(
             f"\n🚀 Starting parallel video generation for {len(segment_tasks_data)} segments..."
         )
-        # Create a semaphore to limit to 3 concurrent connections
-        semaphore = asyncio.Semaphore(3)
+        # Streams share the process-wide Odyssey slots with other jobs;
+        # segments stuck in the tail get a duplicate (HEDGE_SEGMENTS)
+        hedger = SegmentHedger(generate_video_segment_independent, len(segment_tasks_data))
+        # Captions are burned in by the final render, not per segment
         tasks = [
-            generate_video_segment_independent(
+            hedger.run(
                 s["image"],
                 s["prompt"],
                 s["output"],
                 duration=s.get("duration", 5),  # Use actual segment duration
-                captions_path=s.get("captions"),
-                semaphore=semaphore,
+                job=song_dir,
             )
             for s in segment_tasks_data
         ]
+        # Connect the Odyssey sessions up front; segments then reuse them
+        await odyssey_pools.get().warm(len(tasks))
         results = await asyncio.gather(*tasks)
-        # Filter out None results
-        video_files = [r for r in results if r]
-        # Sort by segment index to ensure correct order
-        video_files.sort(
-            key=lambda x: int(re.search(r"segment_(\d+)(?:_raw)?\.mp4", x).group(1))
-        )
+        print(f"⏱️ Recording readiness (process total): {recording_readiness.format()}")
+        print(f"⏱️ Hedging: {hedger.summary()}")
+        # Keep each video with its captions and planned length, in segment
+        # order (gather preserves it); failed segments are left out
+        video_files = [
+            RenderSegment(video, s.get("captions"), s.get("duration"))
+            for s, video in zip(segment_tasks_data, results)
+            if video
+        ]
+    clock.lap("videos")
 
-    # 5. Stitch Videos
+    # 5. Render: trim, captions and concat in a single ffmpeg pass
     if video_files:
         output_filename = os.path.join(song_dir, f"{song_name}_final.mp4")
-        list_filename = os.path.join(song_dir, "list.txt")
-        stitch_videos_ffmpeg(video_files, output_filename, list_filename)
+        plan = build_render_plan(video_files, output_filename, MAX_VIDEO_DURATION)
+        final_video = render(plan)
+        clock.lap("stitch", ok=bool(final_video))
+        clock.finish(ok=bool(final_video))
+        return final_video
     else:
         print("\n⚠️ No videos were generated, so stitching was skipped.")
+        clock.finish(ok=False)
 
 
 if __name__ == "__main__":
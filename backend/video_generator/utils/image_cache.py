@@ -0,0 +1,190 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    from .atomic_files import write_atomic
+    from .cache_paths import cache_path
+    from .stats_registry import register_stats
+except ImportError:
+    from atomic_files import write_atomic
+    from cache_paths import cache_path
+    from stats_registry import register_stats
+
+# Disk quota for cached images (bytes) and maximum number of images kept
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", 2 * 1024**3))
+IMAGE_CACHE_MAX_ENTRIES = int(os.environ.get("IMAGE_CACHE_MAX_ENTRIES", 5000))
+
+
+def image_key(prompt, model, variant=""):
+    """
+    Content address of a generated image: SHA-256 of the model, any output
+    variant (format, size) and the fully rendered prompt.
+    """
+    digest = hashlib.sha256()
+    for part in (model, variant, prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _copy_atomic(src, dst):
+    with open(src, "rb") as f:
+        write_atomic(dst, f.read())
+
+
+class ImageCache:
+    """
+    Content-addressed store of generated (post-processed) segment images.
+
+    Files live under `<cache dir>/images/<key[:2]>/<key>` with a SQLite
+    index of their size and last access. The store is shared by the web
+    workers and the CLI; once it exceeds `max_bytes` or `max_entries` the
+    least recently used images are deleted.
+    """
+
+    def __init__(self, root=None, max_bytes=IMAGE_CACHE_MAX_BYTES, max_entries=IMAGE_CACHE_MAX_ENTRIES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "coalesced": 0}
+
+    def _resolve_root(self):
+        if self.root is None:
+            self.root = cache_path("images")
+        os.makedirs(self.root, exist_ok=True)
+        return self.root
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self._resolve_root(), "index.sqlite3"), timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS images (
+                    key TEXT PRIMARY KEY,
+                    size INTEGER,
+                    created_at REAL,
+                    accessed_at REAL,
+                    hits INTEGER DEFAULT 0
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS images_accessed_at ON images(accessed_at)")
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def _path(self, key):
+        return os.path.join(self._resolve_root(), key[:2], key)
+
+    def count(self, stat, amount=1):
+        with self._stats_lock:
+            self._stats[stat] += amount
+
+    def fetch(self, key, output_file):
+        """
+        Copies the cached image for `key` to output_file.
+        Returns output_file on a hit, None on a miss.
+        """
+        path = self._path(key)
+        try:
+            conn = self._connect()
+            row = conn.execute("SELECT size FROM images WHERE key = ?", (key,)).fetchone()
+            if row is None or not os.path.exists(path):
+                if row is not None:
+                    # The file was removed behind our back
+                    conn.execute("DELETE FROM images WHERE key = ?", (key,))
+                    conn.commit()
+                self.count("misses")
+                return None
+            _copy_atomic(path, output_file)
+            conn.execute(
+                "UPDATE images SET accessed_at = ?, hits = hits + 1 WHERE key = ?",
+                (time.time(), key),
+            )
+            conn.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ Image cache read failed: {e}")
+            self.count("misses")
+            return None
+        self.count("hits")
+        return output_file
+
+    def store(self, key, image_file):
+        """
+        Adds a finished image to the cache.
+        """
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _copy_atomic(image_file, path)
+            now = time.time()
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO images (key, size, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, os.path.getsize(path), now, now),
+            )
+            self.count("stores")
+            self._evict(conn)
+            conn.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"⚠️ Image cache write failed: {e}")
+
+    def _evict(self, conn):
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM images"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT key, size FROM images ORDER BY accessed_at ASC")
+        victims = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            victims.append(key)
+            count -= 1
+            total -= size or 0
+        for key in victims:
+            conn.execute("DELETE FROM images WHERE key = ?", (key,))
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+        self.count("evictions", len(victims))
+
+    def clear(self):
+        conn = self._connect()
+        keys = [key for (key,) in conn.execute("SELECT key FROM images")]
+        conn.execute("DELETE FROM images")
+        conn.commit()
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        try:
+            stats["entries"], stats["bytes"] = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM images"
+            ).fetchone()
+        except sqlite3.Error:
+            stats["entries"] = stats["bytes"] = None
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+# Shared instance used by the web workers and the CLI
+image_cache = ImageCache()
+register_stats("image_cache", image_cache.stats)
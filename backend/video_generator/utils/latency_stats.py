@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import deque
+
+try:
+    from .stats_registry import register_stats
+except ImportError:
+    from stats_registry import register_stats
+
+# Number of recent samples per name kept for latency percentiles
+LATENCY_WINDOW = 500
+
+
+class LatencyStats:
+    """
+    Thread-safe per-name call counters with a rolling latency window.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def record(self, name, seconds, ok):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = self._entries[name] = {
+                    "calls": 0,
+                    "errors": 0,
+                    "latencies": deque(maxlen=self.window),
+                }
+            entry["calls"] += 1
+            if ok:
+                entry["latencies"].append(seconds)
+            else:
+                entry["errors"] += 1
+
+    def reset(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            snapshot = {
+                name: (entry["calls"], entry["errors"], sorted(entry["latencies"]))
+                for name, entry in self._entries.items()
+            }
+        stats = {}
+        for name, (calls, errors, latencies) in snapshot.items():
+            stats[name] = {"calls": calls, "errors": errors}
+            if latencies:
+                stats[name].update(
+                    p50=round(latencies[len(latencies) // 2], 3),
+                    p95=round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+                    max=round(latencies[-1], 3),
+                )
+        return stats
+
+
+class Histogram:
+    """
+    Thread-safe fixed-bucket histogram; `bounds` are the bucket upper edges.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._total = 0.0
+
+    def record(self, value):
+        index = len(self.bounds)
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                index = i
+                break
+        with self._lock:
+            self._counts[index] += 1
+            self._total += value
+
+    def _labels(self):
+        return [f"<={bound:g}" for bound in self.bounds] + [f">{self.bounds[-1]:g}"]
+
+    def stats(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._total
+        count = sum(counts)
+        return {
+            "count": count,
+            "mean": round(total / count, 3) if count else None,
+            "buckets": dict(zip(self._labels(), counts)),
+        }
+
+    def format(self, unit="s"):
+        """
+        One-line rendering for the logs, e.g. "<=1s:2 <=2s:5 >64s:1".
+        """
+        stats = self.stats()
+        buckets = " ".join(
+            f"{label}{unit}:{count}" for label, count in stats["buckets"].items() if count
+        )
+        return f"{buckets or 'no samples'} (n={stats['count']}, mean={stats['mean']}{unit if stats['mean'] is not None else ''})"
+
+
+class StageClock:
+    """
+    Times the consecutive stages of one pipeline run.
+
+    `lap(stage)` records the time since the previous lap (or the start)
+    under "<pipeline>.<stage>"; `finish(ok)` records the whole run as
+    "<pipeline>.total".
+    """
+
+    def __init__(self, pipeline, stats=None):
+        self.pipeline = pipeline
+        self.stats = stats if stats is not None else stage_latency
+        self.started = self.last = time.monotonic()
+
+    def lap(self, stage, ok=True):
+        now = time.monotonic()
+        self.stats.record(f"{self.pipeline}.{stage}", now - self.last, ok)
+        self.last = now
+
+    def finish(self, ok=True):
+        self.stats.record(f"{self.pipeline}.total", time.monotonic() - self.started, ok)
+
+
+# Per-stage durations of the web worker and CLI pipelines
+stage_latency = LatencyStats()
+register_stats("pipeline_stages", stage_latency.stats)
@@ -0,0 +1,389 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+try:
+    from .cache_paths import cache_path
+    from .stats_registry import register_stats
+except ImportError:
+    from cache_paths import cache_path
+    from stats_registry import register_stats
+
+# SQLite FTS5 index built by `manage.py import_lyrics_dump`
+LYRICS_INDEX_PATH = os.environ.get("LYRICS_INDEX_PATH")
+
+_TAG_PATTERN = re.compile(r"^\[(ti|ar|al|length):(.*)\]\s*$", re.IGNORECASE)
+_TIMESTAMP_PATTERN = re.compile(r"\[\d+:\d+(?:[.:]\d+)?\]")
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    artist TEXT,
+    album TEXT,
+    duration REAL,
+    plain_lyrics TEXT,
+    synced_lyrics TEXT,
+    updated_at TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+    title, artist, album,
+    content='tracks', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS tracks_ai AFTER INSERT ON tracks BEGIN
+    INSERT INTO tracks_fts(rowid, title, artist, album)
+    VALUES (new.id, new.title, new.artist, new.album);
+END;
+CREATE TRIGGER IF NOT EXISTS tracks_ad AFTER DELETE ON tracks BEGIN
+    INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, album)
+    VALUES ('delete', old.id, old.title, old.artist, old.album);
+END;
+CREATE TRIGGER IF NOT EXISTS tracks_au AFTER UPDATE ON tracks BEGIN
+    INSERT INTO tracks_fts(tracks_fts, rowid, title, artist, album)
+    VALUES ('delete', old.id, old.title, old.artist, old.album);
+    INSERT INTO tracks_fts(rowid, title, artist, album)
+    VALUES (new.id, new.title, new.artist, new.album);
+END;
+CREATE TABLE IF NOT EXISTS import_state (
+    source TEXT PRIMARY KEY,
+    watermark TEXT
+);
+"""
+
+UPSERT = """
+INSERT INTO tracks (id, title, artist, album, duration, plain_lyrics, synced_lyrics, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(id) DO UPDATE SET
+    title = excluded.title,
+    artist = excluded.artist,
+    album = excluded.album,
+    duration = excluded.duration,
+    plain_lyrics = excluded.plain_lyrics,
+    synced_lyrics = excluded.synced_lyrics,
+    updated_at = excluded.updated_at
+"""
+
+
+def fts_query(query):
+    """
+    Turns free text into an FTS5 query where every token is a prefix match.
+    """
+    tokens = _TOKEN_PATTERN.findall(query or "")
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def _row_to_result(row):
+    # Same shape as an LRCLIB API result so callers can treat both alike
+    return {
+        "id": row["id"],
+        "trackName": row["title"],
+        "artistName": row["artist"],
+        "albumName": row["album"],
+        "duration": row["duration"],
+        "plainLyrics": row["plain_lyrics"],
+        "syncedLyrics": row["synced_lyrics"],
+    }
+
+
+class LocalLyricsIndex:
+    """
+    Offline lyrics index (SQLite + FTS5) built from an LRCLIB database dump
+    or a directory of .lrc files.
+
+    The index is optional: until it has been imported, `available()` is
+    False and every lookup falls through to the remote API.
+    """
+
+    def __init__(self, path=LYRICS_INDEX_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def _resolve_path(self):
+        if self.path is None:
+            self.path = cache_path("lyrics_index.sqlite3")
+        return self.path
+
+    def available(self):
+        return os.path.exists(self._resolve_path())
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._resolve_path(), timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _count(self, key):
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    # --- Queries ---
+
+    def search(self, query, limit=20):
+        """
+        Returns up to `limit` LRCLIB-shaped results for a free-text query,
+        best match first. Returns [] when the index is missing or has no match.
+        """
+        match = fts_query(query)
+        if not match or not self.available():
+            return []
+        try:
+            rows = (
+                self.connect()
+                .execute(
+                    """
+                    SELECT t.* FROM tracks_fts
+                    JOIN tracks t ON t.id = tracks_fts.rowid
+                    WHERE tracks_fts MATCH ?
+                    ORDER BY bm25(tracks_fts, 10.0, 5.0, 1.0),
+                             t.synced_lyrics IS NULL
+                    LIMIT ?
+                    """,
+                    (match, limit),
+                )
+                .fetchall()
+            )
+        except sqlite3.Error as e:
+            print(f"⚠️ Local lyrics index query failed: {e}")
+            return []
+        self._count("hits" if rows else "misses")
+        return [_row_to_result(row) for row in rows]
+
+    def get(self, track_id):
+        """
+        Returns the LRCLIB-shaped result for a track id, or None.
+        """
+        if not self.available():
+            return None
+        try:
+            row = (
+                self.connect()
+                .execute("SELECT * FROM tracks WHERE id = ?", (int(track_id),))
+                .fetchone()
+            )
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            print(f"⚠️ Local lyrics index lookup failed: {e}")
+            return None
+        self._count("hits" if row else "misses")
+        return _row_to_result(row) if row else None
+
+    def iter_lyrics(self, limit=None, batch_size=500):
+        """
+        Yields (track_id, lyrics) for indexed tracks, synced lyrics preferred.
+        """
+        if not self.available():
+            return
+        sql = "SELECT id, COALESCE(synced_lyrics, plain_lyrics) FROM tracks ORDER BY id"
+        params = ()
+        if limit:
+            sql += " LIMIT ?"
+            params = (int(limit),)
+        cursor = self.connect().execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for track_id, lyrics in rows:
+                if lyrics:
+                    yield track_id, lyrics
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["available"] = self.available()
+        if stats["available"]:
+            try:
+                (stats["tracks"],) = (
+                    self.connect().execute("SELECT COUNT(*) FROM tracks").fetchone()
+                )
+            except sqlite3.Error:
+                stats["tracks"] = None
+        return stats
+
+    # --- Import and maintenance ---
+
+    def _get_watermark(self, conn, source):
+        row = conn.execute(
+            "SELECT watermark FROM import_state WHERE source = ?", (source,)
+        ).fetchone()
+        return row["watermark"] if row else None
+
+    def _set_watermark(self, conn, source, watermark):
+        conn.execute(
+            "INSERT OR REPLACE INTO import_state (source, watermark) VALUES (?, ?)",
+            (source, watermark),
+        )
+
+    def import_lrclib_dump(self, dump_path, full=False, batch_size=5000, progress=None):
+        """
+        Imports tracks with their latest lyrics from an LRCLIB SQLite dump.
+        Only rows updated since the previous import are copied unless `full`.
+        Returns the number of imported tracks.
+        """
+        source = f"lrclib:{os.path.abspath(dump_path)}"
+        conn = self.connect()
+        watermark = None if full else self._get_watermark(conn, source)
+
+        dump = sqlite3.connect(f"file:{dump_path}?mode=ro", uri=True)
+        sql = """
+            SELECT t.id, t.name, t.artist_name, t.album_name, t.duration,
+                   l.plain_lyrics, l.synced_lyrics,
+                   MAX(t.updated_at, COALESCE(l.updated_at, t.updated_at)) AS updated_at
+            FROM tracks t
+            JOIN lyrics l ON l.id = t.last_lyrics_id
+            WHERE (l.has_plain_lyrics OR l.has_synced_lyrics)
+        """
+        params = ()
+        if watermark:
+            sql += " AND (t.updated_at > ? OR l.updated_at > ?)"
+            params = (watermark, watermark)
+
+        imported = 0
+        newest = watermark
+        try:
+            cursor = dump.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                conn.executemany(UPSERT, rows)
+                conn.commit()
+                imported += len(rows)
+                stamps = [r[7] for r in rows if r[7]]
+                if stamps:
+                    newest = max(newest or "", max(stamps))
+                if progress:
+                    progress(imported)
+        finally:
+            dump.close()
+
+        if newest:
+            self._set_watermark(conn, source, newest)
+            conn.commit()
+        return imported
+
+    def import_lrc_directory(self, directory, full=False, batch_size=1000, progress=None):
+        """
+        Imports every .lrc file under `directory`. Titles and artists come from
+        [ti:]/[ar:] tags, falling back to "Artist - Title.lrc" file names.
+        Only files modified since the previous import are read unless `full`.
+        Returns the number of imported tracks.
+        """
+        source = f"lrc:{os.path.abspath(directory)}"
+        conn = self.connect()
+        watermark = None if full else self._get_watermark(conn, source)
+        since = float(watermark) if watermark else 0.0
+
+        imported = 0
+        newest = since
+        batch = []
+        for root, _dirs, files in os.walk(directory):
+            for name in files:
+                if not name.lower().endswith(".lrc"):
+                    continue
+                file_path = os.path.join(root, name)
+                mtime = os.path.getmtime(file_path)
+                if mtime <= since:
+                    continue
+                newest = max(newest, mtime)
+                row = _parse_lrc_file(file_path, directory, mtime)
+                if row:
+                    batch.append(row)
+                if len(batch) >= batch_size:
+                    conn.executemany(UPSERT, batch)
+                    conn.commit()
+                    imported += len(batch)
+                    batch = []
+                    if progress:
+                        progress(imported)
+        if batch:
+            conn.executemany(UPSERT, batch)
+            imported += len(batch)
+            if progress:
+                progress(imported)
+
+        self._set_watermark(conn, source, repr(newest))
+        conn.commit()
+        return imported
+
+    def compact(self):
+        """
+        Merges FTS segments, refreshes planner statistics and reclaims free pages.
+        """
+        conn = self.connect()
+        conn.execute("INSERT INTO tracks_fts(tracks_fts) VALUES ('optimize')")
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+
+
+def _parse_lrc_file(file_path, root, mtime):
+    try:
+        with open(file_path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    except OSError as e:
+        print(f"⚠️ Could not read {file_path}: {e}")
+        return None
+
+    tags = {}
+    lyric_lines = []
+    for line in text.splitlines():
+        match = _TAG_PATTERN.match(line.strip())
+        if match:
+            tags[match.group(1).lower()] = match.group(2).strip()
+        else:
+            lyric_lines.append(line)
+
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    artist, _, title = stem.partition(" - ")
+    if not title:
+        artist, title = "", stem
+    title = tags.get("ti") or title
+    artist = tags.get("ar") or artist or "Unknown Artist"
+
+    duration = None
+    length = tags.get("length")
+    if length:
+        minutes, _, seconds = length.partition(":")
+        try:
+            duration = int(minutes) * 60 + float(seconds) if seconds else float(minutes)
+        except ValueError:
+            duration = None
+
+    body = "\n".join(lyric_lines).strip()
+    is_synced = bool(_TIMESTAMP_PATTERN.search(body))
+    plain = "\n".join(
+        _TIMESTAMP_PATTERN.sub("", line).strip() for line in lyric_lines
+    ).strip()
+
+    # Stable negative ids keep corpus tracks clear of real LRCLIB ids
+    rel_path = os.path.relpath(file_path, root)
+    digest = hashlib.sha1(rel_path.encode("utf-8")).digest()
+    track_id = -(int.from_bytes(digest[:7], "big") + 1)
+
+    return (
+        track_id,
+        title,
+        artist,
+        tags.get("al"),
+        duration,
+        plain or None,
+        body if is_synced else None,
+        time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(mtime)),
+    )
+
+
+# Shared instance used by the views, the background worker and the CLI
+local_index = LocalLyricsIndex()
+register_stats("local_index", local_index.stats)
@@ -0,0 +1,323 @@
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+class LyricTimeline:
+    """
+    Compact, sorted representation of parsed LRC lyrics.
+
+    Line start times live in an `array('d')` and every line points into a
+    table of interned texts, so repeated lines (choruses) are stored once.
+    Enhanced LRC word timings are kept in parallel flat arrays:
+    the words of line i are `word_times[word_starts[i]:word_starts[i + 1]]`.
+
+    Iterating yields `(timestamp_seconds, text)` tuples, the same shape the
+    old `parse_lrc_lyrics` list had. Point, interval and "next lyric"
+    queries bisect the sorted start times instead of scanning every line.
+    """
+
+    __slots__ = (
+        "times",
+        "text_ids",
+        "texts",
+        "word_starts",
+        "word_times",
+        "word_text_ids",
+        "metadata",
+    )
+
+    def __init__(
+        self,
+        times=None,
+        text_ids=None,
+        texts=None,
+        word_starts=None,
+        word_times=None,
+        word_text_ids=None,
+        metadata=None,
+    ):
+        self.times = times if times is not None else array("d")
+        self.text_ids = text_ids if text_ids is not None else array("I")
+        self.texts = texts if texts is not None else []
+        self.word_starts = word_starts if word_starts is not None else array("I", [0])
+        self.word_times = word_times if word_times is not None else array("d")
+        self.word_text_ids = word_text_ids if word_text_ids is not None else array("I")
+        self.metadata = metadata if metadata is not None else {}
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """
+        Builds a timeline from (timestamp_seconds, text) pairs.
+        """
+        timeline = cls()
+        table = {}
+        for t, text in sorted(pairs, key=lambda p: p[0]):
+            timeline.times.append(t)
+            text_id = table.get(text)
+            if text_id is None:
+                text_id = table[text] = len(timeline.texts)
+                timeline.texts.append(text)
+            timeline.text_ids.append(text_id)
+            timeline.word_starts.append(0)
+        return timeline
+
+    def __len__(self):
+        return len(self.times)
+
+    def __bool__(self):
+        return len(self.times) > 0
+
+    def __iter__(self):
+        texts = self.texts
+        return zip(self.times, (texts[i] for i in self.text_ids))
+
+    def __getitem__(self, index):
+        return self.times[index], self.texts[self.text_ids[index]]
+
+    def text(self, index):
+        return self.texts[self.text_ids[index]]
+
+    def words(self, index):
+        """
+        Returns the (timestamp_seconds, word) pairs of an enhanced LRC line,
+        or [] if the line has no word-level timings.
+        """
+        start, end = self.word_starts[index], self.word_starts[index + 1]
+        texts = self.texts
+        return [
+            (self.word_times[i], texts[self.word_text_ids[i]]) for i in range(start, end)
+        ]
+
+    def full_text(self):
+        """
+        All lyric lines joined with spaces, for prompts and sentiment context.
+        """
+        texts = self.texts
+        return " ".join(texts[i] for i in self.text_ids)
+
+    # --- Queries ---
+
+    def index_at(self, t):
+        """
+        Index of the line being sung at time t (the last line starting at or
+        before t), or -1 before the first line.
+        """
+        return bisect_right(self.times, t) - 1
+
+    def lyric_at(self, t):
+        """
+        Text of the line being sung at time t, or None before the first line.
+        """
+        i = bisect_right(self.times, t) - 1
+        return self.texts[self.text_ids[i]] if i >= 0 else None
+
+    def next_after(self, t):
+        """
+        (timestamp, text) of the first line starting strictly after t, or None.
+        """
+        i = bisect_right(self.times, t)
+        if i >= len(self.times):
+            return None
+        return self.times[i], self.texts[self.text_ids[i]]
+
+    def span(self, start_time, end_time, lo=0):
+        """
+        (first, stop) line indices with start_time <= timestamp < end_time.
+        """
+        first = bisect_left(self.times, start_time, lo)
+        return first, bisect_left(self.times, end_time, first)
+
+    def text_between(self, start_time, end_time):
+        """
+        Lyrics starting in [start_time, end_time) joined with spaces.
+        """
+        first, stop = self.span(start_time, end_time)
+        texts = self.texts
+        return " ".join([texts[i] for i in self.text_ids[first:stop]]).strip()
+
+    def texts_for_intervals(self, intervals):
+        """
+        Bulk text_between for a whole segment plan of (start_time, end_time)
+        pairs. Sorted plans are answered in one forward pass: each search
+        starts where the previous interval began.
+        """
+        texts = self.texts
+        text_ids = self.text_ids
+        results = []
+        lo = 0
+        previous_start = float("-inf")
+        for start_time, end_time in intervals:
+            if start_time < previous_start:
+                lo = 0
+            first, stop = self.span(start_time, end_time, lo)
+            results.append(" ".join([texts[i] for i in text_ids[first:stop]]).strip())
+            lo = first
+            previous_start = start_time
+        return results
+
+    def as_numpy(self):
+        """
+        Zero-copy NumPy view of the line start times.
+        """
+        import numpy as np
+
+        return np.frombuffer(self.times, dtype=np.float64)
+
+
+def as_timeline(parsed_lyrics):
+    """
+    Returns parsed_lyrics as a LyricTimeline, converting a list of
+    (timestamp_seconds, text) pairs if needed.
+    """
+    if isinstance(parsed_lyrics, LyricTimeline):
+        return parsed_lyrics
+    return LyricTimeline.from_pairs(parsed_lyrics or [])
+
+
+# A timed line: first timestamp captured directly (the common case), any
+# further timestamps as one group, then the rest of the line. Timestamps
+# only count at the start of a line (after optional indentation), so a
+# "[mm:ss]" inside the text does not start a new line.
+_LINE_PATTERN = re.compile(
+    r"^[ \t]*\[(\d+:\d+(?:[.:]\d+)?)\]"
+    r"((?:\[\d+:\d+(?:[.:]\d+)?\])*)"
+    r"([^\n]*)",
+    re.M,
+)
+_STAMP_PATTERN = re.compile(r"\[(\d+:\d+(?:[.:]\d+)?)\]")
+_WORD_PATTERN = re.compile(r"<(\d+:\d+(?:[.:]\d+)?)>([^<]*)")
+_META_PATTERN = re.compile(r"\[([A-Za-z#][\w#]*):([^\]]*)\]")
+
+
+class _StampTable(dict):
+    """
+    Memoizes "mm:ss.xx" -> seconds. Songs share most of their timestamps, so
+    across a corpus nearly every conversion is a C-level dict hit.
+    """
+
+    max_size = 200_000
+
+    def __missing__(self, stamp):
+        if len(self) >= self.max_size:
+            self.clear()
+        minutes, _, seconds = stamp.partition(":")
+        # "ss.xx" is the norm; some files use "ss:xx" for the fraction
+        value = self[stamp] = int(minutes) * 60 + float(seconds.replace(":", "."))
+        return value
+
+
+_STAMPS = _StampTable()
+
+
+def parse_lrc(lrc_text):
+    """
+    Parses LRC lyrics into a LyricTimeline in a single pass over the text.
+
+    Handles lines with several timestamps (`[00:12.00][01:30.00]chorus`),
+    the `[offset:]` tag (milliseconds, positive means earlier) and enhanced
+    word-level `<mm:ss.xx>` timings. Metadata tags such as `[ti:]` and
+    `[ar:]` are collected in `timeline.metadata`.
+
+    The common case (one timestamp per line, no word timings) does almost no
+    per-line Python work: one compiled pattern splits the text into columns
+    that are converted with `map` and memoized timestamps into typed arrays.
+    """
+    metadata = {key.lower(): value.strip() for key, value in _META_PATTERN.findall(lrc_text)}
+    rows = _LINE_PATTERN.findall(lrc_text)
+    if not rows:
+        return LyricTimeline(metadata=metadata)
+
+    stamps, extra_stamps, bodies = zip(*rows)
+    times = list(map(_STAMPS.__getitem__, stamps))
+    bodies = list(bodies)
+
+    # Lines with several timestamps: repeat them at the end, the sort below
+    # moves them into place. `origin[i]` is the line a repeat was copied from.
+    origin = None
+    if "][" in lrc_text:
+        repeated = [i for i, extra in enumerate(extra_stamps) if extra]
+        if repeated:
+            origin = list(range(len(rows)))
+            for i in repeated:
+                for stamp in _STAMP_PATTERN.findall(extra_stamps[i]):
+                    times.append(_STAMPS[stamp])
+                    bodies.append(bodies[i])
+                    origin.append(i)
+
+    texts = list(map(str.strip, bodies))
+
+    # Enhanced LRC: word timings are parsed once per source line and shifted
+    # for every repeat of that line
+    line_words = None
+    if "<" in lrc_text:
+        line_words = {}
+        parsed = {}
+        for i, body in enumerate(bodies):
+            if "<" not in body:
+                continue
+            src = origin[i] if origin else i
+            words = parsed.get(src)
+            if words is None:
+                words = parsed[src] = [
+                    (_STAMPS[stamp], word)
+                    for stamp, raw in _WORD_PATTERN.findall(body)
+                    if (word := raw.strip())
+                ]
+            if not words:
+                continue
+            shift = times[i] - times[src]
+            line_words[i] = [(wt + shift, w) for wt, w in words] if shift else words
+            texts[i] = " ".join([w for _, w in words])
+
+    offset = metadata.get("offset")
+    if offset:
+        try:
+            shift = int(offset) / 1000.0
+        except ValueError:
+            shift = 0.0
+        if shift:
+            times = [t - shift if t > shift else 0.0 for t in times]
+            if line_words:
+                for i, words in line_words.items():
+                    line_words[i] = [(wt - shift if wt > shift else 0.0, w) for wt, w in words]
+
+    order = None
+    if sorted(times) != times:
+        order = sorted(range(len(times)), key=times.__getitem__)
+        times = [times[i] for i in order]
+        texts = [texts[i] for i in order]
+
+    # Intern lines (and words) into one table, ids in first-seen order
+    ids = {}
+    text_ids = array("I", [ids.setdefault(text, len(ids)) for text in texts])
+    if line_words:
+        line_order = order if order is not None else range(len(times))
+        words_in_order = [line_words.get(i, ()) for i in line_order]
+        word_text_ids = array(
+            "I",
+            [ids.setdefault(w, len(ids)) for words in words_in_order for _, w in words],
+        )
+    table = list(ids)
+
+    if line_words:
+        word_times = array("d", [wt for words in words_in_order for wt, _ in words])
+        word_starts = array("I", [0])
+        total = 0
+        for words in words_in_order:
+            total += len(words)
+            word_starts.append(total)
+    else:
+        word_times = array("d")
+        word_text_ids = array("I")
+        word_starts = array("I", bytes(4 * (len(times) + 1)))
+
+    return LyricTimeline(
+        array("d", times),
+        text_ids,
+        table,
+        word_starts,
+        word_times,
+        word_text_ids,
+        metadata,
+    )
@@ -0,0 +1,173 @@
+import asyncio
+import os
+import random
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+LRCLIB_BASE_URL = os.environ.get("LRCLIB_BASE_URL", "https://lrclib.net")
+# (connect, read) timeouts in seconds
+LRCLIB_CONNECT_TIMEOUT = float(os.environ.get("LRCLIB_CONNECT_TIMEOUT", 3.05))
+LRCLIB_READ_TIMEOUT = float(os.environ.get("LRCLIB_READ_TIMEOUT", 15))
+LRCLIB_POOL_SIZE = int(os.environ.get("LRCLIB_POOL_SIZE", 16))
+LRCLIB_MAX_RETRIES = int(os.environ.get("LRCLIB_MAX_RETRIES", 3))
+
+# LRCLIB encourages a user agent
+USER_AGENT = (
+    "OdysseyHackathonBot/1.0 (https://github.com/odysseyml/odyssey-hackathon)"
+)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class LrclibClient:
+    """
+    Synchronous LRCLIB client backed by one pooled keep-alive session.
+
+    A single instance is shared by every thread in the process, so the
+    TLS connection to lrclib.net is set up once and then reused.
+
+    Requests with `interactive=True` (the typeahead) go through a second
+    session without retries or backoff, so their timeout bounds the
+    total latency.
+    """
+
+    def __init__(
+        self,
+        base_url=LRCLIB_BASE_URL,
+        timeout=(LRCLIB_CONNECT_TIMEOUT, LRCLIB_READ_TIMEOUT),
+        pool_size=LRCLIB_POOL_SIZE,
+        max_retries=LRCLIB_MAX_RETRIES,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        retries = Retry(
+            total=max_retries,
+            backoff_factor=0.5,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=["GET"],
+            respect_retry_after_header=True,
+        )
+        self.session = self._new_session(pool_size, retries)
+        self.interactive_session = self._new_session(pool_size, Retry(total=0, backoff_factor=0))
+
+    def _new_session(self, pool_size, retries):
+        session = requests.Session()
+        session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, max_retries=retries
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _get(self, path, params=None, timeout=None, interactive=False):
+        session = self.interactive_session if interactive else self.session
+        return session.get(
+            f"{self.base_url}{path}", params=params, timeout=timeout or self.timeout
+        )
+
+    def search(self, query, timeout=None, interactive=False):
+        """
+        Runs /api/search and returns the list of matching tracks.
+        """
+        response = self._get(
+            "/api/search", params={"q": query}, timeout=timeout, interactive=interactive
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def get(self, track_id, timeout=None):
+        """
+        Fetches a single track by LRCLIB id via /api/get/{id}. Returns None if unknown.
+        """
+        response = self._get(f"/api/get/{int(track_id)}", timeout=timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self.session.close()
+        self.interactive_session.close()
+
+
+class AsyncLrclibClient:
+    """
+    asyncio counterpart of LrclibClient built on httpx.
+
+    httpx connection pools are bound to the event loop that created them,
+    and the pipeline runs one `asyncio.run` per job, so one pooled client
+    is kept per running loop.
+    """
+
+    def __init__(
+        self,
+        base_url=LRCLIB_BASE_URL,
+        timeout=(LRCLIB_CONNECT_TIMEOUT, LRCLIB_READ_TIMEOUT),
+        pool_size=LRCLIB_POOL_SIZE,
+        max_retries=LRCLIB_MAX_RETRIES,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        self.limits = httpx.Limits(
+            max_connections=pool_size, max_keepalive_connections=pool_size
+        )
+        self.max_retries = max_retries
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"User-Agent": USER_AGENT},
+                timeout=self.timeout,
+                limits=self.limits,
+                transport=httpx.AsyncHTTPTransport(
+                    retries=self.max_retries, limits=self.limits
+                ),
+            )
+            self._clients[loop] = client
+        return client
+
+    async def _get(self, path, params=None, timeout=None):
+        client = self._client()
+        delay = 0.5
+        for attempt in range(self.max_retries + 1):
+            response = await client.get(
+                path, params=params, timeout=timeout or self.timeout
+            )
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                return response
+            await asyncio.sleep(delay + random.uniform(0, delay))
+            delay *= 2
+        return response
+
+    async def search(self, query, timeout=None):
+        response = await self._get("/api/search", params={"q": query}, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    async def get(self, track_id, timeout=None):
+        response = await self._get(f"/api/get/{int(track_id)}", timeout=timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        """
+        Closes the pooled client of the running event loop.
+        """
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+# Process-wide clients shared by the views, the worker and the CLI
+lrclib = LrclibClient()
+async_lrclib = AsyncLrclibClient()
@@ -0,0 +1,165 @@
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+
+try:
+    from .sqlite_cache import SQLiteTTLCache
+    from .stats_registry import register_stats
+except ImportError:
+    from sqlite_cache import SQLiteTTLCache
+    from stats_registry import register_stats
+
+# Cached lyrics are considered fresh for this long (seconds)
+LYRICS_CACHE_TTL = int(os.environ.get("LYRICS_CACHE_TTL", 7 * 24 * 3600))
+# Maximum number of cached tracks before the least recently used are evicted
+LYRICS_CACHE_MAX_ENTRIES = int(os.environ.get("LYRICS_CACHE_MAX_ENTRIES", 5000))
+
+_FEAT_PATTERN = re.compile(r"\b(?:feat|ft|featuring)\b\.?")
+_PUNCT_PATTERN = re.compile(r"[^\w\s]")
+_SPACE_PATTERN = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    """
+    Normalizes a search query so equivalent searches share a cache entry.
+    Folds case, accents, "feat."/"ft."/"featuring" and whitespace.
+    """
+    if not query:
+        return ""
+    text = unicodedata.normalize("NFKD", query)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.casefold()
+    text = _FEAT_PATTERN.sub(" feat ", text)
+    text = _PUNCT_PATTERN.sub(" ", text)
+    return _SPACE_PATTERN.sub(" ", text).strip()
+
+
+class LyricsCache(SQLiteTTLCache):
+    """
+    SQLite-backed cache of LRCLIB tracks keyed by normalized query.
+
+    The database file lives in the shared cache directory so the web
+    workers and the CLI pipeline read and write the same entries.
+    Entries expire after `ttl` seconds and the least recently used ones
+    are evicted once more than `max_entries` are stored.
+    """
+
+    filename = "lyrics.sqlite3"
+    table = "lyrics"
+    key_column = "query_key"
+    schema = (
+        """
+        CREATE TABLE IF NOT EXISTS lyrics (
+            query_key TEXT PRIMARY KEY,
+            track_id INTEGER,
+            title TEXT,
+            artist TEXT,
+            album TEXT,
+            duration REAL,
+            lyrics TEXT,
+            synced INTEGER,
+            created_at REAL,
+            accessed_at REAL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS lyrics_track_id ON lyrics(track_id)",
+        "CREATE INDEX IF NOT EXISTS lyrics_accessed_at ON lyrics(accessed_at)",
+    )
+    stat_names = ("hits", "misses", "expired", "stores", "evictions")
+
+    def __init__(self, path=None, ttl=LYRICS_CACHE_TTL, max_entries=LYRICS_CACHE_MAX_ENTRIES):
+        super().__init__(path, ttl, max_entries)
+
+    def _lookup(self, where, value):
+        conn = self._connect()
+        row = conn.execute(
+            f"SELECT * FROM lyrics WHERE {where} = ? ORDER BY accessed_at DESC LIMIT 1",
+            (value,),
+        ).fetchone()
+        if row is None:
+            self.count("misses")
+            return None
+
+        now = time.time()
+        if self.is_expired(row["created_at"], now):
+            conn.execute("DELETE FROM lyrics WHERE query_key = ?", (row["query_key"],))
+            conn.commit()
+            self.count("expired")
+            self.count("misses")
+            return None
+
+        self.touch(conn, row["query_key"], now)
+        conn.commit()
+        self.count("hits")
+        return {
+            "id": row["track_id"],
+            "title": row["title"],
+            "artist": row["artist"],
+            "album": row["album"],
+            "duration": row["duration"],
+            "lyrics": row["lyrics"],
+            "synced": bool(row["synced"]),
+        }
+
+    def get(self, query):
+        """
+        Returns the cached track for a query, or None on a miss.
+        """
+        key = normalize_query(query)
+        if not key:
+            return None
+        try:
+            return self._lookup("query_key", key)
+        except sqlite3.Error as e:
+            print(f"⚠️ Lyrics cache read failed: {e}")
+            return None
+
+    def get_by_id(self, track_id):
+        """
+        Returns the cached track with the given LRCLIB id, or None on a miss.
+        """
+        try:
+            return self._lookup("track_id", int(track_id))
+        except (TypeError, ValueError):
+            return None
+        except sqlite3.Error as e:
+            print(f"⚠️ Lyrics cache read failed: {e}")
+            return None
+
+    def set(self, query, track):
+        """
+        Stores a track (as returned by `get`) under the normalized query.
+        """
+        key = normalize_query(query)
+        if not key or not track or not track.get("lyrics"):
+            return
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO lyrics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    track.get("id"),
+                    track.get("title"),
+                    track.get("artist"),
+                    track.get("album"),
+                    track.get("duration"),
+                    track.get("lyrics"),
+                    int(bool(track.get("synced"))),
+                    now,
+                    now,
+                ),
+            )
+            self.count("stores")
+            self._evict(conn)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ Lyrics cache write failed: {e}")
+
+
+# Shared instance used by the views, the background worker and the CLI
+lyrics_cache = LyricsCache()
+register_stats("lyrics_cache", lyrics_cache.stats)
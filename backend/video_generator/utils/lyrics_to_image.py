@@ -1,106 +1,132 @@
+import asyncio
+import io
 import os
+import shutil
 import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from google import genai
-from PIL import Image as PILImage  # Rename to avoid collision with genai.Image
+from PIL import Image as PILImage
+
+try:
+    from .atomic_files import write_atomic
+    from .gemini_client import gemini
+    from .image_cache import image_cache, image_key
+    from .rate_budget import IMAGE_MAX_CONCURRENCY, image_budget
+    from .single_flight import SingleFlight
+except ImportError:
+    from atomic_files import write_atomic
+    from gemini_client import gemini
+    from image_cache import image_cache, image_key
+    from rate_budget import IMAGE_MAX_CONCURRENCY, image_budget
+    from single_flight import SingleFlight
 
 # Load environment variables
 load_dotenv()
 
+# Using gemini-2.5-flash-image (Nano Banana)
+IMAGE_MODEL = os.environ.get("IMAGE_MODEL", "gemini-2.5-flash-image")
+IMAGE_MAX_RETRIES = 3
+IMAGE_RETRY_DELAY = 20  # seconds, doubled after every 429
+
 # Target aspect ratio for videos: 16:9 landscape
 TARGET_WIDTH = 1280
 TARGET_HEIGHT = 720
 
-
-def resize_to_landscape(
-    image_path: str, width: int = TARGET_WIDTH, height: int = TARGET_HEIGHT
-):
+# Output encoding of the finished segment images (uploaded to Odyssey as
+# the first frame): png, webp or jpeg; quality applies to webp/jpeg
+IMAGE_FORMAT = os.environ.get("IMAGE_FORMAT", "png").lower()
+if IMAGE_FORMAT == "jpg":
+    IMAGE_FORMAT = "jpeg"
+IMAGE_QUALITY = int(os.environ.get("IMAGE_QUALITY", 90))
+IMAGE_PNG_COMPRESS_LEVEL = int(os.environ.get("IMAGE_PNG_COMPRESS_LEVEL", 6))
+IMAGE_EXTENSIONS = {"png": ".png", "webp": ".webp", "jpeg": ".jpg"}
+if IMAGE_FORMAT not in IMAGE_EXTENSIONS:
+    print(f"⚠️ Unknown IMAGE_FORMAT {IMAGE_FORMAT!r}, using png")
+    IMAGE_FORMAT = "png"
+# Part of the cache key, so changing the output settings never serves stale files
+IMAGE_VARIANT = f"{IMAGE_FORMAT}:{IMAGE_QUALITY}:{TARGET_WIDTH}x{TARGET_HEIGHT}"
+
+# Identical prompts generated at the same time share one request
+_image_flight = SingleFlight()
+_async_image_flights = weakref.WeakKeyDictionary()
+
+
+def image_output_path(output_file: str):
     """
-    Resizes an image to landscape format (16:9) with padding if needed.
-    Preserves the original image content and adds padding to match target dimensions.
+    Returns output_file with the extension of the configured IMAGE_FORMAT.
     """
-    try:
-        # Check if file exists
-        if not os.path.exists(image_path):
-            print(f"⚠️ Image file not found: {image_path}")
-            return image_path
-
-        # Open image with PIL
-        img = PILImage.open(image_path)
-
-        # Verify it's a PIL Image
-        if not hasattr(img, "size"):
-            print(
-                f"⚠️ Warning: Image object doesn't have .size attribute. Attempting conversion..."
-            )
-            # Try to convert to RGB if needed
-            img = img.convert("RGB")
-
-        original_width, original_height = img.size
-        print(f"   Opening image: {original_width}x{original_height}")
-
-        # Calculate aspect ratios
-        target_aspect = width / height
-        original_aspect = original_width / original_height
-
-        # Resize to fit within target dimensions while preserving aspect ratio
-        if original_aspect > target_aspect:
-            # Image is wider than target - fit to width
-            new_width = width
-            new_height = int(width / original_aspect)
-        else:
-            # Image is taller than target - fit to height
-            new_height = height
-            new_width = int(height * original_aspect)
+    root, _ = os.path.splitext(output_file)
+    return root + IMAGE_EXTENSIONS[IMAGE_FORMAT]
 
-        print(f"   Resizing to: {new_width}x{new_height}")
-        img_resized = img.resize((new_width, new_height), PILImage.Resampling.LANCZOS)
 
-        # Create a new image with target dimensions and dark background
-        background = PILImage.new("RGB", (width, height), color=(20, 20, 30))
+def letterbox(img, width: int = TARGET_WIDTH, height: int = TARGET_HEIGHT):
+    """
+    Fits a PIL image into width x height (16:9) with dark padding, in memory.
+    """
+    original_width, original_height = img.size
+
+    # JPEG sources can be decoded at a reduced scale when they are larger than needed
+    img.draft("RGB", (width, height))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if img.size == (width, height):
+        return img
+
+    # Calculate aspect ratios
+    target_aspect = width / height
+    original_aspect = original_width / original_height
+
+    # Resize to fit within target dimensions while preserving aspect ratio
+    if original_aspect > target_aspect:
+        # Image is wider than target - fit to width
+        new_width = width
+        new_height = int(width / original_aspect)
+    else:
+        # Image is taller than target - fit to height
+        new_height = height
+        new_width = int(height * original_aspect)
 
-        # Paste resized image centered on background
-        x_offset = (width - new_width) // 2
-        y_offset = (height - new_height) // 2
-        background.paste(img_resized, (x_offset, y_offset))
+    # reducing_gap shrinks large sources with a cheap box filter before LANCZOS
+    img_resized = img.resize(
+        (new_width, new_height), PILImage.Resampling.LANCZOS, reducing_gap=3.0
+    )
+    if img_resized.size == (width, height):
+        return img_resized
 
-        # Save over the original
-        background.save(image_path, "PNG")
-        print(f"✅ Resized to landscape {width}x{height}: {image_path}")
-        return image_path
+    # Create a new image with target dimensions and dark background
+    background = PILImage.new("RGB", (width, height), color=(20, 20, 30))
 
-    except Exception as e:
-        print(f"⚠️ Error resizing image: {e}")
-        import traceback
+    # Paste resized image centered on background
+    x_offset = (width - new_width) // 2
+    y_offset = (height - new_height) // 2
+    background.paste(img_resized, (x_offset, y_offset))
+    return background
 
-        traceback.print_exc()
-        return image_path
 
+def encode_image(img, image_format: str = IMAGE_FORMAT, quality: int = IMAGE_QUALITY):
+    """
+    Encodes a PIL image in the configured output format and returns the bytes.
+    """
+    buffer = io.BytesIO()
+    if image_format == "png":
+        img.save(buffer, "PNG", compress_level=IMAGE_PNG_COMPRESS_LEVEL)
+    elif image_format == "webp":
+        img.save(buffer, "WEBP", quality=quality, method=4)
+    else:
+        img.save(buffer, "JPEG", quality=quality, optimize=True)
+    return buffer.getvalue()
 
-def generate_image_from_lyrics(
+
+def build_image_prompt(
     lyrics: str,
-    output_file: str = "lyrics_image.png",
     sentiment: str = None,
     segment_lyrics: str = None,
     context: str = None,
 ):
     """
-    Generates an image based on the provided song lyrics using Google's Gemini 2.5 Flash Image model.
-
-    Args:
-        lyrics: The main lyrics to visualize
-        output_file: Output filename for the generated image
-        sentiment: Sentiment/mood of the song
-        segment_lyrics: Specific segment lyrics to display in the overlay (if different from full lyrics)
-        context: Additional context about the song (title, artist, full lyrics summary)
+    Builds the Gemini image prompt; the art style follows the sentiment bucket.
     """
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
-        print("Error: GOOGLE_API_KEY not found in environment variables.")
-        return
-
-    client = genai.Client(api_key=api_key)
-
     # Default style if no sentiment is provided
     style_description = "dark, stylized cartoon aesthetic"
     lighting_description = "Low-key, moody lighting"
@@ -220,7 +246,32 @@ def generate_image_from_lyrics(
         f"✗ If the lyrics appear anywhere outside the lower center of the image, the result is INCORRECT.\n"
         f"✗ If different text appears in the image, the result is INCORRECT."
     )
+    return prompt
+
 
+def _save_image_response(response, output_file):
+    """
+    Decodes the first image of a Gemini response once, letterboxes it to
+    16:9 in memory and writes it to output_file with a single encode.
+    Returns output_file, or None if the response holds no image.
+    """
+    if response.parts:
+        for part in response.parts:
+            if part.inline_data is not None:
+                with PILImage.open(io.BytesIO(part.inline_data.data)) as img:
+                    landscape = letterbox(img)
+                    write_atomic(output_file, encode_image(landscape))
+                print(f"\n✅ Image saved to: {output_file}")
+                print(f"   Final dimensions: {TARGET_WIDTH}x{TARGET_HEIGHT} ({IMAGE_FORMAT})")
+                return output_file
+
+    print("\n⚠️ The API returned a response, but no image data was found.")
+    if response.text:
+        print(f"Response text: {response.text}")
+    return None
+
+
+def _log_request(lyrics, sentiment, segment_lyrics):
     print(
         f'🎨 Generating image for lyrics:\n"{lyrics[:50]}..."\nSentiment: {sentiment}'
     )
@@ -229,54 +280,172 @@ def generate_image_from_lyrics(
 
     print("Waiting for API response (this might take a moment)...")
 
-    max_retries = 3
-    retry_delay = 20  # seconds
 
-    for attempt in range(max_retries):
+def _report_failure(e):
+    print(f"\n❌ Error generating image: {e}")
+    if "429" in str(e):
+        print("\n💡 Tip: You hit a rate limit (Quota Exceeded). Try again later.")
+
+
+def _request_image(prompt, output_file, key):
+    retry_delay = IMAGE_RETRY_DELAY
+
+    for attempt in range(IMAGE_MAX_RETRIES):
         try:
-            # Using gemini-2.5-flash-image (Nano Banana)
-            response = client.models.generate_content(
-                model="gemini-2.5-flash-image",
-                contents=[prompt],
-            )
-
-            image_saved = False
-            if response.parts:
-                for part in response.parts:
-                    if part.inline_data is not None:
-                        genai_image = (
-                            part.as_image()
-                        )  # This is genai.Image, not PIL.Image
-                        genai_image.save(output_file)
-                        print(f"\n✅ Image saved to: {output_file}")
-
-                        # Now resize to landscape format using PIL
-                        resize_to_landscape(output_file)
-                        print(f"   Final dimensions: {TARGET_WIDTH}x{TARGET_HEIGHT}")
-                        return output_file
-
-            if not image_saved:
-                print("\n⚠️ The API returned a response, but no image data was found.")
-                if response.text:
-                    print(f"Response text: {response.text}")
-
-            # If successful, break the loop
-            break
+            # Pooled client, within the process-wide rate budget shared with other jobs
+            with image_budget:
+                response = gemini.generate_content(IMAGE_MODEL, [prompt])
+            result = _save_image_response(response, output_file)
+            if result:
+                image_cache.store(key, result)
+            return result
 
         except Exception as e:
-            if "429" in str(e) and attempt < max_retries - 1:
+            if "429" in str(e) and attempt < IMAGE_MAX_RETRIES - 1:
                 print(
-                    f"\n⏳ Rate limit hit. Waiting {retry_delay} seconds before retry {attempt + 2}/{max_retries}..."
+                    f"\n⏳ Rate limit hit. Waiting {retry_delay} seconds before retry {attempt + 2}/{IMAGE_MAX_RETRIES}..."
                 )
+                # Hold back every other image request too
+                image_budget.backoff(retry_delay)
                 time.sleep(retry_delay)
                 retry_delay *= 2  # Exponential backoff
             else:
-                print(f"\n❌ Error generating image: {e}")
-                if "429" in str(e):
-                    print(
-                        "\n💡 Tip: You hit a rate limit (Quota Exceeded). Try again later."
-                    )
-                break
+                _report_failure(e)
+                return None
+
+
+async def _arequest_image(prompt, output_file, key):
+    retry_delay = IMAGE_RETRY_DELAY
+
+    for attempt in range(IMAGE_MAX_RETRIES):
+        try:
+            async with image_budget:
+                response = await gemini.agenerate_content(IMAGE_MODEL, [prompt])
+            # Decoding, resizing and caching are CPU/disk work, keep them off the loop
+            result = await asyncio.to_thread(_save_image_response, response, output_file)
+            if result:
+                await asyncio.to_thread(image_cache.store, key, result)
+            return result
+
+        except Exception as e:
+            if "429" in str(e) and attempt < IMAGE_MAX_RETRIES - 1:
+                print(
+                    f"\n⏳ Rate limit hit. Waiting {retry_delay} seconds before retry {attempt + 2}/{IMAGE_MAX_RETRIES}..."
+                )
+                image_budget.backoff(retry_delay)
+                await asyncio.sleep(retry_delay)
+                retry_delay *= 2
+            else:
+                _report_failure(e)
+                return None
+
+
+def _reuse(result, output_file):
+    # Another caller generated the same image; give this caller its own copy
+    if result and result != output_file:
+        shutil.copyfile(result, output_file)
+        return output_file
+    return result
+
+
+def generate_image_from_lyrics(
+    lyrics: str,
+    output_file: str = "lyrics_image.png",
+    sentiment: str = None,
+    segment_lyrics: str = None,
+    context: str = None,
+):
+    """
+    Generates an image based on the provided song lyrics using Google's Gemini 2.5 Flash Image model.
+
+    Images are cached by rendered prompt and model, so a repeated prompt
+    (a re-run song, a repeated chorus) is copied from the cache instead of
+    generated again. Identical prompts in flight share one API call.
+
+    Args:
+        lyrics: The main lyrics to visualize
+        output_file: Output filename for the generated image
+        sentiment: Sentiment/mood of the song
+        segment_lyrics: Specific segment lyrics to display in the overlay (if different from full lyrics)
+        context: Additional context about the song (title, artist, full lyrics summary)
+    """
+    prompt = build_image_prompt(lyrics, sentiment, segment_lyrics, context)
+    output_file = image_output_path(output_file)
+    key = image_key(prompt, IMAGE_MODEL, IMAGE_VARIANT)
+
+    if image_cache.fetch(key, output_file):
+        print(f"♻️ Reused cached image: {output_file}")
+        return output_file
+
+    _log_request(lyrics, sentiment, segment_lyrics)
+    result, shared = _image_flight.do(
+        key, lambda: _request_image(prompt, output_file, key)
+    )
+    if shared:
+        image_cache.count("coalesced")
+        return _reuse(result, output_file)
+    return result
+
+
+async def async_generate_image_from_lyrics(
+    lyrics: str,
+    output_file: str = "lyrics_image.png",
+    sentiment: str = None,
+    segment_lyrics: str = None,
+    context: str = None,
+):
+    """
+    asyncio version of generate_image_from_lyrics: awaits the Gemini call on
+    the event loop's pooled client instead of blocking a thread on it.
+    """
+    prompt = build_image_prompt(lyrics, sentiment, segment_lyrics, context)
+    output_file = image_output_path(output_file)
+    key = image_key(prompt, IMAGE_MODEL, IMAGE_VARIANT)
+
+    if await asyncio.to_thread(image_cache.fetch, key, output_file):
+        print(f"♻️ Reused cached image: {output_file}")
+        return output_file
+
+    # Identical prompts awaited together on this loop share one request
+    in_flight = _async_image_flights.setdefault(asyncio.get_running_loop(), {})
+    task = in_flight.get(key)
+    if task is not None:
+        image_cache.count("coalesced")
+        return _reuse(await asyncio.shield(task), output_file)
+
+    _log_request(lyrics, sentiment, segment_lyrics)
+    task = in_flight[key] = asyncio.ensure_future(_arequest_image(prompt, output_file, key))
+    try:
+        return await task
+    finally:
+        in_flight.pop(key, None)
+
+
+def generate_images_in_order(image_requests, max_workers=IMAGE_MAX_CONCURRENCY):
+    """
+    Runs generate_image_from_lyrics for a list of keyword-argument dicts on
+    a bounded thread pool. Yields (index, image_path) in index order, each
+    as soon as it and every earlier image are done (image_path is None on
+    failure). Leaving the loop early cancels the images not started yet.
+    """
+    if not image_requests:
+        return
+    executor = ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(image_requests))),
+        thread_name_prefix="image",
+    )
+    try:
+        futures = [
+            executor.submit(generate_image_from_lyrics, **kwargs) for kwargs in image_requests
+        ]
+        for index, future in enumerate(futures):
+            try:
+                yield index, future.result()
+            except Exception as e:
+                print(f"❌ Image {index} failed: {e}")
+                yield index, None
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from .stats_registry import register_stats
+except ImportError:
+    from stats_registry import register_stats
+
+# ffprobe processes running at once, and probed files kept in the cache
+MEDIA_PROBE_WORKERS = int(os.environ.get("MEDIA_PROBE_WORKERS", 4))
+MEDIA_PROBE_CACHE_SIZE = int(os.environ.get("MEDIA_PROBE_CACHE_SIZE", 2048))
+
+
+class MediaInfo(
+    namedtuple(
+        "MediaInfo",
+        "duration codec width height frame_rate pix_fmt time_base audio_codec",
+    )
+):
+    """
+    What one ffprobe call returns about a file. `frame_rate` and
+    `time_base` are kept as ffprobe's fractions ("24/1", "1/12288").
+    """
+
+    @property
+    def fps(self):
+        if not self.frame_rate:
+            return None
+        num, _, den = self.frame_rate.partition("/")
+        den = float(den or 1)
+        return float(num) / den if den else None
+
+    @property
+    def stream_params(self):
+        # Everything that must match for a stream copy concat
+        return self[1:]
+
+
+def _run_ffprobe(path):
+    command = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration:stream=codec_type,codec_name,width,height,pix_fmt,r_frame_rate,time_base,duration",
+        "-of",
+        "json",
+        path,
+    ]
+    result = subprocess.run(command, capture_output=True, text=True, check=False)
+    if result.returncode != 0:
+        return None
+    data = json.loads(result.stdout)
+    streams = data.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), None)
+    if video is None:
+        return None
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    duration = data.get("format", {}).get("duration") or video.get("duration")
+    return MediaInfo(
+        duration=float(duration) if duration not in (None, "N/A") else None,
+        codec=video.get("codec_name"),
+        width=video.get("width"),
+        height=video.get("height"),
+        frame_rate=video.get("r_frame_rate"),
+        pix_fmt=video.get("pix_fmt"),
+        time_base=video.get("time_base"),
+        audio_codec=audio.get("codec_name") if audio else None,
+    )
+
+
+class MediaProbe:
+    """
+    Probes media files with a bounded pool of ffprobe processes.
+
+    Results are cached by (path, size, mtime), so a file is probed once
+    until it changes.
+    """
+
+    def __init__(self, workers=MEDIA_PROBE_WORKERS, cache_size=MEDIA_PROBE_CACHE_SIZE):
+        self.workers = workers
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._stats = {"hits": 0, "probes": 0, "failures": 0}
+
+    def _key(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+    def _cached(self, key):
+        # Called with the lock held
+        info = self._cache.get(key)
+        if info is None:
+            return None
+        self._cache.move_to_end(key)
+        self._stats["hits"] += 1
+        return info
+
+    def _store(self, key, info):
+        # Called with the lock held
+        self._cache[key] = info
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _probe(self, path, key):
+        try:
+            info = _run_ffprobe(path)
+        except Exception as e:
+            print(f"⚠️ Error probing {path}: {e}")
+            info = None
+        with self._lock:
+            self._stats["probes"] += 1
+            if info is None:
+                self._stats["failures"] += 1
+            else:
+                self._store(key, info)
+        return info
+
+    def probe_many(self, paths):
+        """
+        Returns {path: MediaInfo or None}. Cache misses are probed in
+        parallel.
+        """
+        results = {}
+        misses = {}
+        with self._lock:
+            for path in paths:
+                key = self._key(path)
+                if key is None:
+                    results[path] = None
+                    continue
+                info = self._cached(key)
+                if info is not None:
+                    results[path] = info
+                else:
+                    misses[path] = key
+            if len(misses) > 1 and self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="ffprobe")
+
+        if len(misses) == 1:
+            (path, key), = misses.items()
+            results[path] = self._probe(path, key)
+        elif misses:
+            futures = {path: self._executor.submit(self._probe, path, key) for path, key in misses.items()}
+            for path, future in futures.items():
+                results[path] = future.result()
+        return results
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["cached"] = len(self._cache)
+        return stats
+
+
+# Shared by the web workers (stitch_segments)
+media_probe = MediaProbe()
+register_stats("media_probe", media_probe.stats)
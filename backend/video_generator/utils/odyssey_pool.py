@@ -0,0 +1,360 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from odyssey import Odyssey
+
+try:
+    from .stream_scheduler import ODYSSEY_MAX_STREAMS
+    from .stats_registry import register_stats
+except ImportError:
+    from stream_scheduler import ODYSSEY_MAX_STREAMS
+    from stats_registry import register_stats
+
+# Load environment variables
+load_dotenv()
+
+# Connected Odyssey sessions kept per event loop, and how long an unused
+# one stays open
+ODYSSEY_POOL_SIZE = int(os.environ.get("ODYSSEY_POOL_SIZE", 3))
+ODYSSEY_POOL_IDLE_TIMEOUT = float(os.environ.get("ODYSSEY_POOL_IDLE_TIMEOUT", 60))
+ODYSSEY_CONNECT_RETRIES = int(os.environ.get("ODYSSEY_CONNECT_RETRIES", 2))
+# How long a connect waits for budget before going over it anyway
+ODYSSEY_CONNECT_BUDGET_WAIT = 30.0
+
+
+class OdysseySession:
+    """
+    One connected Odyssey client. Frames are routed to whoever holds the
+    lease through `frame_handler`, since the callback is fixed at connect().
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.frame_handler = None
+        self.connected_at = self.last_used = time.monotonic()
+        self.uses = 0
+
+    def on_video_frame(self, frame):
+        handler = self.frame_handler
+        if handler is not None:
+            handler(frame)
+
+    def is_healthy(self):
+        # Not every SDK version exposes the connection state
+        for name in ("is_connected", "connected"):
+            state = getattr(self.client, name, None)
+            if isinstance(state, bool):
+                return state
+        return True
+
+
+class OdysseyPool:
+    """
+    Pool of pre-connected Odyssey sessions for one event loop.
+
+    Segments lease a session, stream on it and hand it back, so the
+    connection handshake is paid once per session instead of once per
+    segment. Sessions idle for longer than `idle_timeout`, or that failed
+    while leased, are disconnected and replaced by a fresh connection on
+    the next lease.
+
+    Every connected session holds one unit of the registry's process-wide
+    connection budget; `_idle` is guarded by the registry lock because
+    other loops may evict idle sessions from it.
+    """
+
+    def __init__(self, registry, size, idle_timeout, loop):
+        self.registry = registry
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.loop = loop
+        self._idle = deque()
+        self._slots = asyncio.Semaphore(size)
+        self._closed = False
+
+    async def _connect(self, evict=True, force=False):
+        # Returns a connected session, or None if no budget could be reserved
+        # (see OdysseyPools.reserve_connection)
+        reserved, victim = self.registry.reserve_connection(self, evict, force)
+        if not reserved:
+            return None
+        if victim is not None:
+            await self.registry.disconnect_elsewhere(victim)
+
+        last_error = None
+        for attempt in range(ODYSSEY_CONNECT_RETRIES + 1):
+            session = OdysseySession(self.registry.new_client())
+            started = time.monotonic()
+            try:
+                await session.client.connect(on_video_frame=session.on_video_frame)
+                self.registry.count("connects")
+                self.registry.record_connect(time.monotonic() - started)
+                return session
+            except BaseException as e:
+                await self._disconnect(session)
+                if not isinstance(e, Exception):
+                    self.registry.release_connection()
+                    raise
+                last_error = e
+                self.registry.count("connect_failures")
+                print(f"   ⚠️ Odyssey connect failed ({attempt + 1}/{ODYSSEY_CONNECT_RETRIES + 1}): {e}")
+                if attempt < ODYSSEY_CONNECT_RETRIES:
+                    await asyncio.sleep(0.5 * 2**attempt)
+        self.registry.release_connection()
+        raise last_error
+
+    async def _disconnect(self, session):
+        try:
+            await session.client.disconnect()
+        except Exception:
+            pass
+
+    async def _close(self, session):
+        # Disconnects a session and returns its unit of the budget
+        await self._disconnect(session)
+        self.registry.release_connection()
+
+    async def _take_idle(self):
+        now = time.monotonic()
+        while True:
+            with self.registry._lock:
+                if not self._idle:
+                    return None
+                session = self._idle.pop()  # Most recently used first
+            if now - session.last_used > self.idle_timeout:
+                self.registry.count("expired")
+                await self._close(session)
+            elif not session.is_healthy():
+                self.registry.count("unhealthy")
+                await self._close(session)
+            else:
+                return session
+
+    async def acquire(self):
+        await self._slots.acquire()
+        try:
+            give_up_at = time.monotonic() + ODYSSEY_CONNECT_BUDGET_WAIT
+            while True:
+                session = await self._take_idle()
+                if session is not None:
+                    self.registry.count("reuses")
+                    break
+                session = await self._connect(force=time.monotonic() > give_up_at)
+                if session is not None:
+                    break
+                # Every unit is leased or still connecting: one frees up soon
+                await asyncio.sleep(0.05)
+        except BaseException:
+            self._slots.release()
+            raise
+        session.uses += 1
+        self.registry.count("leases")
+        return session
+
+    async def release(self, session, healthy=True):
+        session.frame_handler = None
+        try:
+            if healthy and not self._closed and session.is_healthy():
+                session.last_used = time.monotonic()
+                with self.registry._lock:
+                    self._idle.append(session)
+            else:
+                if not healthy:
+                    self.registry.count("discarded")
+                await self._close(session)
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def lease(self):
+        """
+        async with pool.lease() as session: ... session.client ...
+
+        A session whose block raised is dropped, not reused.
+        """
+        session = await self.acquire()
+        healthy = False
+        try:
+            yield session
+            healthy = True
+        finally:
+            await self.release(session, healthy)
+
+    async def warm(self, count):
+        """
+        Connects up to `count` sessions in parallel ahead of the first lease,
+        using only free connection budget (nothing is evicted for a warm-up).
+        """
+        missing = min(count, self.size) - len(self._idle)
+        if missing <= 0:
+            return
+
+        async def connect_one():
+            async with self._slots:
+                try:
+                    session = await self._connect(evict=False)
+                except Exception:
+                    return
+                if session is not None:
+                    with self.registry._lock:
+                        self._idle.append(session)
+
+        await asyncio.gather(*(connect_one() for _ in range(missing)))
+
+    async def aclose(self):
+        self._closed = True
+        with self.registry._lock:
+            idle, self._idle = list(self._idle), deque()
+        await asyncio.gather(*(self._close(s) for s in idle))
+
+
+class OdysseyPools:
+    """
+    Process-wide registry of OdysseyPool instances, one per event loop.
+
+    Odyssey clients are bound to the loop that connected them and every
+    job runs its own `asyncio.run`, so sessions are pooled per loop and
+    closed with `aclose()` when the job's loop is done.
+
+    Connected sessions of all loops share one budget of `max_connections`
+    (ODYSSEY_MAX_STREAMS). A connect over budget evicts the least recently
+    used idle session of any loop, or waits for a unit to be released, so
+    N parallel jobs do not keep N pools' worth of connections open.
+    """
+
+    def __init__(
+        self,
+        size=ODYSSEY_POOL_SIZE,
+        idle_timeout=ODYSSEY_POOL_IDLE_TIMEOUT,
+        client_factory=None,
+        max_connections=ODYSSEY_MAX_STREAMS,
+    ):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self.connected = 0
+        # Optional callable(api_key) -> client, e.g. the offline fakes of the load test
+        self.client_factory = client_factory
+        self._pools = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats = {
+            "leases": 0,
+            "connects": 0,
+            "reuses": 0,
+            "connect_failures": 0,
+            "expired": 0,
+            "unhealthy": 0,
+            "discarded": 0,
+            "evicted": 0,
+            "over_budget": 0,
+        }
+        self._connect_seconds = 0.0
+
+    def new_client(self):
+        api_key = os.environ.get("ODYSSEY_API_KEY")
+        if not api_key:
+            raise RuntimeError("ODYSSEY_API_KEY not found in environment variables.")
+        if self.client_factory is not None:
+            return self.client_factory(api_key=api_key)
+        return Odyssey(api_key=api_key)
+
+    def get(self):
+        """
+        Returns the pool of the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            pool = self._pools.get(loop)
+            if pool is None:
+                pool = self._pools[loop] = OdysseyPool(self, self.size, self.idle_timeout, loop)
+            return pool
+
+    def reserve_connection(self, pool, evict=True, force=False):
+        """
+        Takes one unit of the connection budget for `pool`. Returns
+        (reserved, victim): when the budget is used up, the least recently
+        used idle session (the pool's own first) hands over its unit and is
+        returned for disconnection. Without idle sessions nothing is
+        reserved, unless `force` takes the unit over budget.
+        """
+        with self._lock:
+            if self.connected < self.max_connections:
+                self.connected += 1
+                return True, None
+            if not evict:
+                return False, None
+            owners = [pool] + [p for p in self._pools.values() if p is not pool]
+            for owner in owners:
+                if owner._idle:
+                    self._stats["evicted"] += 1
+                    return True, (owner, owner._idle.popleft())
+            if not force:
+                return False, None
+            self.connected += 1
+            self._stats["over_budget"] += 1
+            return True, None
+
+    def release_connection(self):
+        with self._lock:
+            self.connected -= 1
+
+    async def disconnect_elsewhere(self, victim):
+        """
+        Disconnects an evicted idle session on the loop that owns it.
+        """
+        owner, session = victim
+        if owner.loop is asyncio.get_running_loop():
+            await owner._disconnect(session)
+            return
+        disconnect = owner._disconnect(session)
+        try:
+            future = asyncio.run_coroutine_threadsafe(disconnect, owner.loop)
+        except RuntimeError:
+            disconnect.close()  # The owner's loop is closed; the unit is ours anyway
+            return
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(future), timeout=10)
+        except Exception:
+            pass  # The owner's loop is stuck; the unit is ours anyway
+
+    async def aclose(self):
+        """
+        Disconnects the idle sessions of the running loop's pool.
+        """
+        with self._lock:
+            pool = self._pools.pop(asyncio.get_running_loop(), None)
+        if pool is not None:
+            await pool.aclose()
+
+    def count(self, stat, amount=1):
+        with self._lock:
+            self._stats[stat] += amount
+
+    def record_connect(self, seconds):
+        with self._lock:
+            self._connect_seconds += seconds
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["open_pools"] = len(self._pools)
+            stats["connected"] = self.connected
+            stats["max_connections"] = self.max_connections
+            connect_seconds = self._connect_seconds
+        stats["avg_connect_seconds"] = (
+            round(connect_seconds / stats["connects"], 3) if stats["connects"] else None
+        )
+        # Handshakes avoided by handing a warm session to the next segment
+        stats["reuse_rate"] = round(stats["reuses"] / stats["leases"], 3) if stats["leases"] else 0.0
+        return stats
+
+
+# Shared by the web workers and the CLI
+odyssey_pools = OdysseyPools()
+register_stats("odyssey_pool", odyssey_pools.stats)
@@ -0,0 +1,205 @@
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+
+import httpx
+
+try:
+    from .latency_stats import Histogram
+    from .stats_registry import register_stats
+except ImportError:
+    from latency_stats import Histogram
+    from stats_registry import register_stats
+
+# Polling for a finished recording: first delay, backoff cap and the
+# per-segment deadline (seconds after end_stream)
+RECORDING_INITIAL_DELAY = float(os.environ.get("RECORDING_INITIAL_DELAY", 0.5))
+RECORDING_MAX_DELAY = float(os.environ.get("RECORDING_MAX_DELAY", 8))
+RECORDING_DEADLINE = float(os.environ.get("RECORDING_DEADLINE", 90))
+
+# Recording downloads: chunk size, (connect, read) timeouts, resume attempts
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get("DOWNLOAD_CHUNK_SIZE", 256 * 1024))
+DOWNLOAD_CONNECT_TIMEOUT = float(os.environ.get("DOWNLOAD_CONNECT_TIMEOUT", 10))
+DOWNLOAD_READ_TIMEOUT = float(os.environ.get("DOWNLOAD_READ_TIMEOUT", 60))
+DOWNLOAD_RETRIES = int(os.environ.get("DOWNLOAD_RETRIES", 4))
+DOWNLOAD_POOL_SIZE = int(os.environ.get("DOWNLOAD_POOL_SIZE", 8))
+
+# Time from end_stream() until the recording could be fetched
+recording_readiness = Histogram((0.5, 1, 2, 4, 8, 16, 32, 64))
+
+
+async def wait_for_recording(
+    client,
+    stream_id,
+    label="",
+    deadline=RECORDING_DEADLINE,
+    initial_delay=RECORDING_INITIAL_DELAY,
+    max_delay=RECORDING_MAX_DELAY,
+):
+    """
+    Polls `client.get_recording(stream_id)` until it has a video URL.
+
+    Starts with a short delay and backs off exponentially with jitter,
+    giving up `deadline` seconds after the call. Returns the recording,
+    or None if it was not ready in time.
+    """
+    label = f" {label}" if label else ""
+    started = time.monotonic()
+    give_up_at = started + deadline
+    delay = initial_delay
+    attempt = 0
+    last_error = None
+
+    while True:
+        # Jitter keeps the segments of a job from polling in lockstep
+        sleep_for = min(random.uniform(delay / 2, delay), give_up_at - time.monotonic())
+        if sleep_for > 0:
+            await asyncio.sleep(sleep_for)
+        attempt += 1
+        try:
+            recording = await client.get_recording(stream_id)
+            if recording and recording.video_url:
+                waited = time.monotonic() - started
+                recording_readiness.record(waited)
+                print(f"   Recording ready after {waited:.1f}s ({attempt} attempt(s)){label}")
+                return recording
+        except Exception as e:
+            last_error = e
+
+        if time.monotonic() >= give_up_at:
+            print(
+                f"   Failed to get recording within {deadline:.0f}s ({attempt} attempts){label}: {last_error}"
+            )
+            return None
+        delay = min(delay * 2, max_delay)
+
+
+class IncompleteDownload(Exception):
+    """
+    The connection ended before the announced number of bytes arrived.
+    """
+
+
+def _total_length(response):
+    # Full size of the file from a 200 (Content-Length) or 206 (Content-Range)
+    if response.headers.get("content-encoding", "identity") != "identity":
+        return None
+    if response.status_code == 206:
+        _, _, total = response.headers.get("content-range", "").partition("/")
+        return int(total) if total.isdigit() else None
+    length = response.headers.get("content-length")
+    return int(length) if length and length.isdigit() else None
+
+
+class RecordingDownloader:
+    """
+    Streams recordings to disk over a pooled httpx client.
+
+    The body is written in DOWNLOAD_CHUNK_SIZE chunks to `<file>.part`, so
+    memory does not grow with the clip size. A dropped connection resumes
+    with an HTTP Range request, the final length is checked against the
+    server's, and the file is published with an atomic rename. httpx pools
+    are bound to their event loop, so one client is kept per running loop.
+    """
+
+    def __init__(
+        self,
+        chunk_size=DOWNLOAD_CHUNK_SIZE,
+        timeout=(DOWNLOAD_CONNECT_TIMEOUT, DOWNLOAD_READ_TIMEOUT),
+        retries=DOWNLOAD_RETRIES,
+        pool_size=DOWNLOAD_POOL_SIZE,
+    ):
+        self.chunk_size = chunk_size
+        self.timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        self.limits = httpx.Limits(
+            max_connections=pool_size, max_keepalive_connections=pool_size
+        )
+        self.retries = retries
+        self._clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats = {"downloads": 0, "failures": 0, "resumes": 0, "restarts": 0, "bytes": 0}
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=self.timeout, limits=self.limits, follow_redirects=True
+            )
+            self._clients[loop] = client
+        return client
+
+    def count(self, stat, amount=1):
+        with self._lock:
+            self._stats[stat] += amount
+
+    async def download(self, url, output_file):
+        """
+        Downloads `url` to output_file. Returns output_file; raises on failure.
+        """
+        client = self._client()
+        part_file = f"{output_file}.part"
+        received = 0
+        expected = None
+        attempt = 0
+
+        try:
+            with open(part_file, "wb") as f:
+                while True:
+                    headers = {"Range": f"bytes={received}-"} if received else None
+                    try:
+                        async with client.stream("GET", url, headers=headers) as response:
+                            if received and response.status_code != 206:
+                                # The server ignored the range: start over
+                                self.count("restarts")
+                                f.seek(0)
+                                f.truncate()
+                                received = 0
+                            response.raise_for_status()
+                            expected = _total_length(response)
+                            async for chunk in response.aiter_bytes(self.chunk_size):
+                                f.write(chunk)
+                                received += len(chunk)
+                        if expected is not None and received != expected:
+                            raise IncompleteDownload(f"got {received} of {expected} bytes")
+                        break
+                    except (httpx.TransportError, IncompleteDownload) as e:
+                        attempt += 1
+                        if attempt > self.retries:
+                            raise
+                        self.count("resumes")
+                        print(f"   ⚠️ Download interrupted at {received} bytes ({e}), resuming...")
+                        await asyncio.sleep(min(0.5 * 2 ** (attempt - 1), 8))
+            os.replace(part_file, output_file)
+        except BaseException:
+            self.count("failures")
+            try:
+                os.remove(part_file)
+            except OSError:
+                pass
+            raise
+
+        self.count("downloads")
+        self.count("bytes", received)
+        return output_file
+
+    async def aclose(self):
+        """
+        Closes the pooled client of the running event loop.
+        """
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+# Shared by the web workers, the CLI and generate_single_video.py
+recording_downloader = RecordingDownloader()
+register_stats("recording_readiness", recording_readiness.stats)
+register_stats("recording_downloads", recording_downloader.stats)
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import threading
+import time
+
+try:
+    from .stats_registry import register_stats
+except ImportError:
+    from stats_registry import register_stats
+
+# Image generation budget shared by every job (and thread) in the process
+IMAGE_RATE_PER_MINUTE = float(os.environ.get("IMAGE_RATE_PER_MINUTE", 20))
+IMAGE_MAX_CONCURRENCY = int(os.environ.get("IMAGE_MAX_CONCURRENCY", 4))
+
+
+class RateBudget:
+    """
+    Process-wide token bucket plus a concurrency cap.
+
+    `acquire()` blocks until a request may start. A 429 from the API calls
+    `backoff(seconds)`, which pauses every caller instead of letting each
+    thread discover the rate limit on its own.
+    """
+
+    def __init__(self, rate_per_minute, max_concurrency, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst or max(1, max_concurrency))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._stats = {"acquired": 0, "waited": 0, "wait_seconds": 0.0, "backoffs": 0}
+
+    def _reserve(self):
+        # Returns how long to sleep before a token is available (0 = taken)
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate if self.rate else 1.0
+
+    def _record_wait(self, started):
+        waited = time.monotonic() - started
+        with self._lock:
+            self._stats["acquired"] += 1
+            if waited > 0.01:
+                self._stats["waited"] += 1
+                self._stats["wait_seconds"] += waited
+
+    def acquire(self):
+        started = time.monotonic()
+        self._slots.acquire()
+        while True:
+            delay = self._reserve()
+            if not delay:
+                break
+            time.sleep(delay)
+        self._record_wait(started)
+
+    async def acquire_async(self):
+        """
+        Same as acquire() but waits on the event loop instead of blocking it.
+        """
+        started = time.monotonic()
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(0.05)
+        while True:
+            delay = self._reserve()
+            if not delay:
+                break
+            await asyncio.sleep(delay)
+        self._record_wait(started)
+
+    def release(self):
+        self._slots.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+        return False
+
+    def backoff(self, seconds):
+        """
+        Pauses the whole budget, e.g. after the API answered 429.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._stats["backoffs"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["paused_for"] = round(max(0.0, self._paused_until - time.monotonic()), 1)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 2)
+        return stats
+
+
+# Shared by generate_image_from_lyrics in the web workers and the CLI
+image_budget = RateBudget(IMAGE_RATE_PER_MINUTE, IMAGE_MAX_CONCURRENCY)
+register_stats("image_budget", image_budget.stats)
@@ -0,0 +1,190 @@
+import os
+import subprocess
+import time
+
+# Output of the single-pass render: every segment is scaled and padded to
+# this size and converted to a constant frame rate before concatenation
+RENDER_WIDTH = int(os.environ.get("RENDER_WIDTH", 1280))
+RENDER_HEIGHT = int(os.environ.get("RENDER_HEIGHT", 720))
+RENDER_FPS = int(os.environ.get("RENDER_FPS", 24))
+RENDER_PRESET = os.environ.get("RENDER_PRESET", "veryfast")
+RENDER_CRF = int(os.environ.get("RENDER_CRF", 23))
+
+# drawtext options of the burned-in lyrics (also used by add_lyrics_to_video)
+CAPTION_STYLE = "fontcolor=white:fontsize=36:x=(w-text_w)/2:y=h-100:line_spacing=4:box=1:boxcolor=black@0.5:boxborderw=5"
+
+
+def escape_filter_value(value):
+    """
+    Escapes a filter option value (e.g. a file path) for use inside a
+    filter_complex graph: once for the option parser, once for the graph.
+    """
+    for char in ("\\", "'", ":"):
+        value = value.replace(char, "\\" + char)
+    for char in ("\\", "'", "[", "]", ",", ";"):
+        value = value.replace(char, "\\" + char)
+    return value
+
+
+class RenderSegment:
+    """
+    One clip of the render: the raw video, its captions file (optional)
+    and its planned length in seconds (None = use the whole clip).
+    """
+
+    def __init__(self, video, captions=None, duration=None):
+        self.video = video
+        self.captions = captions
+        self.duration = duration
+
+    def __repr__(self):
+        return f"RenderSegment({self.video!r}, captions={self.captions!r}, duration={self.duration!r})"
+
+
+class RenderPlan:
+    """
+    A single ffmpeg invocation that trims, captions and concatenates the
+    segments in one decode/encode pass.
+
+    Cuts are made on the frame grid after the constant-frame-rate
+    conversion (`trim=end_frame=N`), so every segment contributes exactly
+    round(duration * fps) frames and the budget is met frame-accurately.
+    """
+
+    def __init__(
+        self,
+        segments,
+        output_file,
+        max_duration=None,
+        fps=RENDER_FPS,
+        width=RENDER_WIDTH,
+        height=RENDER_HEIGHT,
+    ):
+        self.output_file = output_file
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.segments = []
+        self.frames = []
+
+        budget = round(max_duration * fps) if max_duration is not None else None
+        for segment in segments:
+            frames = round(segment.duration * fps) if segment.duration is not None else None
+            if budget is not None:
+                if budget <= 0:
+                    break
+                frames = budget if frames is None else min(frames, budget)
+                budget -= frames
+            if frames == 0:
+                continue
+            self.segments.append(segment)
+            self.frames.append(frames)
+
+    @property
+    def duration(self):
+        # Planned length in seconds, None if a clip is used without a cut
+        if None in self.frames:
+            return None
+        return sum(self.frames) / self.fps
+
+    @property
+    def has_captions(self):
+        return any(s.captions and os.path.exists(s.captions) for s in self.segments)
+
+    def filter_complex(self, captions=True):
+        chains = []
+        labels = []
+        for i, (segment, frames) in enumerate(zip(self.segments, self.frames)):
+            filters = [
+                f"fps={self.fps}",
+                f"scale={self.width}:{self.height}:force_original_aspect_ratio=decrease",
+                f"pad={self.width}:{self.height}:(ow-iw)/2:(oh-ih)/2",
+                "setsar=1",
+            ]
+            if frames is not None:
+                filters.append(f"trim=end_frame={frames}")
+            filters.append("setpts=PTS-STARTPTS")
+            if captions and segment.captions and os.path.exists(segment.captions):
+                textfile = escape_filter_value(os.path.abspath(segment.captions))
+                filters.append(f"drawtext=textfile={textfile}:{CAPTION_STYLE}")
+            chains.append(f"[{i}:v]{','.join(filters)}[v{i}]")
+            labels.append(f"[v{i}]")
+        chains.append(f"{''.join(labels)}concat=n={len(labels)}:v=1:a=0,format=yuv420p[out]")
+        return ";".join(chains)
+
+    def command(self, output_file=None, ffmpeg="ffmpeg", captions=True):
+        command = [ffmpeg, "-v", "error", "-y"]
+        for segment in self.segments:
+            command += ["-i", segment.video]
+        command += [
+            "-filter_complex",
+            self.filter_complex(captions),
+            "-map",
+            "[out]",
+            "-c:v",
+            "libx264",
+            "-preset",
+            RENDER_PRESET,
+            "-crf",
+            str(RENDER_CRF),
+            "-r",
+            str(self.fps),
+            "-movflags",
+            "+faststart",
+            "-f",
+            "mp4",
+            output_file or self.output_file,
+        ]
+        return command
+
+
+def build_render_plan(segments, output_file, max_duration=None, **kwargs):
+    """
+    Turns the segment list (RenderSegment or (video, captions, duration)
+    tuples) into a RenderPlan. Missing videos are left out.
+    """
+    segments = [s if isinstance(s, RenderSegment) else RenderSegment(*s) for s in segments]
+    segments = [s for s in segments if s.video and os.path.exists(s.video)]
+    return RenderPlan(segments, output_file, max_duration=max_duration, **kwargs)
+
+
+def render(plan):
+    """
+    Runs the plan; the output is published atomically. Returns the output
+    path, or None if nothing was rendered. Like add_lyrics_to_video, falls
+    back to a render without captions if the captions pass fails (e.g. an
+    ffmpeg built without drawtext).
+    """
+    if not plan.segments:
+        print("No videos to render.")
+        return None
+
+    planned = f"{plan.duration:.2f}s" if plan.duration is not None else "full clips"
+    print(f"\n🧵 Rendering {len(plan.segments)} segments in one pass ({planned})...")
+    part_file = f"{plan.output_file}.part"
+    started = time.monotonic()
+    try:
+        result = subprocess.run(plan.command(part_file), capture_output=True, text=True, check=False)
+        if result.returncode != 0 and plan.has_captions:
+            print(f"   ⚠️ FFmpeg error with captions: {result.stderr.strip()[-500:]}")
+            print("   ⚠️ Rendering without captions...")
+            result = subprocess.run(
+                plan.command(part_file, captions=False), capture_output=True, text=True, check=False
+            )
+        if result.returncode != 0:
+            print(f"Error during ffmpeg render: {result.stderr.strip()}")
+            return None
+        os.replace(part_file, plan.output_file)
+    except FileNotFoundError:
+        print("Error: ffmpeg is not installed or not in your PATH.")
+        print("Please install ffmpeg to use this feature.")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        return None
+    finally:
+        if os.path.exists(part_file):
+            os.remove(part_file)
+
+    print(f"\n🎉 Final video saved: {plan.output_file} (rendered in {time.monotonic() - started:.1f}s)")
+    return plan.output_file
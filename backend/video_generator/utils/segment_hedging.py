@@ -0,0 +1,194 @@
+import asyncio
+import os
+import threading
+import time
+
+try:
+    from .stats_registry import register_stats
+except ImportError:
+    from stats_registry import register_stats
+
+# Hedged segment generation: a segment running past the job's p90 gets a
+# duplicate stream, the first usable result wins and the other is cancelled
+HEDGE_SEGMENTS = os.environ.get("HEDGE_SEGMENTS", "0").lower() in ("1", "true", "yes", "on")
+HEDGE_PERCENTILE = float(os.environ.get("HEDGE_PERCENTILE", 0.9))
+# Finished segments needed before the job's percentile is trusted
+HEDGE_MIN_SAMPLES = int(os.environ.get("HEDGE_MIN_SAMPLES", 3))
+# Extra streams a job may spend on hedges, as a share of its segments (at least 1)
+HEDGE_MAX_EXTRA = float(os.environ.get("HEDGE_MAX_EXTRA", 0.25))
+HEDGE_CHECK_INTERVAL = 0.5
+
+
+async def _first(*aws):
+    # Waits until the first of the awaitables is done; cancels the others
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+def _remove(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class SegmentHedger:
+    """
+    Hedges the segments of one job.
+
+    A segment's latency is measured from the moment it got its stream slot
+    and compared without the stream's own length, so queueing and longer
+    segments do not look slow. Once HEDGE_MIN_SAMPLES segments finished,
+    a segment exceeding their HEDGE_PERCENTILE gets one duplicate
+    (written to `<name>_hedge.mp4`), within the job's extra-stream budget.
+    """
+
+    def __init__(self, generate, segments, enabled=HEDGE_SEGMENTS):
+        self.generate = generate
+        self.budget = max(1, int(segments * HEDGE_MAX_EXTRA)) if enabled else 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.seconds_saved = 0.0
+        self._overheads = []
+
+    def threshold(self):
+        if len(self._overheads) < HEDGE_MIN_SAMPLES:
+            return None
+        overheads = sorted(self._overheads)
+        return overheads[min(len(overheads) - 1, int(len(overheads) * HEDGE_PERCENTILE))]
+
+    async def run(self, image_path, prompt, output_filename, duration=5, **kwargs):
+        """
+        Same arguments and result as generate_video_segment_independent.
+        """
+        if not self.budget:
+            return await self.generate(image_path, prompt, output_filename, duration=duration, **kwargs)
+
+        started = asyncio.Event()
+        primary = asyncio.create_task(
+            self.generate(
+                image_path, prompt, output_filename, duration=duration, started=started, **kwargs
+            )
+        )
+        try:
+            await _first(asyncio.shield(primary), started.wait())
+            begun = time.monotonic()
+
+            hedge = None
+            while not primary.done():
+                threshold = self.threshold()
+                if threshold is not None and time.monotonic() - begun > duration + threshold:
+                    if self.hedged < self.budget:
+                        hedge = self._launch(image_path, prompt, output_filename, duration, threshold, kwargs)
+                    else:
+                        hedge_stats.count("budget_exhausted")
+                    break
+                await asyncio.wait({primary}, timeout=HEDGE_CHECK_INTERVAL)
+
+            if hedge is None:
+                result = await primary
+                if result and started.is_set():
+                    self._overheads.append(time.monotonic() - begun - duration)
+                hedge_stats.count("segments")
+                return result
+            return await self._race(primary, hedge, output_filename, begun, duration)
+        finally:
+            if not primary.done():
+                primary.cancel()
+
+    def _launch(self, image_path, prompt, output_filename, duration, threshold, kwargs):
+        self.hedged += 1
+        hedge_stats.count("hedged")
+        print(
+            f"   🪃 Segment {output_filename} is past the job's p{HEDGE_PERCENTILE * 100:.0f} "
+            f"(+{threshold:.1f}s), starting a duplicate ({self.hedged}/{self.budget})"
+        )
+        return asyncio.create_task(
+            self.generate(
+                image_path,
+                prompt,
+                output_filename.replace(".mp4", "_hedge.mp4"),
+                duration=duration,
+                **kwargs,
+            )
+        )
+
+    async def _race(self, primary, hedge, output_filename, begun, duration):
+        hedge_output = output_filename.replace(".mp4", "_hedge.mp4")
+        hedge_raw = output_filename.replace(".mp4", "_hedge_raw.mp4")
+        winner = result = None
+        pending = {primary, hedge}
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Prefer the primary when both finished in the same round
+                for task in sorted(done, key=lambda t: t is not primary):
+                    if not task.cancelled() and not task.exception() and task.result():
+                        winner, result = task, task.result()
+                        break
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        elapsed = time.monotonic() - begun
+        hedge_stats.count("segments")
+        if winner is hedge:
+            # Publish the duplicate under the primary's name
+            target = {hedge_raw: output_filename.replace(".mp4", "_raw.mp4")}.get(result, output_filename)
+            os.replace(result, target)
+            result = target
+            # The primary had at least this far to go: its usual overhead
+            saved = sorted(self._overheads)[len(self._overheads) // 2] if self._overheads else 0.0
+            self.hedge_wins += 1
+            self.seconds_saved += saved
+            hedge_stats.count("hedge_wins")
+            hedge_stats.count("seconds_saved", saved)
+            print(f"   🪃 Duplicate of {output_filename} won after {elapsed:.1f}s")
+        _remove(hedge_output, hedge_raw)
+        if result:
+            self._overheads.append(elapsed - duration)
+        return result
+
+    def summary(self):
+        if not self.budget:
+            return "hedging off"
+        return (
+            f"{self.hedged} hedged (budget {self.budget}), {self.hedge_wins} won by the duplicate, "
+            f"~{self.seconds_saved:.1f}s saved"
+        )
+
+
+class HedgeStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            "segments": 0,
+            "hedged": 0,
+            "hedge_wins": 0,
+            "budget_exhausted": 0,
+            "seconds_saved": 0.0,
+        }
+
+    def count(self, stat, amount=1):
+        with self._lock:
+            self._stats[stat] += amount
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["enabled"] = HEDGE_SEGMENTS
+        stats["hedge_rate"] = round(stats["hedged"] / stats["segments"], 3) if stats["segments"] else 0.0
+        stats["seconds_saved"] = round(stats["seconds_saved"], 2)
+        return stats
+
+
+# Totals over every job of the process
+hedge_stats = HedgeStats()
+register_stats("segment_hedging", hedge_stats.stats)
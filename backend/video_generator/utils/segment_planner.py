@@ -0,0 +1,251 @@
+import math
+import os
+from array import array
+
+try:
+    from .lrc_timeline import as_timeline
+except ImportError:
+    from lrc_timeline import as_timeline
+
+INSTRUMENTAL = "(Instrumental / Music)"
+
+# Web worker plan: segments follow the lyrics but stay between these lengths
+WEB_SEGMENT_MIN = float(os.environ.get("WEB_SEGMENT_MIN", 6))
+WEB_SEGMENT_MAX = float(os.environ.get("WEB_SEGMENT_MAX", 10))
+WEB_MAX_DURATION = float(os.environ.get("WEB_MAX_DURATION", 60))
+
+# Shortest final segment kept when the policy has no min_segment: every
+# segment costs a full Odyssey stream
+MIN_FINAL_SEGMENT = 1.0
+
+
+class SegmentPolicy:
+    """
+    Rules the planner follows when cutting a song into video segments.
+
+    - max_segment: no segment is longer than this (seconds)
+    - min_segment: lyric segments shorter than this absorb the following
+      lines (never exceeding max_segment); 0 disables merging
+    - max_total: the plan never extends past this point of the song
+    - tail: seconds kept after the last lyric line
+    - gap_policy: how instrumental gaps longer than max_segment are split,
+      "subdivide" (equal pieces) or "fixed" (max_segment pieces + remainder)
+    - fallback_slot: slot length used when there are no synced lyrics
+
+    Subclasses can override `split_gap` for other gap strategies.
+    """
+
+    GAP_POLICIES = ("subdivide", "fixed")
+
+    def __init__(
+        self,
+        max_segment=5.0,
+        min_segment=0.0,
+        max_total=40.0,
+        tail=5.0,
+        gap_policy="subdivide",
+        fallback_slot=10.0,
+    ):
+        if max_segment <= 0:
+            raise ValueError("max_segment must be positive")
+        if min_segment > max_segment:
+            raise ValueError("min_segment cannot exceed max_segment")
+        if gap_policy not in self.GAP_POLICIES:
+            raise ValueError(f"Unknown gap policy: {gap_policy}")
+        self.max_segment = max_segment
+        self.min_segment = min_segment
+        self.max_total = max_total
+        self.tail = tail
+        self.gap_policy = gap_policy
+        self.fallback_slot = fallback_slot
+
+    def split_gap(self, start, end):
+        """
+        Returns the (start, end) pieces covering an instrumental gap.
+        """
+        length = end - start
+        if length <= 0:
+            return []
+        max_seg = self.max_segment
+        if self.gap_policy == "fixed":
+            pieces = []
+            t = start
+            while end - t > 1e-9:
+                pieces.append((t, min(t + max_seg, end)))
+                t += max_seg
+            return pieces
+        count = max(1, math.ceil(length / max_seg - 1e-9))
+        step = length / count
+        bounds = [start + j * step for j in range(count)] + [end]
+        return list(zip(bounds, bounds[1:]))
+
+
+class SegmentPlan:
+    """
+    Compact segment plan: start/end times in `array('d')` and, for every
+    segment, the [first, stop) range of timeline lines it shows.
+    Instrumental segments have an empty range.
+
+    Iterating yields `(segment_index, start_time, end_time, lyrics_text)`,
+    the same tuples `get_intelligent_segments` returned.
+    """
+
+    __slots__ = ("timeline", "starts", "ends", "line_first", "line_stop")
+
+    def __init__(self, timeline, starts=(), ends=(), line_first=(), line_stop=()):
+        self.timeline = timeline
+        self.starts = array("d", starts)
+        self.ends = array("d", ends)
+        self.line_first = array("I", line_first)
+        self.line_stop = array("I", line_stop)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        texts = self.timeline.texts
+        text_ids = self.timeline.text_ids
+        for i, (start, end, first, stop) in enumerate(
+            zip(self.starts, self.ends, self.line_first, self.line_stop)
+        ):
+            if stop - first == 1:
+                text = texts[text_ids[first]].strip() or INSTRUMENTAL
+            elif first == stop:
+                text = INSTRUMENTAL
+            else:
+                text = " ".join([texts[j] for j in text_ids[first:stop]]).strip() or INSTRUMENTAL
+            yield i, start, end, text
+
+    def __getitem__(self, index):
+        return index, self.starts[index], self.ends[index], self.lyrics(index)
+
+    def lyrics(self, index):
+        """
+        Lyrics shown during a segment, or INSTRUMENTAL for a gap.
+        """
+        first, stop = self.line_first[index], self.line_stop[index]
+        texts = self.timeline.texts
+        text = " ".join([texts[j] for j in self.timeline.text_ids[first:stop]]).strip()
+        return text or INSTRUMENTAL
+
+    def duration(self, index):
+        return self.ends[index] - self.starts[index]
+
+    def intervals(self):
+        return list(zip(self.starts, self.ends))
+
+    def total_duration(self):
+        return self.ends[-1] if self.ends else 0.0
+
+
+def plan_segments(parsed_lyrics, policy=None):
+    """
+    Cuts a song into video segments in one pass over its timeline.
+
+    Every lyric segment starts where the previous segment ended and runs
+    until the next distinct line starts (at most max_segment). Lines that
+    share a timestamp always share a segment, short lines are merged
+    forward up to min_segment, and gaps longer than max_segment are split
+    according to the policy. Runs in O(lines + segments).
+    """
+    policy = policy or SegmentPolicy()
+    timeline = as_timeline(parsed_lyrics)
+    times = timeline.times
+    n = len(times)
+    max_seg = policy.max_segment
+    min_seg = policy.min_segment
+
+    starts, ends, line_first, line_stop = [], [], [], []
+
+    if not n:
+        # No synced lyrics: fixed instrumental slots up to the limit
+        slot = policy.fallback_slot or max_seg
+        t = 0.0
+        while policy.max_total - t > 1e-9:
+            starts.append(t)
+            ends.append(min(t + slot, policy.max_total))
+            t += slot
+        zeros = [0] * len(starts)
+        return SegmentPlan(timeline, starts, ends, zeros, zeros)
+
+    total = min(times[-1] + policy.tail, policy.max_total)
+
+    def add_gap(start, end):
+        for piece_start, piece_end in policy.split_gap(start, min(end, total)):
+            starts.append(piece_start)
+            ends.append(piece_end)
+            line_first.append(0)
+            line_stop.append(0)
+
+    t = 0.0
+    i = 0
+    while i < n and t < total:
+        ts = times[i]
+        if ts - t > max_seg:
+            add_gap(t, ts)
+            t = ts
+            if t >= total:
+                break
+        elif ts >= total:
+            break
+
+        # Take this line and every line sharing its timestamp
+        stop = i + 1
+        while stop < n and times[stop] <= ts:
+            stop += 1
+        limit = t + max_seg
+        if limit > total:
+            limit = total
+        end = times[stop] if stop < n and times[stop] < limit else limit
+
+        # Merge following lines while the segment is too short
+        while end - t < min_seg and end < limit:
+            next_ts = times[stop]
+            while stop < n and times[stop] <= next_ts:
+                stop += 1
+            end = times[stop] if stop < n and times[stop] < limit else limit
+
+        if end <= t:
+            break
+        starts.append(t)
+        ends.append(end)
+        line_first.append(i)
+        line_stop.append(stop)
+        t = end
+        i = stop
+
+    if t < total:
+        add_gap(t, total)
+
+    # Final slivers (e.g. the tail cut by max_total) are folded into the
+    # previous segment while that stays within max_segment. One that cannot
+    # be folded is kept, stretched towards the floor within max_total, if it
+    # shows lyrics; an instrumental one is dropped.
+    floor = min_seg or MIN_FINAL_SEGMENT
+    while len(starts) > 1 and ends[-1] - starts[-1] < floor:
+        first, stop = line_first[-1], line_stop[-1]
+        if ends[-1] - starts[-2] > max_seg + 1e-9:
+            if first != stop:
+                ends[-1] = max(ends[-1], min(starts[-1] + floor, policy.max_total))
+            else:
+                for column in (starts, ends, line_first, line_stop):
+                    column.pop()
+            break
+        for column in (starts, line_first, line_stop):
+            column.pop()
+        end = ends.pop()
+        ends[-1] = end
+        if first != stop:
+            if line_first[-1] == line_stop[-1]:
+                line_first[-1] = first
+            line_stop[-1] = stop
+    return SegmentPlan(timeline, starts, ends, line_first, line_stop)
+
+
+# Plan used by the web worker (the CLI builds its own from MAX_VIDEO_DURATION)
+WEB_POLICY = SegmentPolicy(
+    max_segment=WEB_SEGMENT_MAX,
+    min_segment=WEB_SEGMENT_MIN,
+    max_total=WEB_MAX_DURATION,
+    fallback_slot=WEB_SEGMENT_MAX,
+)
@@ -1,38 +1,305 @@
+import json
 import os
+import random
+import threading
+import time
 from dotenv import load_dotenv
-from google import genai
+
+try:
+    from .gemini_client import gemini
+    from .sentiment_cache import content_key, sentiment_cache
+    from .sentiment_lexicon import lexicon_classifier
+    from .single_flight import SingleFlight
+except ImportError:
+    from gemini_client import gemini
+    from sentiment_cache import content_key, sentiment_cache
+    from sentiment_lexicon import lexicon_classifier
+    from single_flight import SingleFlight
 
 # Load environment variables
 load_dotenv()
 
+SENTIMENT_MODEL = os.environ.get("SENTIMENT_MODEL", "gemini-2.5-flash")
+# "tiered": local lexicon first, Gemini only for low-confidence lyrics;
+# "local" never calls Gemini, "remote" always does
+SENTIMENT_MODE = os.environ.get("SENTIMENT_MODE", "tiered")
+# Share of confident local results also checked against Gemini (in the
+# background) so agreement is measured across all confidence levels
+SENTIMENT_AUDIT_RATE = float(os.environ.get("SENTIMENT_AUDIT_RATE", 0.05))
+# Only the beginning of the lyrics is sent to the model (and hashed for the cache)
+MAX_LYRICS_CHARS = 2000
+# Batched requests: estimated prompt tokens and songs per Gemini call
+SENTIMENT_BATCH_MAX_TOKENS = int(os.environ.get("SENTIMENT_BATCH_MAX_TOKENS", 30000))
+SENTIMENT_BATCH_MAX_ITEMS = int(os.environ.get("SENTIMENT_BATCH_MAX_ITEMS", 40))
+SENTIMENT_BATCH_RETRIES = 3
 
-def analyze_sentiment(lyrics: str) -> str:
-    """
-    Analyzes the sentiment of the provided lyrics using Google's Gemini model.
-    Returns a string describing the sentiment/mood.
-    """
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    if not api_key:
-        print("Error: GOOGLE_API_KEY not found.")
-        return "Neutral"
+# Structured output for batched requests: one entry per song id
+BATCH_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "id": {"type": "INTEGER"},
+            "sentiment": {"type": "STRING"},
+        },
+        "required": ["id", "sentiment"],
+    },
+}
 
-    client = genai.Client(api_key=api_key)
+_sentiment_flight = SingleFlight()
 
+
+def _request_sentiment(text):
+    """
+    Asks Gemini for the sentiment of `text`. Returns None on failure.
+    """
     prompt = (
         f"Analyze the sentiment and mood of the following song lyrics. "
         f"Provide a concise description of the emotional tone (e.g., 'Upbeat and Joyful', 'Dark and Melancholic', 'Energetic', 'Romantic', 'Angry'). "
         f"Return ONLY the sentiment description, nothing else.\n\n"
-        f"Lyrics:\n{lyrics[:2000]}"  # Truncate if too long to save tokens/avoid errors
+        f"Lyrics:\n{text}"
     )
 
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[prompt],
-        )
+        response = gemini.generate_content(SENTIMENT_MODEL, [prompt])
         if response.text:
             return response.text.strip()
-        return "Neutral"
+        return None
     except Exception as e:
         print(f"Error analyzing sentiment: {e}")
-        return "Neutral"
+        return None
+
+
+def _remote_sentiment(text):
+    """
+    Cached, de-duplicated Gemini analysis of `text`. Returns None on failure.
+    """
+    key = content_key(text, SENTIMENT_MODEL)
+
+    cached = sentiment_cache.get(key)
+    if cached:
+        return cached
+
+    def fetch():
+        sentiment = _request_sentiment(text)
+        if sentiment:
+            sentiment_cache.set(key, SENTIMENT_MODEL, sentiment)
+        return sentiment
+
+    sentiment, shared = _sentiment_flight.do(key, fetch)
+    if shared:
+        sentiment_cache.count("coalesced")
+    # Failures are not cached so the next job retries the model
+    return sentiment
+
+
+def _audit(text, local):
+    remote = _remote_sentiment(text)
+    if remote:
+        lexicon_classifier.record_agreement(local, remote)
+
+
+def analyze_sentiment(lyrics: str) -> str:
+    """
+    Analyzes the sentiment of the provided lyrics.
+    Returns a string describing the sentiment/mood.
+
+    A local lexicon classifier answers first; only low-confidence lyrics
+    are escalated to Google's Gemini model (see SENTIMENT_MODE). Gemini
+    results are cached by content (truncated lyrics + model), and
+    concurrent calls for the same lyrics share a single request.
+    """
+    text = lyrics[:MAX_LYRICS_CHARS]  # Truncate if too long to save tokens/avoid errors
+
+    if SENTIMENT_MODE == "remote":
+        return _remote_sentiment(text) or "Neutral"
+
+    local = lexicon_classifier.classify(text)
+    if SENTIMENT_MODE == "local" or lexicon_classifier.is_confident(local):
+        lexicon_classifier.count("local")
+        if SENTIMENT_MODE != "local" and random.random() < SENTIMENT_AUDIT_RATE:
+            threading.Thread(target=_audit, args=(text, local), daemon=True).start()
+        return local.label
+
+    lexicon_classifier.count("escalated")
+    print(
+        f"🧠 Local sentiment unsure ({local.bucket}, confidence {local.confidence}), asking Gemini..."
+    )
+    remote = _remote_sentiment(text)
+    if remote:
+        lexicon_classifier.record_agreement(local, remote)
+        return remote
+
+    lexicon_classifier.count("remote_failures")
+    # Better a weak local guess than no mood at all
+    return local.label
+
+
+class BatchTooLarge(Exception):
+    """
+    The batch did not fit the model's input or output token limits.
+    """
+
+
+def _estimate_tokens(text):
+    # Roughly 4 characters per token for English lyrics
+    return len(text) // 4 + 8
+
+
+def _is_token_limit_error(error):
+    message = str(error).lower()
+    return "token" in message and any(
+        x in message for x in ("exceed", "limit", "too long", "too many", "maximum")
+    )
+
+
+def _request_sentiment_batch(texts):
+    """
+    Analyzes several lyrics in one structured Gemini request.
+    Returns a list of sentiments (None where the model gave no answer).
+    Raises BatchTooLarge when the request or the answer hit a token limit.
+    """
+    songs = "\n\n".join(
+        f"### Song {i}\n{text}" for i, text in enumerate(texts)
+    )
+    prompt = (
+        f"Analyze the sentiment and mood of each of the following {len(texts)} song lyrics. "
+        f"For every song give a concise description of the emotional tone (e.g., 'Upbeat and Joyful', 'Dark and Melancholic', 'Energetic', 'Romantic', 'Angry'). "
+        f"Answer with one entry per song, using the song number as id.\n\n"
+        f"{songs}"
+    )
+
+    delay = 5
+    for attempt in range(SENTIMENT_BATCH_RETRIES):
+        try:
+            response = gemini.generate_content(
+                SENTIMENT_MODEL,
+                [prompt],
+                config={
+                    "response_mime_type": "application/json",
+                    "response_schema": BATCH_RESPONSE_SCHEMA,
+                },
+            )
+        except Exception as e:
+            if _is_token_limit_error(e):
+                raise BatchTooLarge(str(e))
+            if "429" in str(e) and attempt < SENTIMENT_BATCH_RETRIES - 1:
+                print(f"⏳ Sentiment batch rate limited, retrying in {delay}s...")
+                time.sleep(delay)
+                delay *= 2
+                continue
+            print(f"Error analyzing sentiment batch: {e}")
+            return [None] * len(texts)
+
+        try:
+            entries = json.loads(response.text or "")
+        except ValueError:
+            # A truncated JSON answer means the output ran out of tokens
+            raise BatchTooLarge("Unparseable batch response")
+
+        results = [None] * len(texts)
+        for entry in entries if isinstance(entries, list) else []:
+            try:
+                index = int(entry["id"])
+                sentiment = str(entry["sentiment"]).strip()
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 0 <= index < len(texts) and sentiment:
+                results[index] = sentiment
+        return results
+    return [None] * len(texts)
+
+
+def _pack_batches(items):
+    """
+    Groups (key, text) items into batches under the token and size budgets.
+    """
+    batch, tokens = [], 0
+    for item in items:
+        cost = _estimate_tokens(item[1])
+        if batch and (
+            tokens + cost > SENTIMENT_BATCH_MAX_TOKENS
+            or len(batch) >= SENTIMENT_BATCH_MAX_ITEMS
+        ):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(item)
+        tokens += cost
+    if batch:
+        yield batch
+
+
+def _run_batch(batch, results):
+    """
+    Sends one batch, splitting it in half until every part fits.
+    Fills `results` (key -> sentiment) and returns the number of API calls.
+    """
+    if len(batch) == 1:
+        key, text = batch[0]
+        results[key] = _request_sentiment(text)
+        return 1
+    try:
+        sentiments = _request_sentiment_batch([text for _, text in batch])
+    except BatchTooLarge as e:
+        print(f"✂️ Sentiment batch of {len(batch)} too large ({e}), splitting...")
+        middle = len(batch) // 2
+        return 1 + _run_batch(batch[:middle], results) + _run_batch(batch[middle:], results)
+    for (key, _), sentiment in zip(batch, sentiments):
+        results[key] = sentiment
+    return 1
+
+
+def analyze_sentiment_batch(lyrics_list):
+    """
+    Analyzes many songs at once. Returns one sentiment per input, in order.
+
+    Each song goes through the same tiers as analyze_sentiment (local
+    classifier, then the content cache); the remaining distinct lyrics are
+    packed into as few structured Gemini requests as the token budget
+    allows. Batches that exceed a token limit are split and retried.
+    """
+    texts = [(lyrics or "")[:MAX_LYRICS_CHARS] for lyrics in lyrics_list]
+    answers = [None] * len(texts)
+    keys = [None] * len(texts)
+    locals_ = [None] * len(texts)
+    pending = {}
+
+    for i, text in enumerate(texts):
+        if SENTIMENT_MODE != "remote":
+            local = locals_[i] = lexicon_classifier.classify(text)
+            if SENTIMENT_MODE == "local" or lexicon_classifier.is_confident(local):
+                lexicon_classifier.count("local")
+                answers[i] = local.label
+                continue
+            lexicon_classifier.count("escalated")
+        key = keys[i] = content_key(text, SENTIMENT_MODEL)
+        cached = sentiment_cache.get(key)
+        if cached:
+            answers[i] = cached
+        else:
+            pending.setdefault(key, text)
+
+    results = {}
+    calls = 0
+    for batch in _pack_batches(list(pending.items())):
+        calls += _run_batch(batch, results)
+    for key, sentiment in results.items():
+        if sentiment:
+            sentiment_cache.set(key, SENTIMENT_MODEL, sentiment)
+    if pending:
+        print(f"🧠 Analyzed {len(pending)} songs with {calls} Gemini call(s)")
+
+    for i in range(len(texts)):
+        if answers[i] is not None:
+            continue
+        remote = results.get(keys[i])
+        local = locals_[i]
+        if remote:
+            if local is not None:
+                lexicon_classifier.record_agreement(local, remote)
+            answers[i] = remote
+        else:
+            if local is not None:
+                lexicon_classifier.count("remote_failures")
+            answers[i] = local.label if local is not None else "Neutral"
+    return answers
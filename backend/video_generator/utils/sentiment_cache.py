@@ -0,0 +1,97 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+try:
+    from .sqlite_cache import SQLiteTTLCache
+    from .stats_registry import register_stats
+except ImportError:
+    from sqlite_cache import SQLiteTTLCache
+    from stats_registry import register_stats
+
+# Sentiment of a given text does not change, so entries live long by default
+SENTIMENT_CACHE_TTL = int(os.environ.get("SENTIMENT_CACHE_TTL", 90 * 24 * 3600))
+SENTIMENT_CACHE_MAX_ENTRIES = int(os.environ.get("SENTIMENT_CACHE_MAX_ENTRIES", 20000))
+
+
+def content_key(text, model):
+    """
+    Content address of an analysis: SHA-256 of the model name and the exact
+    text sent to it. Identical lyrics hit the same entry whatever song,
+    query or job they came from.
+    """
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class SentimentCache(SQLiteTTLCache):
+    """
+    SQLite-backed cache of sentiment results keyed by `content_key`.
+
+    Shares the cache directory with the lyrics cache, so web workers and
+    the CLI reuse each other's results. Entries expire after `ttl` seconds
+    and the least recently used are evicted above `max_entries`.
+    """
+
+    filename = "sentiment.sqlite3"
+    table = "sentiment"
+    schema = (
+        """
+        CREATE TABLE IF NOT EXISTS sentiment (
+            key TEXT PRIMARY KEY,
+            model TEXT,
+            sentiment TEXT,
+            created_at REAL,
+            accessed_at REAL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS sentiment_accessed_at ON sentiment(accessed_at)",
+    )
+    stat_names = ("hits", "misses", "stores", "evictions", "coalesced")
+
+    def __init__(self, path=None, ttl=SENTIMENT_CACHE_TTL, max_entries=SENTIMENT_CACHE_MAX_ENTRIES):
+        super().__init__(path, ttl, max_entries)
+
+    def get(self, key):
+        """
+        Returns the cached sentiment for a content key, or None on a miss.
+        """
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT sentiment, created_at FROM sentiment WHERE key = ?", (key,)
+            ).fetchone()
+            now = time.time()
+            if row is None or self.is_expired(row["created_at"], now):
+                self.count("misses")
+                return None
+            self.touch(conn, key, now)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ Sentiment cache read failed: {e}")
+            return None
+        self.count("hits")
+        return row["sentiment"]
+
+    def set(self, key, model, sentiment):
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO sentiment VALUES (?, ?, ?, ?, ?)",
+                (key, model, sentiment, now, now),
+            )
+            self.count("stores")
+            self._evict(conn)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️ Sentiment cache write failed: {e}")
+
+
+# Shared instance used by the background worker and the CLI
+sentiment_cache = SentimentCache()
+register_stats("sentiment_cache", sentiment_cache.stats)
@@ -0,0 +1,229 @@
+import os
+import re
+import threading
+from collections import Counter
+
+try:
+    from .stats_registry import register_stats
+except ImportError:
+    from stats_registry import register_stats
+
+# The buckets generate_image_from_lyrics picks its art style from
+BUCKETS = ("happy", "angry", "romantic", "sad")
+LABELS = {
+    "happy": "Happy and Upbeat",
+    "angry": "Angry and Intense",
+    "romantic": "Romantic and Soft",
+    "sad": "Sad and Melancholic",
+}
+
+# A local result is trusted when its confidence reaches this value and it is
+# backed by enough matched terms; anything weaker is escalated to Gemini.
+SENTIMENT_LOCAL_CONFIDENCE = float(os.environ.get("SENTIMENT_LOCAL_CONFIDENCE", 0.55))
+SENTIMENT_LOCAL_MIN_EVIDENCE = int(os.environ.get("SENTIMENT_LOCAL_MIN_EVIDENCE", 4))
+# Number of words after a negator ("not", "don't", ...) whose terms are ignored
+SENTIMENT_NEGATION_WINDOW = int(os.environ.get("SENTIMENT_NEGATION_WINDOW", 3))
+
+# Term weights per bucket. Bigrams are written with a space.
+LEXICON = {
+    "happy": {
+        "happy": 2, "joy": 2, "smile": 1.5, "smiling": 1.5, "laugh": 1.5,
+        "laughing": 1.5, "sunshine": 1.5, "sun": 1, "shine": 1, "shining": 1,
+        "dance": 1.5, "dancing": 1.5, "party": 2, "celebrate": 2, "fun": 1.5,
+        "good": 0.5, "alive": 1, "free": 1, "bright": 1, "summer": 1,
+        "celebration": 2, "cheer": 1.5, "groove": 1, "high": 0.5,
+        "good times": 2, "feel good": 2, "feels good": 2, "on top": 1,
+        "let's go": 1, "all night": 0.5, "hands up": 1.5,
+    },
+    "angry": {
+        "hate": 2, "rage": 2.5, "angry": 2.5, "anger": 2.5, "fight": 1.5,
+        "fighting": 1.5, "kill": 2, "blood": 1.5, "burn": 1.5, "burning": 1,
+        "scream": 1.5, "screaming": 1.5, "war": 1.5, "enemy": 1.5, "revenge": 2,
+        "destroy": 2, "violence": 2, "fury": 2.5, "mad": 1, "fire": 0.5,
+        "liar": 1.5, "lies": 1, "break": 0.5, "smash": 1.5, "damn": 1,
+        "sick of": 2, "tired of": 1, "fed up": 2, "shut up": 2, "get out": 1.5,
+        "burn it": 1.5, "tear down": 1.5,
+    },
+    "romantic": {
+        "love": 1.5, "lover": 2, "kiss": 2, "kissing": 2, "darling": 2,
+        "baby": 0.5, "honey": 1.5, "heart": 0.5, "hold": 1, "touch": 1,
+        "embrace": 2, "romance": 2.5, "forever": 1, "together": 1, "beautiful": 1,
+        "sweet": 1, "tender": 2, "desire": 1.5, "passion": 2, "sweetheart": 2,
+        "beloved": 2, "wedding": 2,
+        "in love": 2, "fall in": 1, "my heart": 1, "hold me": 1.5,
+        "hold you": 1.5, "love you": 2, "be mine": 2, "your eyes": 1.5,
+        "your arms": 1.5, "my love": 2,
+    },
+    "sad": {
+        "sad": 2.5, "cry": 2, "crying": 2, "cried": 2, "tears": 2, "tear": 1,
+        "alone": 1.5, "lonely": 2, "goodbye": 1.5, "gone": 1, "lost": 1,
+        "pain": 1.5, "hurt": 1.5, "broken": 1.5, "cold": 1, "dark": 1,
+        "darkness": 1.5, "empty": 1.5, "grey": 1, "gray": 1, "rain": 1,
+        "die": 1, "dying": 1.5, "dead": 1, "sorrow": 2.5, "miss": 1,
+        "regret": 2, "fade": 1, "never": 0.5, "blue": 0.5, "grave": 1.5,
+        "broken heart": 2.5, "let go": 1, "miss you": 2, "without you": 2,
+        "say goodbye": 2, "all alone": 2, "no more": 1, "too late": 1.5,
+    },
+}
+
+_WORD_PATTERN = re.compile(r"[a-z']+")
+# Strips LRC timestamps and metadata tags before scoring
+_TAG_PATTERN = re.compile(r"\[[^\]]*\]|<[^>]*>")
+_NEGATORS = frozenset(("not", "no", "never", "don't", "can't", "won't", "ain't", "isn't", "nothing"))
+
+
+def _build_weight_table(lexicon):
+    # term -> tuple of weights in BUCKETS order, so scoring is one lookup per term
+    table = {}
+    for b, bucket in enumerate(BUCKETS):
+        for term, weight in lexicon[bucket].items():
+            row = table.setdefault(term, [0.0] * len(BUCKETS))
+            row[b] += weight
+    return {term: tuple(row) for term, row in table.items()}
+
+
+def bucket_for(description):
+    """
+    Maps a free-text mood description (e.g. a Gemini answer) onto a bucket,
+    using the same keywords generate_image_from_lyrics matches on.
+    Returns None when no bucket applies.
+    """
+    text = (description or "").lower()
+    if any(x in text for x in ["happy", "joy", "upbeat", "energetic", "fun", "bright"]):
+        return "happy"
+    if any(x in text for x in ["angry", "aggressive", "intense"]):
+        return "angry"
+    if any(x in text for x in ["romantic", "love", "soft"]):
+        return "romantic"
+    if any(x in text for x in ["sad", "melancholic", "gloomy", "dark"]):
+        return "sad"
+    return None
+
+
+class LocalSentiment:
+    __slots__ = ("bucket", "confidence", "evidence", "scores")
+
+    def __init__(self, bucket, confidence, evidence, scores):
+        self.bucket = bucket
+        self.confidence = confidence
+        self.evidence = evidence
+        self.scores = scores
+
+    @property
+    def label(self):
+        return LABELS.get(self.bucket, "Neutral")
+
+
+class LexiconClassifier:
+    """
+    Fast local sentiment tier: weighted unigram/bigram lexicon scored over
+    term counts. Terms starting within `negation_window` words after a
+    negator on the same line ("not feeling happy") are ignored.
+
+    `classify` is cheap enough to run on every job; callers escalate to the
+    remote model when `is_confident` is False. Agreement with the remote
+    model is tracked per confidence band so the thresholds can be tuned
+    from `/stats/`.
+    """
+
+    BANDS = (0.25, 0.5, 0.75, 1.01)
+
+    def __init__(
+        self,
+        lexicon=LEXICON,
+        min_confidence=SENTIMENT_LOCAL_CONFIDENCE,
+        min_evidence=SENTIMENT_LOCAL_MIN_EVIDENCE,
+        negation_window=SENTIMENT_NEGATION_WINDOW,
+    ):
+        self.weights = _build_weight_table(lexicon)
+        self.min_confidence = min_confidence
+        self.min_evidence = min_evidence
+        self.negation_window = negation_window
+        self._lock = threading.Lock()
+        self._stats = {"local": 0, "escalated": 0, "remote_failures": 0}
+        self._agreement = {band: [0, 0] for band in self.BANDS}
+
+    def _terms(self, text):
+        # Unigrams and bigrams per lyric line. The negators themselves still
+        # count, e.g. the bigram "no more".
+        terms = []
+        for line in _TAG_PATTERN.sub(" ", text.lower()).splitlines():
+            words = _WORD_PATTERN.findall(line)
+            negated_until = -1
+            for i, word in enumerate(words):
+                if i > negated_until:
+                    terms.append(word)
+                    if i + 1 < len(words):
+                        terms.append(f"{word} {words[i + 1]}")
+                if word in _NEGATORS:
+                    negated_until = i + self.negation_window
+        return terms
+
+    def classify(self, text):
+        """
+        Returns a LocalSentiment with the best bucket (None without evidence),
+        its confidence (share of the total score, 0-1) and the number of
+        matched terms.
+        """
+        weights = self.weights
+        counts = Counter(self._terms(text or ""))
+        totals = [0.0] * len(BUCKETS)
+        evidence = 0
+        for term in counts.keys() & weights.keys():
+            n = counts[term]
+            evidence += n
+            for b, weight in enumerate(weights[term]):
+                totals[b] += weight * n
+
+        grand_total = sum(totals)
+        if not grand_total:
+            return LocalSentiment(None, 0.0, 0, dict(zip(BUCKETS, totals)))
+        best = max(range(len(BUCKETS)), key=totals.__getitem__)
+        confidence = totals[best] / grand_total
+        return LocalSentiment(
+            BUCKETS[best], round(confidence, 3), evidence, dict(zip(BUCKETS, totals))
+        )
+
+    def is_confident(self, result):
+        return (
+            result.bucket is not None
+            and result.confidence >= self.min_confidence
+            and result.evidence >= self.min_evidence
+        )
+
+    def count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def record_agreement(self, result, remote_description):
+        """
+        Compares a local result with the remote model's answer.
+        """
+        remote_bucket = bucket_for(remote_description)
+        if result.bucket is None or remote_bucket is None:
+            return
+        band = next(b for b in self.BANDS if result.confidence < b)
+        with self._lock:
+            self._agreement[band][0] += result.bucket == remote_bucket
+            self._agreement[band][1] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            agreement = {band: list(v) for band, v in self._agreement.items()}
+        stats["min_confidence"] = self.min_confidence
+        stats["min_evidence"] = self.min_evidence
+        compared = sum(total for _, total in agreement.values())
+        agreed = sum(hits for hits, _ in agreement.values())
+        stats["compared"] = compared
+        stats["agreement_rate"] = round(agreed / compared, 3) if compared else None
+        stats["agreement_by_confidence"] = {
+            f"<{min(band, 1.0):.2f}": (round(hits / total, 3) if total else None)
+            for band, (hits, total) in agreement.items()
+        }
+        return stats
+
+
+# Shared instance used by analyze_sentiment
+lexicon_classifier = LexiconClassifier()
+register_stats("sentiment_classifier", lexicon_classifier.stats)
@@ -0,0 +1,110 @@
+import sqlite3
+import threading
+import time
+
+try:
+    from .cache_paths import cache_path
+except ImportError:
+    from cache_paths import cache_path
+
+
+class SQLiteTTLCache:
+    """
+    Base of the SQLite caches kept in the shared cache directory.
+
+    Each thread gets its own connection (WAL, so web workers and the CLI
+    can read and write the same file). Entries expire `ttl` seconds after
+    they were stored and the least recently used are evicted once more
+    than `max_entries` are kept; a ttl or max_entries of 0 disables that.
+
+    Subclasses set `filename`, `table`, `key_column` and `schema`, a list
+    of statements creating the table (with `created_at` and `accessed_at`
+    columns) and its indexes, plus the `stat_names` they count.
+    """
+
+    filename = None
+    table = None
+    key_column = "key"
+    schema = ()
+    stat_names = ("hits", "misses", "stores", "evictions")
+
+    def __init__(self, path=None, ttl=0, max_entries=0):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = dict.fromkeys(self.stat_names, 0)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.path is None:
+                self.path = cache_path(self.filename)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.schema:
+                conn.execute(statement)
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def count(self, stat, amount=1):
+        with self._stats_lock:
+            self._stats[stat] += amount
+
+    def is_expired(self, created_at, now=None):
+        return bool(self.ttl) and (now or time.time()) - created_at > self.ttl
+
+    def touch(self, conn, key, now=None):
+        # Marks an entry as used for the LRU eviction
+        conn.execute(
+            f"UPDATE {self.table} SET accessed_at = ? WHERE {self.key_column} = ?",
+            (now or time.time(), key),
+        )
+
+    def _evict(self, conn):
+        if self.ttl:
+            cursor = conn.execute(
+                f"DELETE FROM {self.table} WHERE created_at < ?", (time.time() - self.ttl,)
+            )
+            if cursor.rowcount > 0:
+                self.count("evictions", cursor.rowcount)
+
+        if not self.max_entries:
+            return
+        (count,) = conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                f"""
+                DELETE FROM {self.table} WHERE {self.key_column} IN (
+                    SELECT {self.key_column} FROM {self.table} ORDER BY accessed_at ASC LIMIT ?
+                )
+                """,
+                (overflow,),
+            )
+            self.count("evictions", overflow)
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute(f"DELETE FROM {self.table}")
+        conn.commit()
+
+    def stats(self):
+        """
+        Returns the counters of this process plus the current entry count.
+        """
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        try:
+            (stats["entries"],) = self._connect().execute(
+                f"SELECT COUNT(*) FROM {self.table}"
+            ).fetchone()
+        except sqlite3.Error:
+            stats["entries"] = None
+        return stats
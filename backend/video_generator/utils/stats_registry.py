@@ -0,0 +1,23 @@
+import threading
+
+_providers = {}
+_lock = threading.Lock()
+
+
+def register_stats(name, provider):
+    """
+    Registers `provider`, a callable returning a JSON-serializable dict,
+    under `name` in the `/stats/` report. Modules call it next to their
+    shared instance, e.g. register_stats("lyrics_cache", lyrics_cache.stats).
+    """
+    with _lock:
+        _providers[name] = provider
+
+
+def collect_stats():
+    """
+    Returns {name: stats} for every registered provider, in registration order.
+    """
+    with _lock:
+        providers = list(_providers.items())
+    return {name: provider() for name, provider in providers}
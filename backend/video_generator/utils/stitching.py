@@ -0,0 +1,154 @@
+import os
+import subprocess
+import time
+from collections import Counter
+
+try:
+    from .media_probe import media_probe
+    from .render_plan import RENDER_CRF, RENDER_PRESET, build_render_plan, render
+except ImportError:
+    from media_probe import media_probe
+    from render_plan import RENDER_CRF, RENDER_PRESET, build_render_plan, render
+
+# Encoders able to produce a segment the concat demuxer can stream-copy
+# next to the others
+_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+
+
+def _normalize(video_path, params, output_file):
+    # Re-encodes one segment to the reference stream parameters; True on success
+    codec, width, height, frame_rate, pix_fmt, time_base, audio_codec = params
+    command = [
+        "ffmpeg",
+        "-v",
+        "error",
+        "-y",
+        "-i",
+        video_path,
+        "-map",
+        "0:v:0",
+        "-vf",
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={frame_rate},format={pix_fmt}",
+        "-c:v",
+        _ENCODERS[codec],
+        "-preset",
+        RENDER_PRESET,
+        "-crf",
+        str(RENDER_CRF),
+        "-video_track_timescale",
+        time_base.split("/")[1],
+    ]
+    if audio_codec:
+        command += ["-map", "0:a:0", "-c:a", "aac"]
+    command += ["-f", "mp4", output_file]
+    result = subprocess.run(command, capture_output=True, text=True, check=False)
+    if result.returncode != 0:
+        print(f"   ⚠️ Failed to normalize {os.path.basename(video_path)}: {result.stderr.strip()}")
+        return False
+    return True
+
+
+def _concat_copy(video_files, output_file):
+    # Concat demuxer with stream copy; True on success
+    list_file = f"{output_file}.list.txt"
+    try:
+        with open(list_file, "w", encoding="utf-8") as f:
+            for v in video_files:
+                path = os.path.abspath(v).replace("'", "'\\''")
+                f.write(f"file '{path}'\n")
+        command = [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-y",
+            "-f",
+            "concat",
+            "-safe",
+            "0",
+            "-i",
+            list_file,
+            "-map",
+            "0",
+            "-c",
+            "copy",
+            "-movflags",
+            "+faststart",
+            "-f",
+            "mp4",
+            output_file,
+        ]
+        result = subprocess.run(command, capture_output=True, text=True, check=False)
+        if result.returncode != 0:
+            print(f"   ⚠️ Stream copy concat failed: {result.stderr.strip()}")
+            return False
+        return True
+    finally:
+        if os.path.exists(list_file):
+            os.remove(list_file)
+
+
+def stitch_segments(video_files, output_file):
+    """
+    Concatenates the segment videos with the ffmpeg concat demuxer.
+
+    Segments sharing the most common stream parameters are stream-copied;
+    only the others are re-encoded to match first. If that is not possible
+    (unknown codec, mixed audio, a failing copy), everything is re-encoded
+    in one render pass instead. Returns output_file, or None on failure.
+    """
+    if not video_files:
+        print("No video files to stitch.")
+        return None
+
+    print(f"\n🧵 Stitching {len(video_files)} segments...")
+    started = time.monotonic()
+    part_file = f"{output_file}.part"
+    normalized = []
+    try:
+        # One parallel, cached ffprobe batch for all segments
+        infos = media_probe.probe_many(video_files)
+        params = [infos[v].stream_params if infos[v] else None for v in video_files]
+        counts = Counter(p for p in params if p)
+        reference = counts.most_common(1)[0][0] if counts else None
+        mixed_audio = len({p[6] is None for p in params if p}) > 1
+
+        stitched = False
+        if reference and reference[0] in _ENCODERS and not mixed_audio:
+            inputs = []
+            for video, p in zip(video_files, params):
+                if p == reference:
+                    inputs.append(video)
+                    continue
+                target = f"{os.path.splitext(video)[0]}_concat.mp4"
+                assert target != video, f"{video} would be overwritten"
+                print(f"   Re-encoding {os.path.basename(video)} to match the other segments...")
+                normalized.append(target)
+                if not _normalize(video, reference, target):
+                    break
+                inputs.append(target)
+            else:
+                stitched = _concat_copy(inputs, part_file)
+            if stitched:
+                print(f"   Stream-copied {len(inputs) - len(normalized)}/{len(inputs)} segments")
+
+        if stitched:
+            os.replace(part_file, output_file)
+        else:
+            print("   ⚠️ Falling back to re-encoding every segment...")
+            if not render(build_render_plan([(v, None, None) for v in video_files], output_file)):
+                return None
+    except FileNotFoundError:
+        print("Error: ffmpeg is not installed or not in your PATH.")
+        print("Please install ffmpeg to use this feature.")
+        return None
+    except Exception as e:
+        print(f"An unexpected error occurred while stitching: {e}")
+        return None
+    finally:
+        for path in normalized + [part_file]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    print(f"\n🎉 Final video saved: {output_file} (stitched in {time.monotonic() - started:.1f}s)")
+    return output_file
@@ -0,0 +1,137 @@
+import asyncio
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+
+try:
+    from .latency_stats import LatencyStats
+    from .stats_registry import register_stats
+except ImportError:
+    from latency_stats import LatencyStats
+    from stats_registry import register_stats
+
+# Odyssey streams open at once across every job (and thread) of the process
+ODYSSEY_MAX_STREAMS = int(os.environ.get("ODYSSEY_MAX_STREAMS", 3))
+
+
+class _Request:
+    def __init__(self, job, priority, seq, loop):
+        self.job = job
+        self.priority = priority
+        self.seq = seq
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+        self.enqueued_at = time.monotonic()
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class StreamScheduler:
+    """
+    Process-wide fair-share scheduler for Odyssey stream slots.
+
+    At most `max_streams` streams run at once. A freed slot goes to the
+    waiting request with the highest priority; among equal priorities, to
+    the job currently holding the fewest slots (then the oldest request),
+    so a job with many segments cannot starve the others. Waiters may sit
+    on any thread's event loop and are woken through that loop.
+    """
+
+    def __init__(self, max_streams):
+        self.max_streams = max_streams
+        self._lock = threading.Lock()
+        self._waiting = []
+        self._active = {}  # job -> slots held
+        self._seq = itertools.count()
+        self._wait = LatencyStats()
+        self._stats = {"granted": 0, "cancelled": 0, "max_queue_depth": 0}
+
+    def _dispatch(self):
+        # Called with the lock held
+        while self._waiting and sum(self._active.values()) < self.max_streams:
+            request = min(
+                self._waiting,
+                key=lambda r: (-r.priority, self._active.get(r.job, 0), r.seq),
+            )
+            self._waiting.remove(request)
+            request.granted = True
+            self._active[request.job] = self._active.get(request.job, 0) + 1
+            self._stats["granted"] += 1
+            self._wait.record(
+                f"priority {request.priority}", time.monotonic() - request.enqueued_at, True
+            )
+            request.loop.call_soon_threadsafe(_wake, request.future)
+
+    def _release(self, job):
+        # Called with the lock held
+        self._active[job] -= 1
+        if not self._active[job]:
+            del self._active[job]
+        self._dispatch()
+
+    async def acquire(self, job="default", priority=0):
+        """
+        Waits for a stream slot. Higher `priority` is served first.
+        """
+        request = _Request(job, priority, next(self._seq), asyncio.get_running_loop())
+        with self._lock:
+            self._waiting.append(request)
+            self._stats["max_queue_depth"] = max(
+                self._stats["max_queue_depth"], len(self._waiting)
+            )
+            self._dispatch()
+        try:
+            await request.future
+        except BaseException:
+            with self._lock:
+                if request.granted:
+                    # Granted while being cancelled: pass the slot on
+                    self._release(job)
+                else:
+                    self._waiting.remove(request)
+                self._stats["cancelled"] += 1
+            raise
+
+    def release(self, job="default"):
+        with self._lock:
+            self._release(job)
+
+    @asynccontextmanager
+    async def slot(self, job="default", priority=0):
+        """
+        async with stream_scheduler.slot(job_id): ... one Odyssey stream ...
+        """
+        await self.acquire(job, priority)
+        try:
+            yield
+        finally:
+            self.release(job)
+
+    def stats(self):
+        with self._lock:
+            queued = {}
+            for request in self._waiting:
+                queued[request.job] = queued.get(request.job, 0) + 1
+            stats = dict(self._stats)
+            stats.update(
+                max_streams=self.max_streams,
+                active=sum(self._active.values()),
+                queue_depth=len(self._waiting),
+                jobs={
+                    str(job): {"active": self._active.get(job, 0), "queued": queued.get(job, 0)}
+                    for job in set(self._active) | set(queued)
+                },
+            )
+        stats["wait"] = self._wait.stats()
+        return stats
+
+
+# Shared by every web job thread and the CLI
+stream_scheduler = StreamScheduler(ODYSSEY_MAX_STREAMS)
+register_stats("odyssey_streams", stream_scheduler.stats)
@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from .local_index import local_index
+    from .lrclib_client import lrclib
+    from .lyrics_cache import normalize_query
+    from .single_flight import SingleFlight
+    from .stats_registry import register_stats
+except ImportError:
+    from local_index import local_index
+    from lrclib_client import lrclib
+    from lyrics_cache import normalize_query
+    from single_flight import SingleFlight
+    from stats_registry import register_stats
+
+# How long typeahead results stay fresh (seconds)
+SUGGESTION_CACHE_TTL = int(os.environ.get("SUGGESTION_CACHE_TTL", 600))
+SUGGESTION_CACHE_MAX_ENTRIES = int(os.environ.get("SUGGESTION_CACHE_MAX_ENTRIES", 2048))
+# Number of results LRCLIB returns per search; fewer means the list is complete
+SUGGESTION_UPSTREAM_LIMIT = int(os.environ.get("SUGGESTION_UPSTREAM_LIMIT", 20))
+SUGGESTION_TIMEOUT = float(os.environ.get("SUGGESTION_TIMEOUT", 5))
+MAX_SUGGESTIONS = 10
+
+
+def format_suggestion(item):
+    """
+    Converts an LRCLIB search result into the JSON shape used by the dropdown.
+    """
+    return {
+        "id": item.get("id"),
+        "title": item.get("trackName"),
+        "artist": item.get("artistName"),
+        "album": item.get("albumName"),
+        "duration": item.get("duration"),
+        "synced": bool(item.get("syncedLyrics")),
+    }
+
+
+def _haystack(suggestion):
+    return normalize_query(
+        " ".join(
+            str(suggestion.get(k) or "") for k in ("title", "artist", "album")
+        )
+    ).split()
+
+
+def _matches(tokens, words):
+    # Every query token must start one of the words, like a prefix search
+    return all(any(w.startswith(t) for w in words) for t in tokens)
+
+
+class SuggestionCache:
+    """
+    Bounded LRU of typeahead results with per-entry TTL.
+
+    Lookups for a query that was not fetched yet are answered from the
+    longest cached prefix when that result can be filtered down reliably:
+    either the prefix result was complete (LRCLIB returned fewer than its
+    page size) or enough rows survive the filter to fill the dropdown.
+    """
+
+    def __init__(
+        self,
+        max_entries=SUGGESTION_CACHE_MAX_ENTRIES,
+        ttl=SUGGESTION_CACHE_TTL,
+        upstream_limit=SUGGESTION_UPSTREAM_LIMIT,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.upstream_limit = upstream_limit
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "prefix_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    def _get_entry(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, suggestions = entry
+        if expires_at < now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return suggestions
+
+    def lookup(self, key, limit=MAX_SUGGESTIONS):
+        """
+        Returns cached suggestions for a normalized query, or None on a miss.
+        """
+        now = time.monotonic()
+        with self._lock:
+            suggestions = self._get_entry(key, now)
+            if suggestions is not None:
+                self._stats["hits"] += 1
+                return suggestions[:limit]
+
+            tokens = key.split()
+            for end in range(len(key) - 1, 1, -1):
+                prefix = key[:end].rstrip()
+                if prefix != key[:end]:
+                    continue
+                cached = self._get_entry(prefix, now)
+                if cached is None:
+                    continue
+                filtered = [s for s in cached if _matches(tokens, s["_haystack"])]
+                complete = len(cached) < self.upstream_limit
+                if complete or len(filtered) >= limit:
+                    self._stats["prefix_hits"] += 1
+                    return filtered[:limit]
+                # The closest cached prefix is truncated; a shorter one is even less reliable
+                break
+
+            self._stats["misses"] += 1
+            return None
+
+    def store(self, key, suggestions):
+        for s in suggestions:
+            s["_haystack"] = _haystack(s)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, suggestions)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["prefix_hits"] + stats["misses"]
+        stats["hit_rate"] = (
+            round((stats["hits"] + stats["prefix_hits"]) / lookups, 3) if lookups else 0.0
+        )
+        return stats
+
+
+suggestion_cache = SuggestionCache()
+register_stats("suggestion_cache", suggestion_cache.stats)
+_search_flight = SingleFlight()
+
+
+def get_suggestions(query, limit=MAX_SUGGESTIONS):
+    """
+    Returns up to `limit` suggestions for a typeahead query.
+    Served from the local index or the prefix cache when possible;
+    identical in-flight queries share a single LRCLIB request.
+    """
+    key = normalize_query(query)
+    if len(key) < 2:
+        return []
+
+    local = local_index.search(query, limit=limit)
+    if local:
+        return [format_suggestion(item) for item in local]
+
+    cached = suggestion_cache.lookup(key, limit)
+    if cached is not None:
+        return [_public(s) for s in cached]
+
+    def fetch():
+        results = lrclib.search(query, timeout=SUGGESTION_TIMEOUT, interactive=True)
+        suggestions = [format_suggestion(item) for item in results]
+        suggestion_cache.store(key, suggestions)
+        return suggestions
+
+    suggestions, shared = _search_flight.do(key, fetch, timeout=SUGGESTION_TIMEOUT * 2)
+    if shared:
+        suggestion_cache.count("coalesced")
+    return [_public(s) for s in suggestions[:limit]]
+
+
+def _public(suggestion):
+    return {k: v for k, v in suggestion.items() if not k.startswith("_")}
@@ -0,0 +1,85 @@
+import io
+import os
+import subprocess
+
+from PIL import Image as PILImage
+
+try:
+    from .atomic_files import write_atomic
+except ImportError:
+    from atomic_files import write_atomic
+
+# Size and quality of the WebP previews shown in the job list
+THUMBNAIL_WIDTH = int(os.environ.get("THUMBNAIL_WIDTH", 320))
+THUMBNAIL_QUALITY = int(os.environ.get("THUMBNAIL_QUALITY", 70))
+# Where in a segment video the poster frame is taken (seconds)
+POSTER_OFFSET = float(os.environ.get("POSTER_OFFSET", 0.5))
+
+
+def derivative_path(path, suffix):
+    """
+    media/x/segment_3_image.png -> media/x/segment_3_image_<suffix>.webp
+    """
+    root, _ = os.path.splitext(path)
+    return f"{root}_{suffix}.webp"
+
+
+def _save_preview(img, output_file):
+    # Scale down to THUMBNAIL_WIDTH (keeping the aspect ratio) and write atomically
+    width = min(THUMBNAIL_WIDTH, img.size[0])
+    height = max(1, round(img.size[1] * width / img.size[0]))
+    img.draft("RGB", (width, height))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    img.thumbnail((width, height), PILImage.Resampling.LANCZOS, reducing_gap=3.0)
+
+    buffer = io.BytesIO()
+    img.save(buffer, "WEBP", quality=THUMBNAIL_QUALITY, method=4)
+    write_atomic(output_file, buffer.getvalue())
+    return output_file
+
+
+def make_thumbnail(image_path):
+    """
+    Writes a small WebP thumbnail next to a segment image.
+    Returns the thumbnail path, or None on failure.
+    """
+    try:
+        with PILImage.open(image_path) as img:
+            return _save_preview(img, derivative_path(image_path, "thumb"))
+    except Exception as e:
+        print(f"⚠️ Error creating thumbnail for {image_path}: {e}")
+        return None
+
+
+def make_poster(video_path):
+    """
+    Writes a WebP poster frame (taken POSTER_OFFSET seconds in) next to a
+    segment video. Returns the poster path, or None on failure.
+    """
+    try:
+        command = [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-ss",
+            str(POSTER_OFFSET),
+            "-i",
+            video_path,
+            "-frames:v",
+            "1",
+            "-f",
+            "image2pipe",
+            "-vcodec",
+            "png",
+            "-",
+        ]
+        result = subprocess.run(command, capture_output=True, check=False)
+        if result.returncode != 0 or not result.stdout:
+            print(f"⚠️ Could not extract poster frame from {video_path}: {result.stderr.decode(errors='replace').strip()}")
+            return None
+        with PILImage.open(io.BytesIO(result.stdout)) as img:
+            return _save_preview(img, derivative_path(video_path, "poster"))
+    except Exception as e:
+        print(f"⚠️ Error creating poster for {video_path}: {e}")
+        return None
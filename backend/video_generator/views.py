@@ -1,4 +1,4 @@
-import requests
+import os
 from django.shortcuts import render, redirect
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
@@ -7,8 +7,25 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import VideoJob
 from .serializers import VideoJobSerializer
-from .tasks import start_generation_thread
-from .utils.fetch_lyrics import get_song_lyrics
+from .tasks import start_bulk_generation, start_generation_thread
+from .utils.fetch_lyrics import (
+    get_song_lyrics,
+    get_song_track,
+    get_song_track_by_id,
+)
+from .utils.stats_registry import collect_stats
+from .utils.suggestion_cache import get_suggestions
+
+# Largest playlist accepted by one bulk request
+BULK_MAX_JOBS = int(os.environ.get("BULK_MAX_JOBS", 50))
+
+
+def _parse_int(value, default=None):
+    # Track ids of imported dumps are negative, so no str.isdigit()
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
 
 
 # Django Template Views
@@ -23,6 +40,11 @@ def about(request):
     return render(request, "video_generator/about.html")
 
 
+def cache_stats(request):
+    """Hit/miss statistics of the shared caches, budgets and pools"""
+    return JsonResponse(collect_stats())
+
+
 def search_suggestions(request):
     """Proxy request to LRCLIB search API for suggestions"""
     query = request.GET.get("q", "").strip()
@@ -30,31 +52,8 @@ def search_suggestions(request):
         return JsonResponse([], safe=False)
 
     try:
-        # Call LRCLIB API
-        url = "https://lrclib.net/api/search"
-        params = {"q": query}
-        headers = {
-            "User-Agent": "OdysseyHackathonBot/1.0 (https://github.com/odysseyml/odyssey-hackathon)"
-        }
-
-        response = requests.get(url, params=params, headers=headers, timeout=5)
-        response.raise_for_status()
-        data = response.json()
-
-        # Format suggestions
-        suggestions = []
-        for item in data[:10]:  # Limit to 10 suggestions
-            suggestions.append(
-                {
-                    "id": item.get("id"),
-                    "title": item.get("trackName"),
-                    "artist": item.get("artistName"),
-                    "album": item.get("albumName"),
-                    "duration": item.get("duration"),
-                    "synced": bool(item.get("syncedLyrics")),
-                }
-            )
-
+        # Coalesced, prefix-cached LRCLIB search
+        suggestions = get_suggestions(query)
         return JsonResponse(suggestions, safe=False)
     except Exception as e:
         print(f"Error fetching suggestions: {e}")
@@ -64,6 +63,7 @@ def search_suggestions(request):
 def search_lyrics(request):
     """Search for song lyrics and show preview"""
     query = request.GET.get("q", "").strip()
+    track_id = _parse_int(request.GET.get("id", "").strip())
     jobs = VideoJob.objects.all().order_by("-created_at")[:10]
 
     context = {
@@ -71,10 +71,19 @@ def search_lyrics(request):
         "query": query,
     }
 
-    if query:
-        lyrics = get_song_lyrics(query)
+    # A picked suggestion carries its LRCLIB id, so skip the second search
+    track = get_song_track_by_id(track_id) if track_id is not None else None
+    if track and track.get("lyrics"):
+        context["lyrics"] = track["lyrics"]
+        context["song_title"] = track["title"]
+        context["artist"] = track["artist"]
+        context["track_id"] = track["id"]
+    elif query:
+        track = get_song_track(query)
+        lyrics = track.get("lyrics") if track else None
         if lyrics:
             context["lyrics"] = lyrics
+            context["track_id"] = track.get("id")
             # Try to parse artist/title from query for the form
             parts = query.split()
             if len(parts) > 2:
@@ -97,6 +106,8 @@ def generate_video(request):
     """Create a new video generation job"""
     song_title = request.POST.get("song_title", "").strip()
     artist = request.POST.get("artist", "").strip()
+    track_id = request.POST.get("track_id", "").strip()
+    priority = request.POST.get("priority", "").strip()
 
     if not song_title:
         return redirect("index")
@@ -104,6 +115,8 @@ def generate_video(request):
     job = VideoJob.objects.create(
         song_title=song_title,
         artist=artist,
+        lrclib_id=_parse_int(track_id),
+        priority=_parse_int(priority, 0),
         status="pending",
         message="Job created, waiting to start...",
     )
@@ -172,6 +185,29 @@ class VideoJobViewSet(viewsets.ModelViewSet):
         else:
             return Response({"found": False}, status=404)
 
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """
+        Queues several songs at once (e.g. a playlist). The jobs are created
+        right away and returned with 202; their sentiments are computed in
+        batched requests in the background before they start, so poll the
+        jobs for progress.
+        """
+        items = request.data if isinstance(request.data, list) else request.data.get("jobs")
+        if not isinstance(items, list) or not items:
+            return Response({"error": "Expected a non-empty list of jobs"}, status=400)
+        if len(items) > BULK_MAX_JOBS:
+            return Response(
+                {"error": f"At most {BULK_MAX_JOBS} jobs per bulk request"}, status=429
+            )
+
+        serializer = self.get_serializer(data=items, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        jobs = serializer.save()
+        start_bulk_generation([job.id for job in jobs])
+        return Response(self.get_serializer(jobs, many=True).data, status=202)
+
     def perform_create(self, serializer):
         job = serializer.save()
         start_generation_thread(job.id)
@@ -1,6 +1,6 @@
 import asyncio
 import os
-import requests
+import sys
 from dotenv import load_dotenv
 from odyssey import (
     Odyssey,
@@ -9,6 +9,12 @@ from odyssey import (
     OdysseyStreamError,
 )
 
+# Shared streaming downloader of the backend
+sys.path.insert(
+    0, os.path.join(os.path.dirname(__file__), "backend", "video_generator", "utils")
+)
+from odyssey_recordings import recording_downloader
+
 load_dotenv()
 
 
@@ -51,9 +57,7 @@ async def generate_single_video(
             return
 
         print(f"   Downloading video from: {video_url}")
-        v_response = requests.get(video_url)
-        with open(output_filename, "wb") as f:
-            f.write(v_response.content)
+        await recording_downloader.download(video_url, output_filename)
         print(f"✅ Saved video to: {output_filename}")
 
     except OdysseyAuthError:
@@ -62,6 +66,7 @@ async def generate_single_video(
         print(f"❌ Error: {e}")
     finally:
         await client.disconnect()
+        await recording_downloader.aclose()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,142 @@
+"""
+Benchmarks the LRC parser against the original regex-based implementation.
+
+Usage:
+    python scripts/bench_lrc_parser.py                 # synthetic corpus
+    python scripts/bench_lrc_parser.py --songs 20000 --extended
+    python scripts/bench_lrc_parser.py --corpus path/to/lrc-files/
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), "..", "backend", "video_generator", "utils"),
+)
+
+from lrc_timeline import parse_lrc  # noqa: E402
+
+
+def legacy_parse_lrc_lyrics(lrc_text):
+    # Original implementation from generate_music_video.py, kept as the baseline
+    lines = []
+    pattern = re.compile(r"\[(\d+):(\d+(?:\.\d+)?)\](.*)")
+    for line in lrc_text.split("\n"):
+        match = pattern.match(line.strip())
+        if match:
+            minutes = int(match.group(1))
+            seconds = float(match.group(2))
+            text = match.group(3).strip()
+            lines.append((minutes * 60 + seconds, text))
+    return sorted(lines, key=lambda x: x[0])
+
+
+WORDS = (
+    "love night heart fire rain dream light away home time baby tonight "
+    "forever dance wild run free sky stars alone cold gold"
+).split()
+
+
+def synthetic_song(rng, lines=60, extended=False):
+    out = ["[ti:Synthetic]", "[ar:Bench]"]
+    if extended:
+        out.append("[offset:+120]")
+    chorus = " ".join(rng.choices(WORDS, k=6))
+    t = 5.0
+    for i in range(lines):
+        stamp = f"[{int(t // 60):02d}:{t % 60:05.2f}]"
+        if extended and i % 8 == 0:
+            # Repeated chorus on several timestamps
+            later = t + 90
+            stamp += f"[{int(later // 60):02d}:{later % 60:05.2f}]"
+            text = chorus
+        else:
+            text = " ".join(rng.choices(WORDS, k=rng.randint(3, 8)))
+        if extended:
+            words = text.split()
+            text = " ".join(
+                f"<{int((t + j * 0.4) // 60):02d}:{(t + j * 0.4) % 60:05.2f}>{w}"
+                for j, w in enumerate(words)
+            )
+        out.append(stamp + text)
+        t += rng.uniform(1.5, 4.5)
+    return "\n".join(out)
+
+
+def load_corpus(directory):
+    corpus = []
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(".lrc"):
+                with open(os.path.join(root, name), encoding="utf-8", errors="replace") as f:
+                    corpus.append(f.read())
+    return corpus
+
+
+def bench(name, fn, corpus, repeat):
+    best = float("inf")
+    lines = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        lines = sum(len(fn(text)) for text in corpus)
+        best = min(best, time.perf_counter() - start)
+    size_mb = sum(len(text) for text in corpus) / 1e6
+    print(
+        f"{name:<10} {best * 1000:9.1f} ms  {lines / best:12,.0f} lines/s  "
+        f"{size_mb / best:7.1f} MB/s  ({lines} lines)"
+    )
+    return best
+
+
+def retained_bytes(fn, corpus):
+    # Memory held by the parsed results of the whole corpus
+    tracemalloc.start()
+    results = [fn(text) for text in corpus]
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del results
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="Directory of .lrc files (default: synthetic)")
+    parser.add_argument("--songs", type=int, default=5000)
+    parser.add_argument(
+        "--extended",
+        action="store_true",
+        help="Add repeated timestamps, [offset:] and word-level timings",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        rng = random.Random(42)
+        corpus = [synthetic_song(rng, extended=args.extended) for _ in range(args.songs)]
+
+    print(f"Corpus: {len(corpus)} songs, {sum(map(len, corpus)) / 1e6:.1f} MB\n")
+    legacy = bench("legacy", legacy_parse_lrc_lyrics, corpus, args.repeat)
+    current = bench("parse_lrc", parse_lrc, corpus, args.repeat)
+    print(f"\nSpeedup: {legacy / current:.2f}x")
+
+    sample = corpus[:1000]
+    legacy_mem = retained_bytes(legacy_parse_lrc_lyrics, sample)
+    current_mem = retained_bytes(parse_lrc, sample)
+    print(
+        f"Retained memory for {len(sample)} songs: legacy {legacy_mem / 1e6:.1f} MB, "
+        f"parse_lrc {current_mem / 1e6:.1f} MB ({legacy_mem / current_mem:.1f}x smaller)"
+    )
+    if args.extended:
+        print("(legacy drops repeated timestamps and word timings, so it does less work)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Benchmarks the segment planner against the original get_intelligent_segments.
+
+Usage:
+    python scripts/bench_segment_planner.py                # synthetic corpus
+    python scripts/bench_segment_planner.py --songs 20000 --dense
+    python scripts/bench_segment_planner.py --corpus path/to/lrc-files/
+
+The scaling table plans single songs of growing size with no duration cap;
+time per line should stay flat. On dense (karaoke-style) songs the original
+emits a zero-length segment for every line sharing a timestamp, which the
+planner groups into one segment.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(
+    0,
+    os.path.join(os.path.dirname(__file__), "..", "backend", "video_generator", "utils"),
+)
+
+from lrc_timeline import LyricTimeline, parse_lrc  # noqa: E402
+from segment_planner import SegmentPolicy, plan_segments  # noqa: E402
+
+
+def legacy_get_intelligent_segments(parsed_lyrics, max_duration=5, max_total=40):
+    # Original implementation from generate_music_video.py, kept as the baseline
+    if not parsed_lyrics:
+        return [(0, 0, min(10, max_total), "(Instrumental / Music)")]
+
+    segments = []
+    segment_index = 0
+    total_duration = min(parsed_lyrics[-1][0] + 5, max_total)
+    current_time = 0
+
+    for idx, (timestamp, text) in enumerate(parsed_lyrics):
+        if timestamp - current_time > max_duration:
+            gap_duration = timestamp - current_time
+            num_sub_segments = int(gap_duration / max_duration) + (
+                1 if gap_duration % max_duration else 0
+            )
+            sub_duration = gap_duration / num_sub_segments
+            for j in range(num_sub_segments):
+                seg_start = current_time + (j * sub_duration)
+                seg_end = current_time + ((j + 1) * sub_duration)
+                segments.append((segment_index, seg_start, seg_end, "(Instrumental / Music)"))
+                segment_index += 1
+            current_time = timestamp
+
+        if idx + 1 < len(parsed_lyrics):
+            next_timestamp = parsed_lyrics[idx + 1][0]
+            end_time = min(current_time + max_duration, next_timestamp)
+        else:
+            end_time = current_time + max_duration
+
+        segment_lyrics = text
+        for future_idx in range(idx + 1, len(parsed_lyrics)):
+            if parsed_lyrics[future_idx][0] < end_time:
+                segment_lyrics += " " + parsed_lyrics[future_idx][1]
+            else:
+                break
+
+        segments.append((segment_index, current_time, end_time, segment_lyrics.strip()))
+        segment_index += 1
+        current_time = end_time
+        if current_time >= total_duration:
+            break
+
+    return segments
+
+
+WORDS = (
+    "love night heart fire rain dream light away home time baby tonight "
+    "forever dance wild run free sky stars alone cold gold"
+).split()
+
+
+def synthetic_pairs(rng, lines, dense=False):
+    """
+    (timestamp, text) pairs. Dense songs are karaoke-style: bursts of lines
+    sharing a timestamp.
+    """
+    pairs = []
+    t = rng.uniform(0, 15)
+    for _ in range(lines):
+        pairs.append((round(t, 2), " ".join(rng.choices(WORDS, k=rng.randint(1, 6)))))
+        if dense:
+            t += 0 if rng.random() < 0.9 else rng.uniform(0.5, 3)
+        else:
+            t += rng.choice((0.5, 1.5, 2.5, 3.5, 4.5, 12.0))
+    return pairs
+
+
+def load_corpus(directory):
+    corpus = []
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(".lrc"):
+                with open(os.path.join(root, name), encoding="utf-8", errors="replace") as f:
+                    timeline = parse_lrc(f.read())
+                if timeline:
+                    corpus.append(list(timeline))
+    return corpus
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def scaling_table(dense, repeat):
+    print("Lines/song     legacy us/line   planner us/line")
+    uncapped = SegmentPolicy(max_segment=5, max_total=float("inf"))
+    rng = random.Random(7)
+    for lines in (250, 1000, 4000, 16000):
+        pairs = synthetic_pairs(rng, lines, dense=dense)
+        timeline = LyricTimeline.from_pairs(pairs)
+        legacy = best_of(
+            lambda: legacy_get_intelligent_segments(pairs, 5, float("inf")), repeat
+        )
+        current = best_of(lambda: list(plan_segments(timeline, uncapped)), repeat)
+        print(f"{lines:>10} {legacy / lines * 1e6:16.2f} {current / lines * 1e6:17.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="Directory of .lrc files (default: synthetic)")
+    parser.add_argument("--songs", type=int, default=5000)
+    parser.add_argument(
+        "--dense", action="store_true", help="Karaoke-style songs with shared timestamps"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        rng = random.Random(42)
+        lines = 400 if args.dense else 60
+        corpus = [synthetic_pairs(rng, lines, dense=args.dense) for _ in range(args.songs)]
+    timelines = [LyricTimeline.from_pairs(pairs) for pairs in corpus]
+    total_lines = sum(map(len, corpus))
+    print(f"Corpus: {len(corpus)} songs, {total_lines} lines\n")
+
+    # Whole-song plans (no 40s cap) so every line is planned
+    uncapped = SegmentPolicy(max_segment=5, max_total=float("inf"))
+    legacy = best_of(
+        lambda: [legacy_get_intelligent_segments(p, 5, float("inf")) for p in corpus],
+        args.repeat,
+    )
+    plan_only = best_of(
+        lambda: [plan_segments(t, uncapped) for t in timelines], args.repeat
+    )
+    current = best_of(
+        lambda: [list(plan_segments(t, uncapped)) for t in timelines], args.repeat
+    )
+    legacy_segments = sum(
+        len(legacy_get_intelligent_segments(p, 5, float("inf"))) for p in corpus
+    )
+    plan_segments_count = sum(len(plan_segments(t, uncapped)) for t in timelines)
+    print(f"legacy        {legacy * 1000:9.1f} ms  {total_lines / legacy:12,.0f} lines/s")
+    print(f"plan          {plan_only * 1000:9.1f} ms  {total_lines / plan_only:12,.0f} lines/s")
+    print(f"plan + texts  {current * 1000:9.1f} ms  {total_lines / current:12,.0f} lines/s")
+    print(f"Speedup: {legacy / current:.2f}x")
+    print(f"Segments: legacy {legacy_segments}, planner {plan_segments_count}\n")
+
+    scaling_table(args.dense, args.repeat)
+
+
+if __name__ == "__main__":
+    main()